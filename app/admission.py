@@ -0,0 +1,181 @@
+"""
+Admission control per route class.
+
+Every request is classified by route template into one of a few classes
+with their own concurrency limit and bounded wait queue:
+
+- heavy: attendance submissions and edits (rating runs, rollbacks and
+  replays), standings ingestion, exports and profiled replays
+- auth:  login, registration and token refresh (password hashing)
+- write: every other POST/PUT/PATCH/DELETE
+- read:  GET/HEAD
+
+A request over its class's limit waits in a FIFO queue. A full queue
+answers 429 at once; a request still queued after
+ADMISSION_QUEUE_TIMEOUT_SECONDS gets 503. Both carry a Retry-After derived
+from the class's recent service time. Heavy requests also take their
+database sessions from a separate pool (see app.db), so a replay cannot
+starve the leaderboard of connections.
+"""
+from collections import deque
+from starlette.responses import JSONResponse
+from app.config import settings
+from app.db import HEAVY_POOL, POOL_SCOPE_KEY
+from app.metrics import route_template
+from app.tracing import span
+import asyncio, math
+
+HEAVY, AUTH, WRITE, READ = "heavy", "auth", "write", "read"
+READ_METHODS = frozenset({"GET", "HEAD"})
+
+# (method, route template) -> class; anything else is READ or WRITE by method
+ROUTE_CLASSES = {
+    ("POST", "/api/attendance/{contest_id}/attendance"): HEAVY,
+    ("PUT", "/api/attendance/{contest_id}/attendance"): HEAVY,
+    ("POST", "/api/attendance/{contest_id}/standings"): HEAVY,
+    ("GET", "/api/admin/export/rating-history"): HEAVY,
+    ("GET", "/api/admin/export/attendance"): HEAVY,
+    ("POST", "/api/admin/profile/replay/{contest_id}"): HEAVY,
+    ("POST", "/api/auth/login"): AUTH,
+    ("POST", "/api/auth/register"): AUTH,
+    ("POST", "/api/auth/refresh"): AUTH,
+}
+# Never queued: scrapes, and profiled requests whose inner request is admitted itself
+EXEMPT_ROUTES = frozenset({"/", "/metrics", "/api/admin/profile/request"})
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class AdmissionLimiter:
+    """Concurrency limit with a bounded FIFO wait queue, for one event loop."""
+
+    def __init__(self, name: str, concurrency: int, queue_size: int, queue_timeout: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters = deque()
+        # Moving average of how long an admitted request holds its slot
+        self.avg_seconds = 0.0
+
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def retry_after(self) -> int:
+        backlog = len(self._waiters) + 1
+        return max(1, math.ceil(self.avg_seconds * backlog / self.concurrency))
+
+    async def acquire(self):
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.queue_size:
+            self.rejected += 1
+            raise AdmissionRejected(429, f"Too many {self.name} requests, please retry later", self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on
+                self.release()
+            else:
+                self._remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.timed_out += 1
+                raise AdmissionRejected(503, f"Server is busy with {self.name} requests, please retry later", self.retry_after())
+            raise
+        # release() handed us its slot; active already counts it
+        self.admitted += 1
+
+    def _remove(self, waiter):
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self, held_seconds: float = None):
+        if held_seconds is not None:
+            self.avg_seconds = held_seconds if not self.avg_seconds else 0.8 * self.avg_seconds + 0.2 * held_seconds
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "queue_size": self.queue_size,
+            "active": self.active,
+            "queued": len(self._waiters),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_seconds": round(self.avg_seconds, 4),
+        }
+
+
+def _limiter(name: str, concurrency: int, queue_size: int) -> AdmissionLimiter:
+    return AdmissionLimiter(name, concurrency, queue_size, settings.ADMISSION_QUEUE_TIMEOUT_SECONDS)
+
+
+limiters = {
+    HEAVY: _limiter(HEAVY, settings.ADMISSION_HEAVY_CONCURRENCY, settings.ADMISSION_HEAVY_QUEUE),
+    AUTH: _limiter(AUTH, settings.ADMISSION_AUTH_CONCURRENCY, settings.ADMISSION_AUTH_QUEUE),
+    WRITE: _limiter(WRITE, settings.ADMISSION_WRITE_CONCURRENCY, settings.ADMISSION_WRITE_QUEUE),
+    READ: _limiter(READ, settings.ADMISSION_READ_CONCURRENCY, settings.ADMISSION_READ_QUEUE),
+}
+
+
+def route_class(method: str, template: str) -> str:
+    return ROUTE_CLASSES.get((method, template)) or (READ if method in READ_METHODS else WRITE)
+
+
+def stats() -> dict:
+    return {name: limiter.stats() for name, limiter in limiters.items()}
+
+
+class AdmissionMiddleware:
+    """Admits each HTTP request through the limiter of its route class."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+        template = route_template(scope)
+        if template in EXEMPT_ROUTES:
+            await self.app(scope, receive, send)
+            return
+
+        limiter = limiters[route_class(scope["method"], template)]
+        if limiter.name == HEAVY:
+            scope[POOL_SCOPE_KEY] = HEAVY_POOL
+        try:
+            with span("admission.wait", route_class=limiter.name):
+                await limiter.acquire()
+        except AdmissionRejected as e:
+            response = JSONResponse({"detail": e.detail}, status_code=e.status_code, headers={"Retry-After": str(e.retry_after)})
+            await response(scope, receive, send)
+            return
+
+        started = asyncio.get_running_loop().time()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(asyncio.get_running_loop().time() - started)
@@ -0,0 +1,162 @@
+from collections import OrderedDict
+import time
+import uuid
+from app.config import settings
+
+
+class TTLCache:
+    """
+    Small in-process LRU cache whose entries expire after `ttl` seconds.
+    Not shared between worker processes, so entries must be safe to serve
+    for up to `ttl` seconds after the underlying data changed elsewhere.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def clear(self):
+        self._data.clear()
+
+    def values(self) -> list:
+        """Unexpired values, least recently used first."""
+        now = time.monotonic()
+        return [value for expires_at, value in self._data.values() if expires_at >= now]
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return len(self._data)
+
+
+class PrincipalCache:
+    """
+    Authenticated-user cache for get_current_user, keyed by codeforces handle.
+    Stores plain column values; get_current_user wraps them in a Principal.
+    Writes that change a user must call invalidate() after committing.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._handles_by_id = {}
+
+    def get(self, handle: str):
+        return self._entries.get(handle)
+
+    def set(self, handle: str, user_id: int, values: dict):
+        self._entries.set(handle, values)
+        self._handles_by_id[user_id] = handle
+        if len(self._handles_by_id) > 2 * self.maxsize:
+            self._handles_by_id = {
+                uid: h for uid, h in self._handles_by_id.items() if h in self._entries
+            }
+
+    def invalidate(self, handle: str = None, user_id: int = None):
+        if user_id is not None:
+            cached_handle = self._handles_by_id.pop(user_id, None)
+            if cached_handle is not None:
+                self._entries.pop(cached_handle)
+        if handle is not None:
+            self._entries.pop(handle)
+
+    def clear(self):
+        self._entries.clear()
+        self._handles_by_id.clear()
+
+
+class RevokedTokenFilter:
+    """
+    Digests of refresh tokens revoked by this process, kept until they expire,
+    so a reused token is rejected without a DB lookup. A miss says nothing:
+    the DB row stays authoritative.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._expiry = OrderedDict()
+
+    def add(self, digest: bytes, expires_at: float):
+        self._expiry[digest] = expires_at
+        while len(self._expiry) > self.maxsize:
+            self._expiry.popitem(last=False)
+
+    def __contains__(self, digest: bytes) -> bool:
+        expires_at = self._expiry.get(digest)
+        return expires_at is not None and expires_at > time.time()
+
+    def prune(self):
+        now = time.time()
+        for digest in [d for d, expires_at in self._expiry.items() if expires_at <= now]:
+            del self._expiry[digest]
+
+    def __len__(self):
+        return len(self._expiry)
+
+
+class ResourceVersions:
+    """
+    Per-process change counters, e.g. ("user", 7) or ("contests",). Write
+    paths bump them after committing; ETags are derived from them. `epoch`
+    is unique per process, so versions from different workers never collide.
+
+    A worker never sees another worker's bumps, so a version is also bumped
+    once it is `ttl` seconds old: a write made elsewhere shows up here within
+    `ttl` seconds. With ttl=0 versions only change on local writes, which is
+    exact for a single worker.
+    """
+
+    def __init__(self, ttl: float = 0):
+        self.epoch = uuid.uuid4().hex[:12]
+        self.ttl = ttl
+        # scope -> (version, monotonic time it expires)
+        self._versions = {}
+
+    def get(self, *scope) -> int:
+        version, expires = self._versions.get(scope, (0, 0.0))
+        if self.ttl:
+            now = time.monotonic()
+            if now >= expires:
+                version += 1
+                self._versions[scope] = (version, now + self.ttl)
+        return version
+
+    def bump(self, *scope):
+        version, _ = self._versions.get(scope, (0, 0.0))
+        self._versions[scope] = (version + 1, time.monotonic() + self.ttl)
+
+
+principal_cache = PrincipalCache(maxsize=settings.PRINCIPAL_CACHE_SIZE, ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS)
+
+# contest_id -> frozenset of user ids allowed to take attendance
+preparer_acl_cache = TTLCache(maxsize=settings.PREPARER_ACL_CACHE_SIZE, ttl=settings.PREPARER_ACL_CACHE_TTL_SECONDS)
+
+revoked_refresh_tokens = RevokedTokenFilter(maxsize=settings.REVOKED_TOKEN_FILTER_SIZE)
+
+# contest_id -> leaderboard entries as of that contest (names may lag by the TTL)
+as_of_leaderboard_cache = TTLCache(maxsize=settings.AS_OF_LEADERBOARD_CACHE_SIZE, ttl=settings.AS_OF_LEADERBOARD_CACHE_TTL_SECONDS)
+
+resource_versions = ResourceVersions(ttl=settings.WORKER_STATE_TTL_SECONDS)
@@ -0,0 +1,51 @@
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from typing import Optional
+from app.cache import TTLCache, resource_versions
+from app.config import settings
+from app.serialization import dumps
+
+response_cache = TTLCache(maxsize=settings.RESPONSE_CACHE_SIZE, ttl=settings.RESPONSE_CACHE_TTL_SECONDS)
+
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    return 'W/"' + "-".join([resource_versions.epoch, *(str(p) for p in parts)]) + '"'
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """
+    304 response if the request's If-None-Match matches etag, else None.
+    Check this before touching the DB.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    tags = [tag.strip() for tag in header.split(",")]
+    if "*" in tags or etag in tags:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    return None
+
+
+def cached_response(etag: str) -> Optional[Response]:
+    """The previously rendered body for this ETag, if the response cache has it."""
+    if settings.RESPONSE_CACHE_TTL_SECONDS <= 0:
+        return None
+    cached = response_cache.get(etag)
+    if cached is None:
+        return None
+    body, headers = cached
+    return Response(content=body, media_type="application/json", headers={**headers, "ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def versioned_response(payload, etag: str, headers: Optional[dict] = None) -> Response:
+    """
+    Render payload as JSON with its ETag and keep the body in the response cache.
+    Extra headers (e.g. a next-page cursor) are cached and replayed with the body.
+    """
+    body = payload if isinstance(payload, bytes) else dumps(jsonable_encoder(payload))
+    headers = headers or {}
+    if settings.RESPONSE_CACHE_TTL_SECONDS > 0:
+        response_cache.set(etag, (body, headers))
+    return Response(content=body, media_type="application/json", headers={**headers, "ETag": etag, "Cache-Control": CACHE_CONTROL})
@@ -7,10 +7,113 @@ load_dotenv()
 
 class Settings(BaseSettings):
     DATABASE_URL: str = os.getenv("DATABASE_URL")
+    # Engine profile; pool settings are ignored for in-memory SQLite
+    DB_ECHO: bool = os.getenv("DB_ECHO", False)
+    DB_POOL_SIZE: int = os.getenv("DB_POOL_SIZE", 10)
+    DB_MAX_OVERFLOW: int = os.getenv("DB_MAX_OVERFLOW", 20)
+    DB_POOL_TIMEOUT_SECONDS: float = os.getenv("DB_POOL_TIMEOUT_SECONDS", 30)
+    DB_POOL_RECYCLE_SECONDS: int = os.getenv("DB_POOL_RECYCLE_SECONDS", 1800)
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", True)
+    DB_STATEMENT_CACHE_SIZE: int = os.getenv("DB_STATEMENT_CACHE_SIZE", 500)
+    # Separate pool for heavy requests (rating runs, replays, exports); 0 shares the main pool
+    DB_HEAVY_POOL_SIZE: int = os.getenv("DB_HEAVY_POOL_SIZE", 3)
+    DB_HEAVY_MAX_OVERFLOW: int = os.getenv("DB_HEAVY_MAX_OVERFLOW", 0)
+    # Read routing: GET/HEAD sessions use DATABASE_READ_URL (or, for a SQLite file
+    # primary with DB_SQLITE_READ_POOL, a separate read-only pool on the same file)
+    DATABASE_READ_URL: str = os.getenv("DATABASE_READ_URL", "")
+    DB_SQLITE_READ_POOL: bool = os.getenv("DB_SQLITE_READ_POOL", False)
+    # Reads stay on the primary this long after any write in this process...
+    DB_REPLICA_LAG_SECONDS: float = os.getenv("DB_REPLICA_LAG_SECONDS", 2)
+    # ...and this long for the client that made the write
+    DB_READ_YOUR_WRITES_SECONDS: float = os.getenv("DB_READ_YOUR_WRITES_SECONDS", 10)
+    DB_READ_YOUR_WRITES_SIZE: int = os.getenv("DB_READ_YOUR_WRITES_SIZE", 10000)
+    # Per-request query stats: Server-Timing header and slow-request / N+1 warnings
+    QUERY_STATS_ENABLED: bool = os.getenv("QUERY_STATS_ENABLED", True)
+    SERVER_TIMING_HEADER: bool = os.getenv("SERVER_TIMING_HEADER", True)
+    SLOW_REQUEST_QUERY_COUNT: int = os.getenv("SLOW_REQUEST_QUERY_COUNT", 50)
+    SLOW_REQUEST_DB_MS: float = os.getenv("SLOW_REQUEST_DB_MS", 500)
+    N_PLUS_ONE_THRESHOLD: int = os.getenv("N_PLUS_ONE_THRESHOLD", 10)
+    # Prometheus scrape endpoint; when set, /metrics requires "Authorization: Bearer <token>"
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", True)
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")
+    # Logging: "text" or "json" lines on stderr, written off the event loop.
+    # LOG_LEVELS overrides per subsystem, e.g. "app.services.ratings=DEBUG,app.crud=WARNING"
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "text")
+    LOG_LEVELS: str = os.getenv("LOG_LEVELS", "")
+    # Admin profiling; off removes the middleware entirely
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", True)
+    PROFILE_SAMPLE_INTERVAL_MS: float = os.getenv("PROFILE_SAMPLE_INTERVAL_MS", 5)
+    PROFILE_MAX_SECONDS: float = os.getenv("PROFILE_MAX_SECONDS", 120)
+    PROFILE_STORE_SIZE: int = os.getenv("PROFILE_STORE_SIZE", 20)
+    PROFILE_TTL_SECONDS: float = os.getenv("PROFILE_TTL_SECONDS", 86400)
+    # Request tracing: finished traces kept in memory, optionally appended to a JSON-lines file
+    TRACING_ENABLED: bool = os.getenv("TRACING_ENABLED", True)
+    TRACE_BUFFER_SIZE: int = os.getenv("TRACE_BUFFER_SIZE", 500)
+    TRACE_MAX_SPANS: int = os.getenv("TRACE_MAX_SPANS", 2000)
+    TRACE_EXPORT_FILE: str = os.getenv("TRACE_EXPORT_FILE", "")
+    # Admission control: concurrent requests and wait-queue length per route class
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", True)
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", 10)
+    ADMISSION_HEAVY_CONCURRENCY: int = os.getenv("ADMISSION_HEAVY_CONCURRENCY", 2)
+    ADMISSION_HEAVY_QUEUE: int = os.getenv("ADMISSION_HEAVY_QUEUE", 8)
+    ADMISSION_AUTH_CONCURRENCY: int = os.getenv("ADMISSION_AUTH_CONCURRENCY", 32)
+    ADMISSION_AUTH_QUEUE: int = os.getenv("ADMISSION_AUTH_QUEUE", 128)
+    ADMISSION_WRITE_CONCURRENCY: int = os.getenv("ADMISSION_WRITE_CONCURRENCY", 32)
+    ADMISSION_WRITE_QUEUE: int = os.getenv("ADMISSION_WRITE_QUEUE", 128)
+    ADMISSION_READ_CONCURRENCY: int = os.getenv("ADMISSION_READ_CONCURRENCY", 256)
+    ADMISSION_READ_QUEUE: int = os.getenv("ADMISSION_READ_QUEUE", 1024)
+    # SQLite only, applied to every new connection
+    SQLITE_JOURNAL_MODE: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS: int = os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000)
+    SQLITE_MMAP_SIZE: int = os.getenv("SQLITE_MMAP_SIZE", 268435456)
+    # Negative values are KiB, as in PRAGMA cache_size
+    SQLITE_CACHE_SIZE: int = os.getenv("SQLITE_CACHE_SIZE", -65536)
     SECRET_KEY: str = os.getenv("SECRET_KEY")
     ALGORITHM: str = os.getenv("ALGORITHM")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30)
     REFRESH_TOKEN_EXPIRE_DAYS: int = os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 7)
+    REFRESH_TOKEN_PURGE_INTERVAL_SECONDS: int = os.getenv("REFRESH_TOKEN_PURGE_INTERVAL_SECONDS", 3600)
+    REFRESH_TOKEN_PURGE_BATCH_SIZE: int = os.getenv("REFRESH_TOKEN_PURGE_BATCH_SIZE", 1000)
+    REVOKED_TOKEN_FILTER_SIZE: int = os.getenv("REVOKED_TOKEN_FILTER_SIZE", 100000)
+
+    # Password hashing runs on its own executor; "process" scales across cores
+    BCRYPT_ROUNDS: int = os.getenv("BCRYPT_ROUNDS", 12)
+    PASSWORD_HASH_EXECUTOR: str = os.getenv("PASSWORD_HASH_EXECUTOR", "process")
+    PASSWORD_HASH_WORKERS: int = os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1)
+    PASSWORD_HASH_MAX_PENDING: int = os.getenv("PASSWORD_HASH_MAX_PENDING", 64)
+
+    # In-process cache of authenticated users (per worker)
+    PRINCIPAL_CACHE_SIZE: int = os.getenv("PRINCIPAL_CACHE_SIZE", 10000)
+    PRINCIPAL_CACHE_TTL_SECONDS: float = os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", 30)
+    PREPARER_ACL_CACHE_SIZE: int = os.getenv("PREPARER_ACL_CACHE_SIZE", 5000)
+    PREPARER_ACL_CACHE_TTL_SECONDS: float = os.getenv("PREPARER_ACL_CACHE_TTL_SECONDS", 300)
+    # ETag versions and materialized leaderboards only see this worker's writes, so they
+    # are renewed this often to pick up writes made by other workers; 0 never renews them
+    WORKER_STATE_TTL_SECONDS: float = os.getenv("WORKER_STATE_TTL_SECONDS", 30)
+    # Rendered GET responses keyed by ETag; 0 disables the response cache
+    RESPONSE_CACHE_SIZE: int = os.getenv("RESPONSE_CACHE_SIZE", 2000)
+    RESPONSE_CACHE_TTL_SECONDS: float = os.getenv("RESPONSE_CACHE_TTL_SECONDS", 0)
+    AS_OF_LEADERBOARD_CACHE_SIZE: int = os.getenv("AS_OF_LEADERBOARD_CACHE_SIZE", 256)
+    AS_OF_LEADERBOARD_CACHE_TTL_SECONDS: float = os.getenv("AS_OF_LEADERBOARD_CACHE_TTL_SECONDS", 3600)
+
+    # Codeforces API; the stub serves recorded fixtures / synthetic data instead of the network
+    CODEFORCES_API_URL: str = os.getenv("CODEFORCES_API_URL", "https://codeforces.com/api/")
+    CODEFORCES_USER_TIMEOUT: float = os.getenv("CODEFORCES_USER_TIMEOUT", 3)
+    CODEFORCES_STANDINGS_TIMEOUT: float = os.getenv("CODEFORCES_STANDINGS_TIMEOUT", 8)
+    CODEFORCES_BREAKER_FAILURES: int = os.getenv("CODEFORCES_BREAKER_FAILURES", 5)
+    CODEFORCES_BREAKER_SLOW_SECONDS: float = os.getenv("CODEFORCES_BREAKER_SLOW_SECONDS", 2)
+    CODEFORCES_BREAKER_RESET_SECONDS: float = os.getenv("CODEFORCES_BREAKER_RESET_SECONDS", 30)
+    CODEFORCES_FALLBACK_TTL_SECONDS: int = os.getenv("CODEFORCES_FALLBACK_TTL_SECONDS", 86400)
+    CODEFORCES_STUB: bool = os.getenv("CODEFORCES_STUB", False)
+    CODEFORCES_STUB_FIXTURES_DIR: str = os.getenv("CODEFORCES_STUB_FIXTURES_DIR", "")
+    CODEFORCES_STUB_ROWS: int = os.getenv("CODEFORCES_STUB_ROWS", 100)
+    CODEFORCES_STUB_LATENCY_MS: float = os.getenv("CODEFORCES_STUB_LATENCY_MS", 0)
+    CODEFORCES_STUB_ERROR_RATE: float = os.getenv("CODEFORCES_STUB_ERROR_RATE", 0)
+    CODEFORCES_STUB_THROTTLE_RATE: float = os.getenv("CODEFORCES_STUB_THROTTLE_RATE", 0)
+    CODEFORCES_STUB_SEED: int = os.getenv("CODEFORCES_STUB_SEED", 0)
+    CODEFORCES_RECORD_DIR: str = os.getenv("CODEFORCES_RECORD_DIR", "")
 
     class Config:
         env_file = ".env"
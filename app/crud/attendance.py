@@ -4,15 +4,25 @@ from app import models
 from typing import List
 from app.services.codeforces import get_codeforces_standings_handles
 from app.schemas import  user_schemas
+from app.schemas import attendance_schemas
 from app.models import ContestDataSnapshot
-import datetime, asyncio
+import datetime, asyncio, logging
 import enum
 from app.crud.contests import get_contest
+from app.cache import principal_cache, resource_versions
+from app.db import is_dry_run
+from app import metrics
+from app.tracing import traced
+from app.services.leaderboard import leaderboard_store
+from app.crud.standings import get_contest_standings
+from app.crud.ratings import save_rating_snapshot
 from app.services.ratings import Codeforces
 from app.models import AttendanceStatus
 from app.models import ContestDataSnapshot
 from app.models import Contest, AttendanceStatus
 
+logger = logging.getLogger(__name__)
+
 def to_serializable(obj):
     if isinstance(obj, enum.Enum):
         return obj.value
@@ -24,6 +34,21 @@ def to_serializable(obj):
         return [to_serializable(i) for i in obj]
     return obj
 
+def merge_attendance(previous: list, changes: list) -> list:
+    """
+    Overlay attendance changes on a previous attendance list, keyed by user_id.
+    Snapshot dicts are converted back into AttendanceCreate records.
+    """
+    merged = {}
+    for record in previous:
+        if isinstance(record, dict):
+            record = attendance_schemas.AttendanceCreate(**record)
+        merged[int(record.user_id)] = record
+    for record in changes:
+        merged[int(record.user_id)] = record
+    return list(merged.values())
+
+@traced()
 async def record_attendance(db: AsyncSession, contest_id: str, user_id: int, status: models.AttendanceStatus, commit=True):
     """
     Insert or update attendance record for a participant.
@@ -72,7 +97,6 @@ async def fetch_contest_attendance(db: AsyncSession, contest_id: str):
     Returns a list of all attendance records for a specific contest_id,
     including user info and attendance status.
     """
-    print("fetching contest attendance for contest:", contest_id)
     result = await db.execute(
         select(models.Attendance, models.User)
         .join(models.User, models.Attendance.user_id == models.User.id)
@@ -90,6 +114,7 @@ async def fetch_contest_attendance(db: AsyncSession, contest_id: str):
         })
     return results
 
+@traced()
 async def apply_rating_update(db: AsyncSession, user_id: int, delta: int, commit=True):
     """
     Update the user's rating by adding delta. Returns the updated user object.
@@ -103,11 +128,17 @@ async def apply_rating_update(db: AsyncSession, user_id: int, delta: int, commit
     user.rating = (user.rating or 0) + delta
     db.add(user)
     await db.commit()
+    if not is_dry_run(db):
+        principal_cache.invalidate(handle=user.codeforces_handle, user_id=user.id)
+        leaderboard_store.update_user(user)
+        resource_versions.bump("user", user.id)
+        resource_versions.bump("contests")
     await db.refresh(user)
 
     return user
 
 
+@traced()
 async def record_rating_history_batch(db: AsyncSession, rating_summary: list):
     """
     Batch insert RatingHistory records from a list of rating summary dicts.
@@ -123,7 +154,14 @@ async def record_rating_history_batch(db: AsyncSession, rating_summary: list):
         db.add(history_record)
 
     await db.commit()
+    if is_dry_run(db):
+        return
+    # Attendance written by the caller is committed by now as well
+    for entry in rating_summary:
+        resource_versions.bump("user", int(entry['user_id']))
+    resource_versions.bump("contests")
 
+@traced()
 async def rollback_contest_ratings_and_attendance(db: AsyncSession, contest_id: str):
     """
     Revert all users' ratings and attendance for a contest to the state before the contest.
@@ -131,50 +169,67 @@ async def rollback_contest_ratings_and_attendance(db: AsyncSession, contest_id:
     - Deletes all RatingHistory entries for this contest
     - Deletes all Attendance records for this contest
     """
-    print(f"[ROLLBACK] Starting rollback for contest_id={contest_id}")
+    logger.info("Rolling back contest %s", contest_id)
     # 1. Revert user ratings
     histories_result = await db.execute(select(models.RatingHistory).filter(models.RatingHistory.contest_id == contest_id))
     histories = histories_result.scalars().all()
+    reverted_users = []
     for history in histories:
         user_result = await db.execute(select(models.User).filter(models.User.id == int(history.user_id)))
         user = user_result.scalars().first()
         if user:
-            print(f"[ROLLBACK] Reverting user_id={user.id} rating from {user.rating} to {history.old_rating}")
+            logger.debug("Reverting user %s rating from %s to %s", user.id, user.rating, history.old_rating)
             user.rating = history.old_rating
             db.add(user)
+            reverted_users.append(user)
     # 2. Delete RatingHistory entries
     await db.execute(delete(models.RatingHistory).filter(models.RatingHistory.contest_id == contest_id))
-    print(f"[ROLLBACK] Deleted RatingHistory entries for contest_id={contest_id}")
+    logger.debug("Deleted rating history of contest %s", contest_id)
     # 3. Delete Attendance records
     await db.execute(delete(models.Attendance).filter(models.Attendance.contest_id == contest_id))
-    print(f"[ROLLBACK] Deleted Attendance records for contest_id={contest_id}")
+    logger.debug("Deleted attendance of contest %s", contest_id)
     await db.commit()
-    print(f"[ROLLBACK] Rollback complete for contest_id={contest_id}")
+    if not is_dry_run(db):
+        for user in reverted_users:
+            principal_cache.invalidate(handle=user.codeforces_handle, user_id=user.id)
+            leaderboard_store.update_user(user)
+            resource_versions.bump("user", user.id)
+        resource_versions.bump("contests")
+    logger.info("Rolled back contest %s: %d ratings reverted", contest_id, len(reverted_users))
 
-async def save_contest_data_snapshot(db: AsyncSession, contest_id: str, attendance: list, ranking_data: list):
+@traced()
+async def save_contest_data_snapshot(db: AsyncSession, contest_id: str, attendance: list, ranking_data: list, standings_version: int = None):
     """
     Save or update the contest data snapshot for a contest.
+    When standings_version is given the ranking data is already stored in
+    contest_standings, so only the version is kept on the snapshot row.
     """
     attendance_serializable = [to_serializable(a) for a in attendance]
-    ranking_data_serializable = [to_serializable(r) for r in ranking_data]
+    if standings_version is not None:
+        ranking_data_serializable = []
+    else:
+        ranking_data_serializable = [to_serializable(r) for r in ranking_data]
 
     result = await db.execute(select(ContestDataSnapshot).filter(ContestDataSnapshot.contest_id == contest_id))
     existing = result.scalars().first()
     if existing:
-        print(f"[SNAPSHOT] Updating existing snapshot for contest_id={contest_id}")
+        logger.debug("Updating snapshot of contest %s", contest_id)
         existing.attendance_snapshot = attendance_serializable
         existing.ranking_data_snapshot = ranking_data_serializable
+        existing.standings_version = standings_version
         existing.created_at = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
     else:
-        print(f"[SNAPSHOT] Creating new snapshot for contest_id={contest_id}")
+        logger.debug("Creating snapshot of contest %s", contest_id)
         snapshot = ContestDataSnapshot(
             contest_id=contest_id,
             attendance_snapshot=attendance_serializable,
-            ranking_data_snapshot=ranking_data_serializable
+            ranking_data_snapshot=ranking_data_serializable,
+            standings_version=standings_version
         )
         db.add(snapshot)
     await db.commit()
 
+@traced()
 async def fetch_contest_data_snapshot(db: AsyncSession, contest_id: str):
     """
     Fetch the contest data snapshot for a contest.
@@ -183,12 +238,33 @@ async def fetch_contest_data_snapshot(db: AsyncSession, contest_id: str):
     result = await db.execute(select(ContestDataSnapshot).filter(ContestDataSnapshot.contest_id == contest_id))
     snap = result.scalars().first()
     if snap:
-        print(f"[SNAPSHOT] Fetched snapshot for contest_id={contest_id}")
+        logger.debug("Fetched snapshot of contest %s", contest_id)
+        if snap.standings_version is not None:
+            standings = await get_contest_standings(db, contest_id)
+            if not standings:
+                raise ValueError(f"No cached standings found for contest {contest_id}")
+            if standings.version != snap.standings_version:
+                raise ValueError(
+                    f"Snapshot of contest {contest_id} was rated with standings version "
+                    f"{snap.standings_version}, but version {standings.version} is stored"
+                )
+            return snap.attendance_snapshot, standings.rows
         return snap.attendance_snapshot, snap.ranking_data_snapshot
-    print(f"[SNAPSHOT] No snapshot found for contest_id={contest_id}")
+    logger.warning("No snapshot found for contest %s", contest_id)
     raise ValueError(f"No snapshot found for contest {contest_id}")
 
 
+async def fetch_snapshot_attendance(db: AsyncSession, contest_id: str) -> list:
+    """
+    The attendance stored in a contest's snapshot, or [] if it has none.
+    """
+    result = await db.execute(
+        select(ContestDataSnapshot.attendance_snapshot).filter(ContestDataSnapshot.contest_id == contest_id)
+    )
+    return result.scalars().first() or []
+
+
+@traced()
 async def get_subsequent_contests(db: AsyncSession, contest_id: str):
     """
     Return all contests in the same division with date > given contest, ordered by date.
@@ -196,7 +272,7 @@ async def get_subsequent_contests(db: AsyncSession, contest_id: str):
     base_contest_result = await db.execute(select(Contest).filter(Contest.id == contest_id))
     base_contest = base_contest_result.scalars().first()
     if not base_contest:
-        print(f"[REPLAY] Contest {contest_id} not found.")
+        logger.warning("Contest %s not found", contest_id)
         return []
     contests_result = await db.execute(
         select(Contest)
@@ -207,14 +283,16 @@ async def get_subsequent_contests(db: AsyncSession, contest_id: str):
         .order_by(Contest.date.asc())
     )
     contests = contests_result.scalars().all()
-    print(f"[REPLAY] Found {len(contests)} subsequent contests after {contest_id}.")
+    logger.info("Found %d contests after %s", len(contests), contest_id)
     return contests
 
+@traced()
+@metrics.replay_seconds.timed("contest")
 async def replay_contest(db: AsyncSession, contest_id: str):
     """
     Rollback and reapply a single contest using its stored snapshot.
     """
-    print(f"[REPLAY] Replaying contest {contest_id}")
+    logger.info("Replaying contest %s", contest_id)
     await rollback_contest_ratings_and_attendance(db, contest_id)
     try:
         attendance, ranking_data = await fetch_contest_data_snapshot(db, contest_id)
@@ -250,8 +328,12 @@ async def replay_contest(db: AsyncSession, contest_id: str):
             })
     await record_rating_history_batch(db, rating_summary)
     await db.commit()
-    print(f"[REPLAY] Finished replay for contest {contest_id}")
+    await save_rating_snapshot(db, contest)
+    metrics.replayed_contests.inc()
+    logger.info("Replayed contest %s: %d rating updates", contest_id, len(rating_summary))
 
+@traced()
+@metrics.replay_seconds.timed("subsequent")
 async def replay_subsequent_contests(db: AsyncSession, contest_id: str):
     """
     Rollback and replay all subsequent contests after the given contest.
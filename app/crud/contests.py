@@ -1,6 +1,10 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from app import models
+from app.cache import preparer_acl_cache, resource_versions
 from app.schemas import contest_schemas
+from app.pagination import keyset
+from app.streaming import stream_row_chunks
+from app.crud.users import USER_READ_COLUMNS
 from typing import List, Optional
 from sqlalchemy import delete, select
 from sqlalchemy.orm import selectinload
@@ -38,6 +42,8 @@ async def create_contest(db: AsyncSession, contest_in: contest_schemas.ContestCr
         ))
 
     await db.commit()
+    preparer_acl_cache.pop(contest.id)
+    resource_versions.bump("contests")
     return contest
 
 async def get_contest(db: AsyncSession, contest_id: str) -> Optional[models.Contest]:
@@ -49,6 +55,24 @@ async def get_contest(db: AsyncSession, contest_id: str) -> Optional[models.Cont
     return result.scalars().first()
 
 
+async def get_preparer_acl(db: AsyncSession, contest_id: str) -> frozenset:
+    """
+    Return the ids of users allowed to take attendance for a contest.
+    The whole ACL is loaded in one query and cached until a preparer change.
+    """
+    acl = preparer_acl_cache.get(contest_id)
+    if acl is None:
+        result = await db.execute(
+            select(models.contest_preparer_table.c.user_id).where(
+                models.contest_preparer_table.c.contest_id == contest_id,
+                models.contest_preparer_table.c.can_take_attendance == True
+            )
+        )
+        acl = frozenset(result.scalars().all())
+        preparer_acl_cache.set(contest_id, acl)
+    return acl
+
+
 async def add_preparers_to_contest(db: AsyncSession, contest_id: str, preparer_ids: List[str]) -> models.Contest:
     result = await db.execute(
         select(models.Contest).options(selectinload(models.Contest.preparers)).filter(models.Contest.id == contest_id)
@@ -68,6 +92,8 @@ async def add_preparers_to_contest(db: AsyncSession, contest_id: str, preparer_i
             ))
 
     await db.commit()
+    preparer_acl_cache.pop(contest_id)
+    resource_versions.bump("contests")
     await db.refresh(contest)
     return contest
 
@@ -86,30 +112,11 @@ async def remove_preparers_from_contest(db: AsyncSession, contest_id: str, prepa
     )
     await db.execute(stmt)
     await db.commit()
+    preparer_acl_cache.pop(contest_id)
+    resource_versions.bump("contests")
     await db.refresh(contest)
     return contest
 
-async def get_user_contests(db: AsyncSession, user) -> list[models.Contest]:
-    """
-    Return all contests the user has participated in (attendance), or all contests if admin.
-    """
-    from app.models import UserRole, Contest, Attendance
-    if user.role == UserRole.Admin:
-        result = await db.execute(
-            select(Contest)
-            .options(selectinload(Contest.preparers))
-        )
-        return result.scalars().all()
-    else:
-        result = await db.execute(
-            select(Contest)
-            .options(selectinload(Contest.preparers))
-            .join(Attendance, Contest.id == Attendance.contest_id)
-            .filter(Attendance.user_id == user.id)
-        )
-        return result.scalars().all()
-    
-
 async def get_contests_by_division(db: AsyncSession, division: str) -> list[models.Contest]:
     """
     Return all contests for a given division (e.g., 'Div1' or 'Div2').
@@ -121,6 +128,66 @@ async def get_contests_by_division(db: AsyncSession, division: str) -> list[mode
     )
     return result.scalars().all()
 
+
+CONTEST_ORDER = [models.Contest.date, models.Contest.id]
+
+# Columns of ContestRead, preparers excluded
+CONTEST_READ_COLUMNS = (
+    models.Contest.link, models.Contest.name, models.Contest.division,
+    models.Contest.id, models.Contest.date,
+)
+
+
+async def get_contest_rows(db: AsyncSession, user=None, division: Optional[str] = None,
+                           after: Optional[tuple] = None, limit: Optional[int] = None):
+    """
+    ContestRead columns as Core rows, ordered by (date, id); `after` is the
+    (date, id) of the last contest of the previous page. With a non-admin
+    user, only contests they have attendance for are returned.
+    """
+    stmt = select(*CONTEST_READ_COLUMNS)
+    if user is not None and user.role != models.UserRole.Admin:
+        stmt = stmt.join(models.Attendance, models.Contest.id == models.Attendance.contest_id).filter(
+            models.Attendance.user_id == user.id
+        )
+    if division is not None:
+        stmt = stmt.filter(models.Contest.division == division)
+    result = await db.execute(keyset(stmt, CONTEST_ORDER, after, limit))
+    return result.all()
+
+
+async def get_preparer_rows(db: AsyncSession, contest_ids: List[str]) -> dict:
+    """
+    contest_id -> UserRead rows of its preparers, in one query for all contests.
+    """
+    preparers = {contest_id: [] for contest_id in contest_ids}
+    if not contest_ids:
+        return preparers
+    link = models.contest_preparer_table.c
+    result = await db.execute(
+        select(link.contest_id, *USER_READ_COLUMNS)
+        .select_from(models.User)
+        .join(models.contest_preparer_table, models.User.id == link.user_id)
+        .filter(link.contest_id.in_(contest_ids))
+        .order_by(link.contest_id, models.User.id)
+    )
+    for row in result.all():
+        preparers[row.contest_id].append(row)
+    return preparers
+
+
+async def stream_contest_rows(db: AsyncSession, division: Optional[str] = None):
+    """
+    Yield (contest rows, preparers by contest id) per chunk of contests read
+    through a server-side cursor in (date, id) order.
+    """
+    stmt = select(*CONTEST_READ_COLUMNS)
+    if division is not None:
+        stmt = stmt.filter(models.Contest.division == division)
+    async for chunk in stream_row_chunks(db, stmt.order_by(*CONTEST_ORDER)):
+        yield chunk, await get_preparer_rows(db, [row.id for row in chunk])
+
+
 async def update_contest_preparers(db: AsyncSession, contest_id: str, preparers: List[str]) -> models.Contest:
     """
     Update the preparers for a specific contest.
@@ -149,5 +216,7 @@ async def update_contest_preparers(db: AsyncSession, contest_id: str, preparers:
         ))
 
     await db.commit()
+    preparer_acl_cache.pop(contest_id)
+    resource_versions.bump("contests")
     await db.refresh(contest)
     return contest
@@ -0,0 +1,67 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from app import models
+from app.streaming import stream_row_chunks
+from typing import Optional
+import datetime
+
+CONTEST_COLUMNS = (
+    models.Contest.id.label("contest_id"),
+    models.Contest.name.label("contest_name"),
+    models.Contest.date.label("contest_date"),
+    models.Contest.division,
+)
+
+USER_COLUMNS = (
+    models.User.id.label("user_id"),
+    models.User.name,
+    models.User.codeforces_handle,
+)
+
+RATING_HISTORY_EXPORT_COLUMNS = [
+    c.key for c in CONTEST_COLUMNS + USER_COLUMNS
+] + ["old_rating", "new_rating", "timestamp"]
+
+ATTENDANCE_EXPORT_COLUMNS = [c.key for c in CONTEST_COLUMNS + USER_COLUMNS] + ["status"]
+
+
+def _filter_contests(stmt, division: Optional[str], since: Optional[datetime.date], until: Optional[datetime.date]):
+    """Restrict to contests of a division held between since and until (both inclusive)."""
+    if division is not None:
+        stmt = stmt.filter(models.Contest.division == division)
+    if since is not None:
+        stmt = stmt.filter(models.Contest.date >= datetime.datetime.combine(since, datetime.time.min))
+    if until is not None:
+        stmt = stmt.filter(models.Contest.date < datetime.datetime.combine(until + datetime.timedelta(days=1), datetime.time.min))
+    return stmt.order_by(models.Contest.date, models.Contest.id, models.User.id)
+
+
+def stream_rating_history_rows(db: AsyncSession, division: Optional[str] = None,
+                               since: Optional[datetime.date] = None, until: Optional[datetime.date] = None):
+    """
+    Chunks of rating history joined with its contest and user, in contest
+    date order, read through a server-side cursor.
+    """
+    history = models.RatingHistory
+    stmt = (
+        select(*CONTEST_COLUMNS, *USER_COLUMNS, history.old_rating, history.new_rating, history.timestamp)
+        .select_from(history)
+        .join(models.Contest, models.Contest.id == history.contest_id)
+        .join(models.User, models.User.id == history.user_id)
+    )
+    return stream_row_chunks(db, _filter_contests(stmt, division, since, until))
+
+
+def stream_attendance_rows(db: AsyncSession, division: Optional[str] = None,
+                           since: Optional[datetime.date] = None, until: Optional[datetime.date] = None):
+    """
+    Chunks of attendance records joined with their contest and user, in
+    contest date order, read through a server-side cursor.
+    """
+    stmt = (
+        select(*CONTEST_COLUMNS, *USER_COLUMNS, models.Attendance.status)
+        .select_from(models.Attendance)
+        .join(models.Contest, models.Contest.id == models.Attendance.contest_id)
+        .join(models.User, models.User.id == models.Attendance.user_id)
+    )
+    return stream_row_chunks(db, _filter_contests(stmt, division, since, until))
@@ -1,10 +1,16 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, func
 from app import models
+from app.cache import principal_cache, as_of_leaderboard_cache
+from app.db import is_dry_run
 from app.schemas import contest_schemas
 from typing import List, Optional
+from app.tracing import traced
 from datetime import datetime, timezone
 
+# users.rating of a user who has not been rated yet
+INITIAL_RATING = models.User.__table__.c.rating.default.arg
+
 
 async def log_rating_change(db: AsyncSession, user_id: int, contest_id: str, old_rating: int, new_rating: int):
     history_entry = models.RatingHistory(
@@ -50,6 +56,7 @@ async def update_rating(db: AsyncSession, user_id: int, new_rating: int) -> mode
     rating.current_rating = new_rating
     rating.last_updated = datetime.now(timezone.utc).replace(tzinfo=None)
     await db.commit()
+    principal_cache.invalidate(user_id=user_id)
     await db.refresh(rating)
     return rating
 
@@ -62,23 +69,109 @@ async def apply_absence_penality(db: AsyncSession, user_id: int, penality: int)
     rating.current_rating = max(0, rating.current_rating - penality)
     rating.last_updated = datetime.now(timezone.utc).replace(tzinfo=None)
     await db.commit()
+    principal_cache.invalidate(user_id=user_id)
     await db.refresh(rating)
     return rating
 
 
-async def get_leaderboard(db: AsyncSession, division: Optional[models.Division] = None) -> List[tuple[models.User, models.Rating]]:
+async def get_leaderboard(db: AsyncSession, division: Optional[models.Division] = None):
     """
-    Get the leaderboard of users sorted by their ratings.
-    Optionally filter by division.
+    Get the leaderboard rows (id, name, codeforces_handle, division, rating)
+    of active users, sorted by rating. Optionally filter by division.
+    users.rating is the column the attendance/rating writes keep up to date.
     """
     query = (
-        select(models.User, models.Rating)
-        .join(models.Rating, models.User.id == models.Rating.user_id)
+        select(
+            models.User.id,
+            models.User.name,
+            models.User.codeforces_handle,
+            models.User.division,
+            models.User.rating
+        )
         .filter(models.User.status == models.UserStatus.Active)
     )
 
     if division:
         query = query.filter(models.User.division == division)
 
-    result = await db.execute(query.order_by(models.Rating.current_rating.desc()))
+    result = await db.execute(query.order_by(models.User.rating.desc(), models.User.id.asc()))
+    return result.all()
+
+
+@traced()
+async def save_rating_snapshot(db: AsyncSession, contest: models.Contest) -> list:
+    """
+    Store the current ratings of the contest's active division users as the
+    state right after this contest. Call once the contest's ratings are committed.
+    """
+    result = await db.execute(
+        select(models.User.id, models.User.rating)
+        .filter(models.User.division == contest.division, models.User.status == models.UserStatus.Active)
+    )
+    ratings = [[user_id, rating] for user_id, rating in result.all()]
+
+    snapshot = await db.get(models.ContestRatingSnapshot, contest.id)
+    if snapshot:
+        snapshot.division = contest.division
+        snapshot.ratings = ratings
+        snapshot.created_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    else:
+        db.add(models.ContestRatingSnapshot(contest_id=contest.id, division=contest.division, ratings=ratings))
+    await db.commit()
+    if not is_dry_run(db):
+        as_of_leaderboard_cache.pop(contest.id)
+    return ratings
+
+
+async def get_rating_snapshot(db: AsyncSession, contest: models.Contest) -> list:
+    """
+    Return [[user_id, rating], ...] for the contest's division as of this contest.
+    Contests rated before snapshots existed are rebuilt once and stored. Like
+    save_rating_snapshot, the rebuild covers every active division user: their
+    latest RatingHistory entry up to this contest's date, or the initial
+    rating if they have none yet.
+    """
+    snapshot = await db.get(models.ContestRatingSnapshot, contest.id)
+    if snapshot:
+        return snapshot.ratings
+
+    latest = (
+        select(
+            models.RatingHistory.user_id,
+            models.RatingHistory.new_rating,
+            func.row_number().over(
+                partition_by=models.RatingHistory.user_id,
+                order_by=(models.Contest.date.desc(), models.RatingHistory.id.desc())
+            ).label("row_number")
+        )
+        .join(models.Contest, models.Contest.id == models.RatingHistory.contest_id)
+        .filter(models.Contest.division == contest.division, models.Contest.date <= contest.date)
+        .subquery()
+    )
+    history = select(latest.c.user_id, latest.c.new_rating).filter(latest.c.row_number == 1).subquery()
+    result = await db.execute(
+        select(models.User.id, history.c.new_rating)
+        .outerjoin(history, history.c.user_id == models.User.id)
+        .filter(models.User.division == contest.division, models.User.status == models.UserStatus.Active)
+    )
+    rows = result.all()
+    ratings = [[user_id, INITIAL_RATING if rating is None else rating] for user_id, rating in rows]
+
+    # Nothing to store for a contest that has not been rated yet
+    if any(rating is not None for _, rating in rows):
+        db.add(models.ContestRatingSnapshot(contest_id=contest.id, division=contest.division, ratings=ratings))
+        await db.commit()
+    return ratings
+
+
+async def get_leaderboard_users(db: AsyncSession, user_ids: list):
+    """
+    Return (id, name, codeforces_handle) rows for the given user ids.
+    """
+    if not user_ids:
+        return []
+    result = await db.execute(
+        select(models.User.id, models.User.name, models.User.codeforces_handle)
+        .filter(models.User.id.in_(user_ids))
+    )
     return result.all()
\ No newline at end of file
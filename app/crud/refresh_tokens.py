@@ -1,28 +1,64 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, delete, insert, update
 from app import models
+from app.cache import revoked_refresh_tokens
+from app.security import token_digest
 from datetime import datetime, timedelta, timezone
 
-async def create_refresh_token(db: AsyncSession, user_id: int, token: str, expires_in: timedelta) -> models.RefreshToken:
-    expires_at_aware = datetime.now(timezone.utc) + expires_in
-    expires_at_naive = expires_at_aware.replace(tzinfo=None)
-    
+def _insert_refresh_token(user_id: int, token: str, expires_in: timedelta):
     created_at_aware = datetime.now(timezone.utc)
     created_at_naive = created_at_aware.replace(tzinfo=None)
-    
-    db_token = models.RefreshToken(
+    expires_at_naive = (created_at_aware + expires_in).replace(tzinfo=None)
+
+    return insert(models.RefreshToken).values(
         user_id=user_id,
-        token=token,
+        token_digest=token_digest(token),
         expires_at=expires_at_naive,
-        created_at=created_at_naive
+        created_at=created_at_naive,
+        is_revoked=False
+    )
+
+async def create_refresh_token(db: AsyncSession, user_id: int, token: str, expires_in: timedelta):
+    """
+    Store a new refresh token: a single INSERT and commit, no read-back.
+    """
+    await db.execute(_insert_refresh_token(user_id, token, expires_in))
+    await db.commit()
+
+async def rotate_refresh_token(db: AsyncSession, old_token: str, handle: str, new_token: str, expires_in: timedelta) -> int | None:
+    """
+    Revoke old_token and store new_token in one transaction.
+    The revoke is a single conditional UPDATE that only matches a live token
+    owned by the user with this handle, so concurrent reuse of the same token
+    can rotate it at most once. Returns the user id, or None (nothing written)
+    if the token is unknown, revoked, expired or not the user's.
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    owner_id = select(models.User.id).where(models.User.codeforces_handle == handle).scalar_subquery()
+    result = await db.execute(
+        update(models.RefreshToken)
+        .where(
+            models.RefreshToken.token_digest == token_digest(old_token),
+            models.RefreshToken.is_revoked.isnot(True),
+            models.RefreshToken.expires_at > now,
+            models.RefreshToken.user_id == owner_id
+        )
+        .values(is_revoked=True)
+        .returning(models.RefreshToken.user_id, models.RefreshToken.expires_at)
     )
-    db.add(db_token)
+    row = result.first()
+    if row is None:
+        await db.rollback()
+        return None
+
+    user_id, old_expires_at = row
+    await db.execute(_insert_refresh_token(user_id, new_token, expires_in))
     await db.commit()
-    await db.refresh(db_token)
-    return db_token
+    revoked_refresh_tokens.add(token_digest(old_token), old_expires_at.replace(tzinfo=timezone.utc).timestamp())
+    return user_id
 
 async def get_refresh_token(db: AsyncSession, token: str) -> models.RefreshToken | None:
-    result = await db.execute(select(models.RefreshToken).filter(models.RefreshToken.token == token))
+    result = await db.execute(select(models.RefreshToken).filter(models.RefreshToken.token_digest == token_digest(token)))
     return result.scalars().first()
 
 async def revoke_refresh_token(db: AsyncSession, token: str):
@@ -30,3 +66,31 @@ async def revoke_refresh_token(db: AsyncSession, token: str):
     if db_token:
         db_token.is_revoked = True
         await db.commit()
+        revoked_refresh_tokens.add(db_token.token_digest, db_token.expires_at.replace(tzinfo=timezone.utc).timestamp())
+
+def is_known_revoked(token: str) -> bool:
+    """
+    True if this process has seen the token revoked; no DB access.
+    """
+    return token_digest(token) in revoked_refresh_tokens
+
+async def purge_refresh_tokens(db: AsyncSession, batch_size: int = 1000) -> int:
+    """
+    Delete expired and revoked refresh tokens in batches of batch_size rows,
+    committing after each batch so locks stay short. Returns the number of rows deleted.
+    Expired and revoked tokens are purged in separate passes, each read off its
+    own index (expires_at, ix_refresh_tokens_revoked) instead of scanning the
+    table for either condition.
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    purged = 0
+    for stale in (models.RefreshToken.expires_at < now, models.RefreshToken.is_revoked == True):
+        while True:
+            result = await db.execute(select(models.RefreshToken.id).filter(stale).limit(batch_size))
+            ids = result.scalars().all()
+            if not ids:
+                break
+            await db.execute(delete(models.RefreshToken).filter(models.RefreshToken.id.in_(ids)))
+            await db.commit()
+            purged += len(ids)
+    return purged
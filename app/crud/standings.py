@@ -0,0 +1,84 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
+from app import models
+from app.services.codeforces import extract_contest_id, get_codeforces_standings_rows
+from typing import Optional
+from app.tracing import traced
+import datetime
+
+
+class StandingsVersionMismatch(ValueError):
+    pass
+
+
+async def get_contest_standings(db: AsyncSession, contest_id: str) -> Optional[models.ContestStandings]:
+    result = await db.execute(
+        select(models.ContestStandings).filter(models.ContestStandings.contest_id == contest_id)
+    )
+    return result.scalars().first()
+
+
+@traced()
+async def ingest_contest_standings(db: AsyncSession, contest: models.Contest, refresh: bool = False) -> models.ContestStandings:
+    """
+    Fetch the final standings for a contest from Codeforces and store them once.
+    An existing row is returned as-is unless refresh is set; a refresh only bumps
+    the version when the fetched rows actually differ. A contest snapshot pinned
+    to the replaced version gets a copy of the old rows, so replays keep rating
+    from the standings the contest was rated with.
+    """
+    existing = await get_contest_standings(db, contest.id)
+    if existing and not refresh:
+        return existing
+
+    codeforces_contest_id = extract_contest_id(contest.link)
+    rows = await get_codeforces_standings_rows(contest.link)
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+    if existing:
+        if existing.rows != rows:
+            await db.execute(
+                update(models.ContestDataSnapshot)
+                .where(
+                    models.ContestDataSnapshot.contest_id == contest.id,
+                    models.ContestDataSnapshot.standings_version == existing.version
+                )
+                .values(ranking_data_snapshot=existing.rows, standings_version=None)
+            )
+            existing.rows = rows
+            existing.version = existing.version + 1
+        existing.codeforces_contest_id = codeforces_contest_id
+        existing.fetched_at = now
+        standings = existing
+    else:
+        standings = models.ContestStandings(
+            contest_id=contest.id,
+            codeforces_contest_id=codeforces_contest_id,
+            version=1,
+            rows=rows,
+            fetched_at=now
+        )
+        db.add(standings)
+
+    await db.commit()
+    await db.refresh(standings)
+    return standings
+
+
+@traced()
+async def resolve_ranking_data(db: AsyncSession, contest: models.Contest, ranking_data: Optional[list], standings_version: Optional[int]):
+    """
+    Returns (ranking_data, standings_version) for an attendance submission.
+    Client-posted ranking_data is used as-is; otherwise the cached server-side
+    standings are used (ingested on first use) and the version the client
+    rated against must match the stored one.
+    """
+    if ranking_data is not None:
+        return ranking_data, None
+
+    standings = await ingest_contest_standings(db, contest)
+    if standings_version is not None and standings_version != standings.version:
+        raise StandingsVersionMismatch(
+            f"Standings version {standings_version} is stale, current version is {standings.version}"
+        )
+    return standings.rows, standings.version
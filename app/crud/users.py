@@ -2,9 +2,13 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, exc
 from ..models import Division, User, UserStatus
 from ..schemas.user_schemas import UserCreate
-from ..security import hash_password
-from fastapi.concurrency import run_in_threadpool
+from ..security import password_hasher
 from app import models
+from app.cache import principal_cache, resource_versions
+from app.services.leaderboard import leaderboard_store
+from app.pagination import keyset
+from app.streaming import stream_row_chunks
+from typing import Optional
 
 
 async def get_user_by_handle(db: AsyncSession, handle: str):
@@ -12,12 +16,44 @@ async def get_user_by_handle(db: AsyncSession, handle: str):
     result = await db.execute(select(User).filter(User.codeforces_handle == handle))
     return result.scalars().first()
 
-async def get_users_by_division(db: AsyncSession, division: str):
-    result = await db.execute(select(User).filter(User.division == division))
+async def get_users_by_division(db: AsyncSession, division: str, after: Optional[tuple] = None, limit: Optional[int] = None):
+    """
+    Users in a division ordered by id; `after` is the last id of the previous page.
+    """
+    stmt = keyset(select(User).filter(User.division == division), [User.id], after, limit)
+    result = await db.execute(stmt)
     return result.scalars().all()
 
+# Columns of UserRead; never select hashed_password on read paths
+USER_READ_COLUMNS = (
+    User.id, User.name, User.codeforces_handle, User.email, User.division,
+    User.status, User.created_at, User.role, User.rating,
+)
+
+def _user_rows_stmt(division: Optional[str] = None, active_only: bool = False):
+    stmt = select(*USER_READ_COLUMNS)
+    if division is not None:
+        stmt = stmt.filter(User.division == division)
+    if active_only:
+        stmt = stmt.filter(User.status == UserStatus.Active)
+    return stmt
+
+async def get_user_rows(db: AsyncSession, division: Optional[str] = None, active_only: bool = False,
+                        after: Optional[tuple] = None, limit: Optional[int] = None):
+    """
+    UserRead columns as Core rows, ordered by id; `after` is the last id of the previous page.
+    """
+    result = await db.execute(keyset(_user_rows_stmt(division, active_only), [User.id], after, limit))
+    return result.all()
+
+def stream_user_rows(db: AsyncSession, division: Optional[str] = None):
+    """
+    Chunks of UserRead rows ordered by id, read through a server-side cursor.
+    """
+    return stream_row_chunks(db, _user_rows_stmt(division).order_by(User.id))
+
 async def create_user(db: AsyncSession, user_in: UserCreate):
-    hashed_password = await run_in_threadpool(hash_password, user_in.password)
+    hashed_password = await password_hasher.hash(user_in.password)
     user = User(
         name=user_in.name,
         codeforces_handle=user_in.codeforces_handle,
@@ -36,16 +72,22 @@ async def create_user(db: AsyncSession, user_in: UserCreate):
         if "email" in str(e):
             raise ValueError("Email already registered")
         raise ValueError(f"Database error: {e}")
+    leaderboard_store.update_user(user)
     return user
 
 async def change_status_role_and_division(db: AsyncSession, handle: str, status: UserStatus, role: str, division: Division):
     user = await get_user_by_handle(db, handle)
     if not user:
         raise ValueError(f"User with handle {handle} not found")
+    old_division = user.division
     user.status = status
     user.role = role
     user.division = division    
     await db.commit()
+    principal_cache.invalidate(handle=handle, user_id=user.id)
+    leaderboard_store.update_user(user, old_division=old_division)
+    resource_versions.bump("user", user.id)
+    resource_versions.bump("contests")
     await db.refresh(user)
     return user
 
@@ -75,23 +117,48 @@ async def get_user_rating_history(db: AsyncSession, user_id: int):
     )
     return result.scalars().all()
 
-async def get_all_users(db: AsyncSession):
-    result = await db.execute(select(User))
-    return result.scalars().all()
+async def get_user_profile_row(db: AsyncSession, user_id: int):
+    """
+    The UserProfile columns of one user as a Core row, or None.
+    """
+    result = await db.execute(
+        select(
+            User.id, User.name, User.email, User.codeforces_handle, User.division,
+            User.role, User.rating.label("current_rating"),
+        ).filter(User.id == user_id)
+    )
+    return result.first()
+
+async def get_user_rating_history_rows(db: AsyncSession, user_id: int):
+    """
+    RatingHistoryEntry columns for a user as Core rows, oldest first.
+    """
+    history = models.RatingHistory
+    result = await db.execute(
+        select(history.contest_id, history.old_rating, history.new_rating, history.timestamp)
+        .filter(history.user_id == user_id)
+        .order_by(history.timestamp.asc())
+    )
+    return result.all()
 
 async def update_user(db: AsyncSession, user_id: int, updates: dict):
     result = await db.execute(select(models.User).filter(models.User.id == user_id))
     user = result.scalars().first()
     if not user:
         return None
+    old_handle = user.codeforces_handle
 
     for key, value in updates.items():
         if hasattr(user, key) and value is not None:
             setattr(user, key, value)
 
     if 'password' in updates and updates['password']:
-        user.hashed_password = await run_in_threadpool(hash_password, updates['password'])
+        user.hashed_password = await password_hasher.hash(updates['password'])
 
     await db.commit()
+    principal_cache.invalidate(handle=old_handle, user_id=user.id)
+    leaderboard_store.update_user(user)
+    resource_versions.bump("user", user.id)
+    resource_versions.bump("contests")
     await db.refresh(user)
     return user
\ No newline at end of file
@@ -1,12 +1,234 @@
-from sqlalchemy import create_engine
+from contextlib import asynccontextmanager
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
+from app.cache import TTLCache
 from app.config import settings
+from app.metrics import pool_class
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from typing import Optional
+import hashlib, time
 
-engine = create_async_engine(settings.DATABASE_URL, echo=True)
+READ_METHODS = frozenset({"GET", "HEAD"})
+# Set by AdmissionMiddleware on requests whose sessions come from the heavy pool
+POOL_SCOPE_KEY = "db_pool"
+HEAVY_POOL = "heavy"
+# Session.info key of sessions whose writes are always rolled back (dry_run_session)
+DRY_RUN = "dry_run"
+
+
+def sqlite_pragmas(config=settings) -> dict:
+    return {
+        "journal_mode": config.SQLITE_JOURNAL_MODE,
+        "synchronous": config.SQLITE_SYNCHRONOUS,
+        "busy_timeout": config.SQLITE_BUSY_TIMEOUT_MS,
+        "mmap_size": config.SQLITE_MMAP_SIZE,
+        "cache_size": config.SQLITE_CACHE_SIZE,
+    }
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:")
+
+
+def engine_options(url: str, config=settings, pool_name: str = "primary", pool_size: Optional[int] = None, max_overflow: Optional[int] = None) -> dict:
+    """create_async_engine() keyword arguments for the configured profile."""
+    options = {
+        "echo": config.DB_ECHO,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+        "query_cache_size": config.DB_STATEMENT_CACHE_SIZE,
+    }
+    if not _is_memory_sqlite(url):
+        options.update(
+            poolclass=pool_class(pool_name),
+            pool_size=config.DB_POOL_SIZE if pool_size is None else pool_size,
+            max_overflow=config.DB_MAX_OVERFLOW if max_overflow is None else max_overflow,
+            pool_timeout=config.DB_POOL_TIMEOUT_SECONDS,
+            pool_recycle=config.DB_POOL_RECYCLE_SECONDS,
+        )
+    return options
+
+
+def apply_sqlite_pragmas(async_engine, pragmas: dict):
+    """Run the given PRAGMAs on every new connection of a SQLite engine."""
+    if async_engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            if value in (None, ""):
+                continue
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def make_engine(url: str, config=settings, pragmas: Optional[dict] = None, pool_name: str = "primary", **pool):
+    async_engine = create_async_engine(url, **engine_options(url, config, pool_name, **pool))
+    apply_sqlite_pragmas(async_engine, sqlite_pragmas(config) if pragmas is None else pragmas)
+    return async_engine
+
+
+def read_url(config=settings) -> Optional[str]:
+    """
+    URL for read sessions: the configured replica, or the primary SQLite file
+    opened read-only when DB_SQLITE_READ_POOL is set. None means reads use the primary.
+    """
+    if config.DATABASE_READ_URL:
+        return config.DATABASE_READ_URL
+    if not config.DB_SQLITE_READ_POOL or _is_memory_sqlite(config.DATABASE_URL):
+        return None
+    primary = make_url(config.DATABASE_URL)
+    if primary.get_backend_name() != "sqlite":
+        return None
+    return primary.set(database=f"file:{primary.database}", query={"mode": "ro", "uri": "true"}).render_as_string(hide_password=False)
+
+
+class ReadRouter:
+    """
+    Decides whether a read request may use the replica. Reads go to the
+    primary for `lag_seconds` after any write committed by this process, and
+    for `ryw_seconds` after a write by the same client (read-your-writes).
+    State is per process: a client whose next read lands on another worker
+    only gets the replica-lag window of that worker.
+    """
+
+    def __init__(self, lag_seconds: float, ryw_seconds: float, maxsize: int):
+        self.lag_seconds = lag_seconds
+        self._last_write = 0.0
+        self._recent_writers = TTLCache(maxsize=maxsize, ttl=ryw_seconds)
+        self.replica_sessions = 0
+        self.primary_sessions = 0
+
+    def record_commit(self):
+        self._last_write = time.monotonic()
+
+    def record_writer(self, client_key: Optional[str]):
+        if client_key is not None:
+            self._recent_writers.set(client_key, True)
+
+    def use_replica(self, client_key: Optional[str] = None) -> bool:
+        if time.monotonic() - self._last_write < self.lag_seconds:
+            return False
+        return client_key is None or client_key not in self._recent_writers
+
+    def stats(self) -> dict:
+        return {
+            "replica_configured": ReadSessionLocal is not None,
+            "replica_sessions": self.replica_sessions,
+            "primary_sessions": self.primary_sessions,
+            "recent_writers": len(self._recent_writers),
+        }
+
+
+def client_key(request: Request) -> Optional[str]:
+    """Identifies the caller for read-your-writes: a digest of its bearer token."""
+    authorization = request.headers.get("authorization")
+    if not authorization:
+        return None
+    return hashlib.sha256(authorization.encode()).hexdigest()
+
+
+engine = make_engine(settings.DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+# Same database, separate connection budget for heavy work (rating runs, replays, exports).
+# An in-memory SQLite database exists once per engine, so it cannot have a second pool.
+heavy_engine = None
+if settings.DB_HEAVY_POOL_SIZE and not _is_memory_sqlite(settings.DATABASE_URL):
+    heavy_engine = make_engine(
+        settings.DATABASE_URL, pool_name=HEAVY_POOL,
+        pool_size=settings.DB_HEAVY_POOL_SIZE, max_overflow=settings.DB_HEAVY_MAX_OVERFLOW,
+    )
+HeavySessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=heavy_engine, class_=AsyncSession, expire_on_commit=False) if heavy_engine else SessionLocal
+
+_read_url = read_url()
+# No journal_mode here: a read-only connection cannot switch it
+read_engine = make_engine(_read_url, pragmas={**sqlite_pragmas(), "journal_mode": None}, pool_name="read") if _read_url else None
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine, class_=AsyncSession, expire_on_commit=False) if read_engine else None
+
+read_router = ReadRouter(
+    lag_seconds=settings.DB_REPLICA_LAG_SECONDS,
+    ryw_seconds=settings.DB_READ_YOUR_WRITES_SECONDS,
+    maxsize=settings.DB_READ_YOUR_WRITES_SIZE,
+)
+
+
+def _record_commit(conn):
+    read_router.record_commit()
+
+
+for _writer in (engine, heavy_engine):
+    if _writer is not None:
+        event.listen(_writer.sync_engine, "commit", _record_commit)
+
+
 Base = declarative_base()
 
-async def get_db():
+async def get_db(request: Request):
+    """
+    Session for the request: GET/HEAD requests read from the replica when one
+    is configured and read-your-writes does not pin them to the primary.
+    """
+    key = client_key(request)
+    if ReadSessionLocal is not None and request.method in READ_METHODS and read_router.use_replica(key):
+        read_router.replica_sessions += 1
+        async with ReadSessionLocal() as db:
+            yield db
+        return
+
+    read_router.primary_sessions += 1
+    writes = request.method not in READ_METHODS
+    if writes:
+        read_router.record_writer(key)
+    session_factory = HeavySessionLocal if request.scope.get(POOL_SCOPE_KEY) == HEAVY_POOL else SessionLocal
+    async with session_factory() as db:
+        yield db
+    if writes:
+        # Again after the handler, so the window starts when the write is done
+        read_router.record_writer(key)
+
+
+async def get_primary_db():
+    """Session on the primary, for reads that must see the latest writes or may write."""
     async with SessionLocal() as db:
         yield db
+
+
+@asynccontextmanager
+async def dry_run_session():
+    """
+    Session on the heavy pool whose writes are never kept. It runs inside one
+    outer transaction that is rolled back when the block exits; its commit()
+    calls only end the session's own transaction (join_transaction_mode
+    "rollback_only"). Code that updates in-process caches after a commit
+    skips that for these sessions (see is_dry_run). Until the block exits,
+    other writers wait on the locks its writes hold.
+    """
+    async with (heavy_engine or engine).connect() as conn:
+        await conn.begin()
+        try:
+            async with AsyncSession(
+                bind=conn, join_transaction_mode="rollback_only",
+                autoflush=False, expire_on_commit=False, info={DRY_RUN: True},
+            ) as db:
+                yield db
+        finally:
+            await conn.rollback()
+
+
+def is_dry_run(db: AsyncSession) -> bool:
+    return db.info.get(DRY_RUN, False)
+
+
+async def dispose_engines():
+    """
+    Close the pooled connections of every engine. Pooled aiosqlite
+    connections each run a non-daemon thread, so a process exits only after this.
+    """
+    for async_engine in (engine, heavy_engine, read_engine):
+        if async_engine is not None:
+            await async_engine.dispose()
@@ -10,13 +10,33 @@ from dotenv import load_dotenv
 import os
 
 from app.config import settings
+from app.cache import principal_cache
+from app.crud.contests import get_contest, get_preparer_acl
 from app.schemas import user_schemas
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> models.User:
+# Every users column except the password hash
+_PRINCIPAL_COLUMNS = [column for column in models.User.__table__.columns if column.key != "hashed_password"]
+
+
+class Principal:
+    """
+    The authenticated user's column values, not attached to any session.
+    Load a models.User through the request's session to change the user.
+    """
+
+    __slots__ = tuple(column.key for column in _PRINCIPAL_COLUMNS)
+
+    def __init__(self, values):
+        for key in self.__slots__:
+            setattr(self, key, values[key])
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> Principal:
     """
-    Decode JWT token and fetch current user from DB.
+    Decode JWT token and return the current user as a Principal, served from
+    the principal cache when possible.
     """
 
     credential_exception = HTTPException(
@@ -34,13 +54,24 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
     except JWTError:
         raise credential_exception
 
-    result = await db.execute(select(models.User).filter(models.User.codeforces_handle == token_data.username))
-    user = result.scalars().first()
-    if user is None:
-        raise credential_exception
+    cached = principal_cache.get(token_data.username)
+    if cached is None:
+        result = await db.execute(select(*_PRINCIPAL_COLUMNS).filter(models.User.codeforces_handle == token_data.username))
+        row = result.first()
+        if row is None:
+            raise credential_exception
+        cached = dict(row._mapping)
+        principal_cache.set(row.codeforces_handle, row.id, cached)
+    user = Principal(cached)
+
+    if user.status == models.UserStatus.Terminated:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User account has been terminated",
+        )
     return user
 
-async def require_admin(current_user: models.User = Depends(get_current_user)) -> models.User:
+async def require_admin(current_user: Principal = Depends(get_current_user)) -> Principal:
     """
     Dependency to ensure the current user is an admin.
     Raises 403 if current user is not admin
@@ -55,9 +86,9 @@ async def require_admin(current_user: models.User = Depends(get_current_user)) -
 
 async def require_preparer(
         contest_id: str,
-        current_user: models.User = Depends(get_current_user),
+        current_user: Principal = Depends(get_current_user),
         db: AsyncSession = Depends(get_db)
-    ) -> models.User:
+    ) -> Principal:
     """
     Checks if the current user is a preparer for the given contest.
     """
@@ -66,20 +97,24 @@ async def require_preparer(
     if current_user.role == models.UserRole.Admin:
         return current_user
     
-    # Check contest_preparer_table for user access
-    stmt = select(models.contest_preparer_table).where(
-        models.contest_preparer_table.c.contest_id == contest_id,
-        models.contest_preparer_table.c.user_id == current_user.id,
-        models.contest_preparer_table.c.can_take_attendance == True
-    )
+    # Check the contest's preparer ACL for user access
+    allowed_user_ids = await get_preparer_acl(db, contest_id)
 
-    result = await db.execute(stmt)
-    auth_check = result.first()
-
-    if not auth_check:
+    if current_user.id not in allowed_user_ids:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="User is not authorized to take attendance for this contest",
         )
 
     return current_user
+
+
+async def get_contest_for_request(contest_id: str, db: AsyncSession = Depends(get_db)) -> models.Contest:
+    """
+    Load the path's contest once per request; handlers and other dependencies
+    that declare it share the same instance. Raises 404 if it does not exist.
+    """
+    contest = await get_contest(db=db, contest_id=contest_id)
+    if not contest:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contest not found")
+    return contest
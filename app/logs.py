@@ -0,0 +1,135 @@
+"""
+Logging setup: records are put on an in-memory queue by the caller and
+written by a background thread, so request handlers never block on stdout.
+Records whose arguments are all immutable are formatted there too. Use `logging.getLogger(__name__)` and %-style arguments so
+nothing is formatted for disabled levels; wrap large payloads in
+summarize() to log their shape instead of their contents.
+"""
+from logging.handlers import QueueHandler, QueueListener
+from app.config import settings
+import datetime, json, logging, queue, sys
+
+_listener = None
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line; `extra={...}` fields are included as keys."""
+
+    _reserved = frozenset(logging.makeLogRecord({}).__dict__) | {"message", "asctime"}
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in self._reserved and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+
+# Argument types that cannot change between the call and the listener formatting it
+_IMMUTABLE_ARGS = (str, bytes, int, float, type(None), datetime.date, datetime.timedelta)
+
+
+class EnqueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread when that is
+    safe. A record whose arguments are all immutable is enqueued as is; any
+    other argument (a summarize() of a list the caller keeps mutating, a
+    dict) may change before the listener gets to it, so such records are
+    formatted here by the stock prepare().
+    """
+
+    def prepare(self, record):
+        args = record.args
+        values = args.values() if isinstance(args, dict) else (args or ())
+        if all(isinstance(value, _IMMUTABLE_ARGS) for value in values):
+            return record
+        return super().prepare(record)
+
+
+def parse_levels(spec: str) -> dict:
+    """'app.services.ratings=DEBUG,sqlalchemy.engine=WARNING' -> {logger: level}."""
+    levels = {}
+    for item in spec.split(","):
+        name, sep, level = item.strip().partition("=")
+        if sep and name.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(config=settings):
+    """Install the queue handler on the root logger; idempotent."""
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stderr)
+    if config.LOG_FORMAT == "json":
+        output.setFormatter(JSONFormatter())
+    else:
+        output.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers[:] = [EnqueueHandler(log_queue)]
+    root.setLevel(config.LOG_LEVEL.upper())
+    for name, level in parse_levels(config.LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class summarize:
+    """
+    Lazy one-line description of a payload, computed only if the record is
+    emitted, on the calling thread (see EnqueueHandler): collection sizes
+    and, for lists of dicts, the keys of the first item, e.g.
+    `list[250] of dict{user_id, rating, delta}`.
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self) -> str:
+        return _describe(self.value)
+
+    __repr__ = __str__
+
+
+def _describe(value, depth: int = 0) -> str:
+    if hasattr(value, "dict") and callable(value.dict):
+        value = value.dict()
+    if isinstance(value, dict):
+        if depth:
+            return f"dict[{len(value)}]"
+        parts = [f"{key}={_describe(item, depth + 1)}" for key, item in list(value.items())[:8]]
+        more = ", ..." if len(value) > 8 else ""
+        return "{" + ", ".join(parts) + more + "}"
+    if isinstance(value, (list, tuple, set)):
+        first = next(iter(value), None)
+        if isinstance(first, dict):
+            return f"{type(value).__name__}[{len(value)}] of dict{{{', '.join(map(str, list(first)[:8]))}}}"
+        return f"{type(value).__name__}[{len(value)}]"
+    if isinstance(value, (str, bytes)) and len(value) > 80:
+        return f"{type(value).__name__}[{len(value)}]"
+    return repr(value)
@@ -1,31 +1,76 @@
+import asyncio
 from fastapi import FastAPI
 
 from app.routers import admin, attendance, contests, ratings, auth
-from .db import Base, engine
-from .routers import users
+from .config import settings
+from .admission import AdmissionMiddleware
+from .db import Base, dispose_engines, engine, heavy_engine, read_engine
+from .logs import configure_logging, shutdown_logging
+from .metrics import MetricsMiddleware
+from .profiling import ProfilingMiddleware
+from .query_stats import QueryStatsMiddleware, instrument_engine
+from .tracing import TRACE_ID_HEADER, TracingMiddleware, configure_tracing
+from .routers import metrics, users
+from .services.token_compactor import compact_refresh_tokens_forever
+from .security import password_hasher
 from fastapi.middleware.cors import CORSMiddleware
 
 
+configure_logging()
+configure_tracing()
+
 app = FastAPI(title="CSEC Contest Rating - Backend")
 
 origins = [
     "*"
 ]
 
+# Inside CORS, so rejected requests still carry the CORS headers
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=['*'],
     allow_headers=['*'],
+    expose_headers=['ETag', 'Server-Timing', 'X-Next-Cursor', TRACE_ID_HEADER],
 )
 
+instrument_engine(engine)
+instrument_engine(read_engine)
+instrument_engine(heavy_engine)
+app.add_middleware(QueryStatsMiddleware)
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+if settings.TRACING_ENABLED:
+    app.add_middleware(TracingMiddleware)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 app.include_router(users.router)
 app.include_router(ratings.router)
 app.include_router(contests.router)
 app.include_router(attendance.router)
 app.include_router(auth.router)
 app.include_router(admin.router)
+if settings.METRICS_ENABLED:
+    app.include_router(metrics.router)
+
+_background_tasks = []
+
+@app.on_event("startup")
+async def start_background_tasks():
+    _background_tasks.append(asyncio.create_task(compact_refresh_tokens_forever()))
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    for task in _background_tasks:
+        task.cancel()
+    _background_tasks.clear()
+    password_hasher.shutdown()
+    await dispose_engines()
+    shutdown_logging()
 
 @app.get("/")
 async def read_root():
@@ -0,0 +1,235 @@
+"""
+In-process metrics rendered in the Prometheus text format.
+
+Collectors are plain Python objects updated inline: an increment is a dict
+lookup and an add, a histogram observation is one bisect. Nothing is
+locked because the app runs on one event loop per process; each worker
+process exposes its own series. Values that already live elsewhere (pool
+state, breaker stats) are read only when /metrics is scraped, through
+register_collector().
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import lru_cache, wraps
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.routing import Match
+import time
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_metrics = []
+_collectors = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        _metrics.append(self)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for key, value in sorted(self._values.items()):
+            lines.extend(self._render_series(key, value))
+        return lines
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def _render_series(self, key, value):
+        return [f"{self.name}{_labels(self.labelnames, key)} {value}"]
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, *labels, value: float):
+        self._values[labels] = value
+
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def _render_series(self, key, value):
+        return [f"{self.name}{_labels(self.labelnames, key)} {value}"]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, *labels, value: float):
+        series = self._values.get(labels)
+        if series is None:
+            # per-bucket counts (non-cumulative), then +Inf, sum
+            series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(*labels, value=time.perf_counter() - started)
+
+    def timed(self, *labels):
+        """Decorator observing the duration of every call of a coroutine function."""
+        def decorate(fn):
+            @wraps(fn)
+            async def wrapper(*args, **kwargs):
+                with self.time(*labels):
+                    return await fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def _render_series(self, key, value):
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), counts):
+            cumulative += count
+            le = 'le="%s"' % bound
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total}")
+        lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+def register_collector(collect):
+    """
+    collect() is called on every scrape and returns (name, type, help, samples)
+    tuples, samples being a list of (labels dict, value).
+    """
+    _collectors.append(collect)
+
+
+def render() -> str:
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collect in _collectors:
+        for name, type_, help, samples in collect():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {type_}")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(labels.keys(), labels.values())} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# HTTP
+http_requests = Counter("http_requests_total", "HTTP requests by route template and status", ("method", "route", "status"))
+http_request_seconds = Histogram("http_request_duration_seconds", "HTTP request latency by route template", ("method", "route"))
+http_in_flight = Gauge("http_requests_in_flight", "HTTP requests being handled", ("method", "route"))
+
+# Database pool
+db_pool_checkouts = Counter("db_pool_checkouts_total", "Connections checked out of the pool", ("pool",))
+db_pool_wait_seconds = Histogram("db_pool_wait_seconds", "Time spent waiting for a pooled connection", ("pool",),
+                                 buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0))
+
+# Rating engine and replay
+rating_stage_seconds = Histogram("rating_stage_duration_seconds", "Rating engine stage duration", ("stage",))
+rating_participants = Histogram("rating_participants", "Users considered per rating run, by group", ("group",), buckets=COUNT_BUCKETS)
+replay_seconds = Histogram("replay_duration_seconds", "Time to roll back and replay contests", ("scope",),
+                           buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0))
+replayed_contests = Counter("replayed_contests_total", "Contests rolled back and replayed")
+
+# Codeforces API
+codeforces_request_seconds = Histogram("codeforces_request_duration_seconds", "Codeforces API call latency", ("method",))
+codeforces_errors = Counter("codeforces_errors_total", "Failed Codeforces API calls", ("method", "reason"))
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Async queue pool that records checkouts and the time spent waiting for one."""
+
+    metrics_name = "primary"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_wait_seconds.observe(self.metrics_name, value=time.perf_counter() - started)
+            db_pool_checkouts.inc(self.metrics_name)
+
+
+@lru_cache(maxsize=None)
+def pool_class(name: str):
+    """TimedQueuePool subclass reporting under pool=<name>."""
+    return type(f"TimedQueuePool_{name}", (TimedQueuePool,), {"metrics_name": name})
+
+
+def route_template(scope) -> str:
+    """
+    Path template of the route that will handle the request, e.g.
+    /api/users/{user_id}; remembered in the scope for the other middleware.
+    """
+    template = scope.get("route_template")
+    if template is None:
+        # Unknown paths share one label so scanners cannot blow up the series count
+        template = "unmatched"
+        app = scope.get("app")
+        for route in getattr(getattr(app, "router", None), "routes", ()):
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                template = getattr(route, "path", scope.get("path", ""))
+                break
+        scope["route_template"] = template
+    return template
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts, latency and in-flight requests per route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(scope)
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_in_flight.inc(method, route)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_in_flight.dec(method, route)
+            http_request_seconds.observe(method, route, value=time.perf_counter() - started)
+            http_requests.inc(method, route, str(status_code))
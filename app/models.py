@@ -4,7 +4,7 @@ import enum
 import datetime
 import uuid
 from sqlalchemy import (
-    Column, Integer, String, Enum, DateTime, Table, ForeignKey, Boolean
+    Column, Integer, String, Enum, DateTime, Table, ForeignKey, Boolean, LargeBinary, Index
 )
 
 from sqlalchemy.orm import relationship
@@ -49,6 +49,9 @@ class User(Base):
     rating = Column(Integer, default=1400, nullable=False)
     hashed_password = Column(String, nullable=False)
 
+    # Roster and leaderboard loads filter on both
+    __table_args__ = (Index("ix_users_division_status", "division", "status"),)
+
     ratings = relationship("Rating", back_populates="user", cascade="all, delete-orphan")
     assigned_contests = relationship("Contest" ,secondary=contest_preparer_table, back_populates="preparers")
     rating_history = relationship("RatingHistory", back_populates="user", cascade="all, delete-orphan")
@@ -60,12 +63,15 @@ class RatingHistory(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    contest_id = Column(String, ForeignKey("contests.id"), nullable=False)
+    contest_id = Column(String, ForeignKey("contests.id"), nullable=False, index=True)
 
     old_rating = Column(Integer, nullable=False)
     new_rating = Column(Integer, nullable=False)
     timestamp = Column(DateTime, default=lambda: datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None))
 
+    # A user's history in order, without a sort
+    __table_args__ = (Index("ix_rating_history_user_timestamp", "user_id", "timestamp"),)
+
     user = relationship("User", back_populates="rating_history")
     contest = relationship("Contest", back_populates="rating_history")
 
@@ -78,10 +84,12 @@ class Contest(Base):
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     name = Column(String, nullable=True)
-    link = Column(String, nullable=False)
+    link = Column(String, nullable=False, index=True)
     division = Column(Enum(Division), nullable=False)
     date = Column(DateTime, nullable=False)
 
+    __table_args__ = (Index("ix_contests_division_date", "division", "date"),)
+
     preparers = relationship("User", secondary=contest_preparer_table, back_populates="assigned_contests")
     attendance_records = relationship("Attendance", back_populates="contest")
     rating_history = relationship("RatingHistory", back_populates="contest", cascade="all, delete-orphan")
@@ -94,10 +102,38 @@ class ContestDataSnapshot(Base):
     contest_id = Column(String, ForeignKey("contests.id"), nullable=False, index=True)
     attendance_snapshot = Column(JSON, nullable=False)
     ranking_data_snapshot = Column(JSON, nullable=False)
+    # Set when the ranking data lives in contest_standings instead of the snapshot row
+    standings_version = Column(Integer, nullable=True)
     created_at = Column(DateTime, default=lambda: datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None))
 
     contest = relationship("Contest")
-    
+
+
+class ContestStandings(Base):
+    __tablename__ = "contest_standings"
+
+    id = Column(Integer, primary_key=True)
+    contest_id = Column(String, ForeignKey("contests.id"), nullable=False, unique=True, index=True)
+    codeforces_contest_id = Column(String, nullable=False)
+    version = Column(Integer, nullable=False, default=1)
+    rows = Column(JSON, nullable=False)
+    fetched_at = Column(DateTime, default=lambda: datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None))
+
+    contest = relationship("Contest")
+
+
+class ContestRatingSnapshot(Base):
+    """Ratings of the contest's division right after the contest was rated."""
+    __tablename__ = "contest_rating_snapshots"
+
+    contest_id = Column(String, ForeignKey("contests.id"), primary_key=True)
+    division = Column(Enum(Division), nullable=False)
+    # [[user_id, rating], ...]
+    ratings = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None))
+
+    contest = relationship("Contest")
+
 # Attendance
 class AttendanceStatus(enum.Enum):
     PRESENT = "Present"
@@ -108,10 +144,12 @@ class Attendance(Base):
     __tablename__ = "attendance"
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     contest_id = Column(String, ForeignKey("contests.id"), nullable=False)
     status = Column(Enum(AttendanceStatus), nullable=False, default=AttendanceStatus.PRESENT)
 
+    __table_args__ = (Index("ix_attendance_contest_user", "contest_id", "user_id"),)
+
     contest = relationship("Contest", back_populates="attendance_records")
 
 
@@ -132,9 +170,15 @@ class RefreshToken(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    token = Column(String, index=True, nullable=False)
-    expires_at = Column(DateTime, nullable=False)
+    # SHA-256 of the token; the token itself is never stored
+    token_digest = Column(LargeBinary(32), unique=True, index=True, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
     created_at = Column(DateTime, default=lambda: datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None))
     is_revoked = Column(Boolean, default=False)
 
     user = relationship("User")
+
+    # Only the revoked tokens, for the purge
+    __table_args__ = (
+        Index("ix_refresh_tokens_revoked", "id", sqlite_where=is_revoked == True, postgresql_where=is_revoked == True),
+    )
@@ -0,0 +1,70 @@
+from fastapi import HTTPException, Response, status
+from sqlalchemy import and_, or_
+from typing import Optional
+import base64, datetime, json
+
+MAX_PAGE_SIZE = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values) -> str:
+    """Opaque token for the sort key of the last row of a page."""
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime.datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], types: tuple) -> Optional[tuple]:
+    """
+    Decode a cursor back into a sort key, converting each value to the
+    matching type in `types`. Raises 400 on anything malformed.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("wrong cursor size")
+        return tuple(
+            datetime.datetime.fromisoformat(v) if t is datetime.datetime else t(v)
+            for t, v in zip(types, values)
+        )
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def _after(columns, values):
+    first, rest = columns[0], columns[1:]
+    if not rest:
+        return first > values[0]
+    return or_(first > values[0], and_(first == values[0], _after(rest, values[1:])))
+
+
+def keyset(stmt, columns, after: Optional[tuple] = None, limit: Optional[int] = None):
+    """
+    Order stmt by `columns` and keep rows strictly after the `after` key.
+    One extra row is fetched so split_page() can tell whether more follow.
+    """
+    stmt = stmt.order_by(*columns)
+    if after is not None:
+        stmt = stmt.where(_after(columns, after))
+    if limit is not None:
+        stmt = stmt.limit(limit + 1)
+    return stmt
+
+
+def split_page(items: list, limit: Optional[int], key) -> tuple:
+    """Returns (items, next_cursor); next_cursor is None on the last page."""
+    if limit is None or len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    return items, encode_cursor(*key(items[-1]))
+
+
+def next_cursor_headers(next_cursor: Optional[str]) -> dict:
+    return {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]) -> Response:
+    response.headers.update(next_cursor_headers(next_cursor))
+    return response
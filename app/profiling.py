@@ -0,0 +1,212 @@
+"""
+On-demand profiling for admins.
+
+A profile covers one unit of work on the event loop thread: a request
+replayed through the app, the next N requests to an armed route, or a
+contest replay. Two recorders are available:
+
+- "folded": a sampling profiler. A background thread reads the loop
+  thread's stack every PROFILE_SAMPLE_INTERVAL_MS and counts identical
+  stacks, in the collapsed format read by flamegraph.pl and speedscope.
+- "pstats": cProfile, saved as a file pstats.Stats() can load.
+
+Either way the whole loop thread is profiled, so other requests served
+while it runs show up too. Only one profile runs at a time. When nothing
+is armed, the middleware costs one dict check per request; with
+PROFILING_ENABLED off it is not installed at all.
+"""
+from collections import Counter
+from contextlib import contextmanager
+from app.cache import TTLCache
+from app.config import settings
+from app.metrics import route_template
+import asyncio, cProfile, datetime, marshal, os, sys, threading, time, uuid
+
+FORMATS = ("folded", "pstats")
+MEDIA_TYPES = {"folded": "text/plain; charset=utf-8", "pstats": "application/octet-stream"}
+
+_store = TTLCache(maxsize=settings.PROFILE_STORE_SIZE, ttl=settings.PROFILE_TTL_SECONDS)
+_active = None
+# (method, route template) -> [remaining requests, format]
+_armed = {}
+_tasks = set()
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+class SamplingProfiler:
+    """Samples the stack of one thread from a background thread."""
+
+    def __init__(self, interval: float, max_seconds: float, thread_id: int = None):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.thread_id = thread_id or threading.get_ident()
+        self.stacks = Counter()
+        self.samples = 0
+        self._labels = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            filename = os.path.relpath(code.co_filename) if code.co_filename.startswith(os.getcwd()) else os.path.basename(code.co_filename)
+            label = self._labels[code] = f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ",")
+        return label
+
+    def _run(self):
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def data(self) -> bytes:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common()).encode()
+
+
+class DeterministicProfiler:
+    """cProfile on the current thread."""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.samples = 0
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+        self.profile.create_stats()
+        self.samples = sum(calls for calls, *_ in self.profile.stats.values())
+
+    def data(self) -> bytes:
+        # The format pstats.Stats(path) reads, as written by Profile.dump_stats()
+        return marshal.dumps(self.profile.stats)
+
+
+def _recorder(format: str):
+    if format == "pstats":
+        return DeterministicProfiler()
+    return SamplingProfiler(interval=settings.PROFILE_SAMPLE_INTERVAL_MS / 1000, max_seconds=settings.PROFILE_MAX_SECONDS)
+
+
+def start(kind: str, target: str, format: str = "folded") -> dict:
+    """Start profiling the current thread; raises ProfilerBusy if a profile is running."""
+    global _active
+    if _active is not None:
+        raise ProfilerBusy(f"Already profiling {_active['kind']} {_active['target']}")
+    recorder = _recorder(format)
+    record = {
+        "id": uuid.uuid4().hex,
+        "kind": kind,
+        "target": target,
+        "format": format,
+        "status": "running",
+        "started_at": datetime.datetime.utcnow(),
+        "duration_seconds": None,
+        "samples": 0,
+        "error": None,
+    }
+    _active = {**record, "recorder": recorder, "started": time.perf_counter()}
+    _store.set(record["id"], record)
+    recorder.start()
+    return record
+
+
+def finish(record: dict, error: str = None):
+    global _active
+    active, _active = _active, None
+    recorder = active["recorder"]
+    recorder.stop()
+    record.update(
+        status="failed" if error else "done",
+        duration_seconds=time.perf_counter() - active["started"],
+        samples=recorder.samples,
+        error=error,
+        data=recorder.data(),
+    )
+    _store.set(record["id"], record)
+
+
+@contextmanager
+def profile(kind: str, target: str, format: str = "folded"):
+    record = start(kind, target, format)
+    try:
+        yield record
+    except BaseException as e:
+        finish(record, error=repr(e))
+        raise
+    finish(record)
+
+
+def run_in_background(kind: str, target: str, format: str, work) -> dict:
+    """Profile the coroutine work() as a background task; returns the running record."""
+    record = start(kind, target, format)
+
+    async def runner():
+        try:
+            await work()
+        except BaseException as e:
+            finish(record, error=repr(e))
+            raise
+        finish(record)
+
+    task = asyncio.create_task(runner())
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return record
+
+
+def arm_route(method: str, route: str, count: int, format: str = "folded"):
+    """Profile the next `count` requests whose route template is `route`."""
+    _armed[(method.upper(), route)] = [count, format]
+
+
+def armed() -> list:
+    return [{"method": m, "route": r, "remaining": n, "format": f} for (m, r), (n, f) in _armed.items()]
+
+
+def get(profile_id: str):
+    return _store.get(profile_id)
+
+
+def list_profiles() -> list:
+    return [{k: v for k, v in p.items() if k != "data"} for p in reversed(_store.values())]
+
+
+class ProfilingMiddleware:
+    """Runs requests to armed routes under the profiler."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not _armed or scope["type"] != "http" or _active is not None:
+            await self.app(scope, receive, send)
+            return
+
+        key = (scope["method"], route_template(scope))
+        entry = _armed.get(key)
+        if entry is None:
+            await self.app(scope, receive, send)
+            return
+        entry[0] -= 1
+        if entry[0] <= 0:
+            del _armed[key]
+        with profile("route", f"{scope['method']} {scope['path']}", entry[1]):
+            await self.app(scope, receive, send)
@@ -0,0 +1,148 @@
+"""
+Per-request SQL statistics.
+
+Engine events count the statements, DB time and driver-reported rows of
+every query; QueryStatsMiddleware attributes them to the current request,
+reports them in a Server-Timing header and logs requests over the
+configured thresholds, including statements repeated often enough to look
+like an N+1 pattern. query_budget() is the test-side counterpart.
+"""
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from typing import Optional
+from app.config import settings
+import logging, time
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+        self.statements = Counter()
+
+    def record(self, statement: str, seconds: float, rowcount: int):
+        self.queries += 1
+        self.db_seconds += seconds
+        if rowcount and rowcount > 0:
+            self.rows += rowcount
+        self.statements[statement] += 1
+
+    def repeated(self, threshold: int) -> list:
+        """(statement, count) for statements run at least `threshold` times."""
+        return [(s, n) for s, n in self.statements.most_common() if n >= threshold]
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+# Active query_budget() blocks; counted regardless of which task runs the query
+_budgets = []
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    elapsed = time.perf_counter() - started
+    rowcount = getattr(cursor, "rowcount", -1)
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, elapsed, rowcount)
+    for budget in _budgets:
+        budget.record(statement, elapsed, rowcount)
+
+
+def instrument_engine(async_engine):
+    """Count the queries of an engine; safe to call once per engine."""
+    if async_engine is None:
+        return
+    sync_engine = async_engine.sync_engine
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def server_timing(stats: QueryStats, total_seconds: float) -> str:
+    return (
+        f'db;dur={stats.db_seconds * 1000:.2f};desc="{stats.queries} queries, {stats.rows} rows", '
+        f"total;dur={total_seconds * 1000:.2f}"
+    )
+
+
+class QueryStatsMiddleware:
+    """ASGI middleware that collects QueryStats for each HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.QUERY_STATS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and settings.SERVER_TIMING_HEADER:
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(stats, time.perf_counter() - started).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            self._log(scope, stats, time.perf_counter() - started)
+
+    @staticmethod
+    def _log(scope, stats: QueryStats, total_seconds: float):
+        route = f'{scope.get("method", "")} {scope.get("path", "")}'
+        if stats.queries > settings.SLOW_REQUEST_QUERY_COUNT or stats.db_seconds * 1000 > settings.SLOW_REQUEST_DB_MS:
+            logger.warning(
+                "Slow request %s: %d queries, %.1f ms in DB, %d rows, %.1f ms total",
+                route, stats.queries, stats.db_seconds * 1000, stats.rows, total_seconds * 1000,
+            )
+        for statement, count in stats.repeated(settings.N_PLUS_ONE_THRESHOLD):
+            logger.warning("Possible N+1 in %s: statement ran %d times: %s", route, count, " ".join(statement.split())[:300])
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(max_queries: int, max_repeats: Optional[int] = None):
+    """
+    Fail (AssertionError) if the block runs more than max_queries statements,
+    or any single statement more than max_repeats times. Counts every query
+    on instrumented engines, so it also sees requests served by a TestClient
+    in another thread:
+
+        with query_budget(5):
+            client.get("/api/users/profile", headers=auth)
+    """
+    stats = QueryStats()
+    _budgets.append(stats)
+    try:
+        yield stats
+    finally:
+        _budgets.remove(stats)
+    if stats.queries > max_queries:
+        raise QueryBudgetExceeded(f"{stats.queries} queries exceeds the budget of {max_queries}")
+    if max_repeats is not None:
+        repeated = stats.repeated(max_repeats + 1)
+        if repeated:
+            statement, count = repeated[0]
+            raise QueryBudgetExceeded(f"statement ran {count} times (max {max_repeats}): {' '.join(statement.split())[:300]}")
@@ -1,12 +1,22 @@
 from fastapi import APIRouter
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db import get_db
-from app.schemas import contest_schemas, user_schemas
-from app.crud import contests, users as crud_users
-from typing import List
+from app.db import dry_run_session, get_db, get_primary_db, read_router
+from app.config import settings
+from app.schemas import contest_schemas, profiling_schemas, user_schemas
+from app.crud import attendance, contests, exports, users as crud_users
+from app.models import Division
+from typing import List, Optional
 from app.dependencies.auth import require_admin, get_current_user
+from app.services.codeforces import breaker as codeforces_breaker
+from app.security import password_hasher
+from app.pagination import MAX_PAGE_SIZE, decode_cursor, split_page, set_next_cursor
+from app.streaming import csv_response, ndjson_response
+from app.serialization import FastJSONResponse, dumps, plain_row, project
+from app import admission, profiling, tracing
+import datetime, httpx
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
@@ -15,13 +25,22 @@ router = APIRouter(prefix="/api/admin", tags=["admin"])
 @router.get("/users/{division}", status_code=status.HTTP_200_OK, response_model=List[user_schemas.UserRead])
 async def get_users_by_division(
     division: str,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    format: str = Query("json", regex="^(json|ndjson)$"),
     db: AsyncSession = Depends(get_db),
     current_user = Depends(require_admin)
 ):
     """
-    Admin-only: Return all users in the specified division.
+    Admin-only: Return all users in the specified division, ordered by id.
+    Pages with `limit`/`cursor`, or streams every user with format=ndjson.
     """
-    users_list = await crud_users.get_users_by_division(db, division)
+    if format == "ndjson":
+        return ndjson_response(crud_users.stream_user_rows(db, division), lambda row: dumps(project(user_schemas.UserRead, row)))
+    users_list = await crud_users.get_users_by_division(db, division, after=decode_cursor(cursor, (int,)), limit=limit)
+    users_list, next_cursor = split_page(users_list, limit, lambda user: (user.id,))
+    set_next_cursor(response, next_cursor)
     return users_list
 
 
@@ -99,4 +118,192 @@ async def update_contest_preparers(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update contest preparers: {e}")
 
-    return updated_contest
\ No newline at end of file
+    return updated_contest
+
+
+@router.get("/codeforces/breaker", response_model=dict)
+async def get_codeforces_breaker(current_user = Depends(require_admin)):
+    """
+    Admin-only: Current state and trip counters of the Codeforces circuit breaker.
+    """
+    return codeforces_breaker.stats()
+
+
+
+@router.get("/password-hasher", response_model=dict)
+async def get_password_hasher_stats(current_user = Depends(require_admin)):
+    """
+    Admin-only: Queue depth and timing counters of the password hashing executor.
+    """
+    return password_hasher.stats()
+
+
+@router.get("/db/routing", response_model=dict)
+async def get_db_routing_stats(current_user = Depends(require_admin)):
+    """
+    Admin-only: How many request sessions went to the read replica vs the primary.
+    """
+    return read_router.stats()
+
+
+@router.get("/admission", response_model=dict)
+async def get_admission_stats(current_user = Depends(require_admin)):
+    """
+    Admin-only: In-flight, queued and rejected requests per admission class.
+    """
+    return admission.stats()
+
+
+def _export_response(chunks, columns: List[str], name: str, format: str):
+    if format == "ndjson":
+        return ndjson_response(chunks, lambda row: dumps(plain_row(row)), filename=f"{name}.ndjson")
+    return csv_response(chunks, columns, plain_row, filename=f"{name}.csv")
+
+
+@router.get("/export/rating-history")
+async def export_rating_history(
+    format: str = Query("csv", regex="^(csv|ndjson)$"),
+    division: Optional[Division] = Query(None, description="Contest division"),
+    since: Optional[datetime.date] = Query(None, description="First contest date to include"),
+    until: Optional[datetime.date] = Query(None, description="Last contest date to include"),
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(require_admin)
+):
+    """
+    Admin-only: Stream every rating change with its contest and user, in contest date order.
+    """
+    chunks = exports.stream_rating_history_rows(db, division, since, until)
+    return _export_response(chunks, exports.RATING_HISTORY_EXPORT_COLUMNS, "rating_history", format)
+
+
+@router.get("/export/attendance")
+async def export_attendance(
+    format: str = Query("csv", regex="^(csv|ndjson)$"),
+    division: Optional[Division] = Query(None, description="Contest division"),
+    since: Optional[datetime.date] = Query(None, description="First contest date to include"),
+    until: Optional[datetime.date] = Query(None, description="Last contest date to include"),
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(require_admin)
+):
+    """
+    Admin-only: Stream every attendance record with its contest and user, in contest date order.
+    """
+    chunks = exports.stream_attendance_rows(db, division, since, until)
+    return _export_response(chunks, exports.ATTENDANCE_EXPORT_COLUMNS, "attendance", format)
+
+
+def _require_profiling():
+    if not settings.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+
+
+@router.post("/profile/request", response_model=profiling_schemas.ProfileRead)
+async def profile_request(
+    body: profiling_schemas.ProfileRequest,
+    request: Request,
+    current_user = Depends(require_admin)
+):
+    """
+    Admin-only: Run one request through the app, with the caller's credentials, under the profiler.
+    """
+    _require_profiling()
+    headers = {"authorization": request.headers.get("authorization", "")}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=request.app), base_url="http://profile") as client:
+        try:
+            with profiling.profile("request", f"{body.method.upper()} {body.path}", body.format) as record:
+                response = await client.request(body.method.upper(), body.path, params=body.params, json=body.body, headers=headers)
+        except profiling.ProfilerBusy as e:
+            raise HTTPException(status_code=409, detail=str(e))
+    return {**record, "status_code": response.status_code}
+
+
+@router.post("/profile/route", response_model=List[dict])
+async def arm_route_profile(body: profiling_schemas.ProfileRoute, current_user = Depends(require_admin)):
+    """
+    Admin-only: Profile the next `count` requests to a route template. Returns the armed routes.
+    """
+    _require_profiling()
+    profiling.arm_route(body.method, body.route, body.count, body.format)
+    return profiling.armed()
+
+
+@router.post("/profile/replay/{contest_id}", response_model=profiling_schemas.ProfileRead, status_code=status.HTTP_202_ACCEPTED)
+async def profile_replay(
+    contest_id: str,
+    format: str = Query("folded", regex=profiling_schemas.PROFILE_FORMAT),
+    db: AsyncSession = Depends(get_primary_db),
+    current_user = Depends(require_admin)
+):
+    """
+    Admin-only: Replay the contests after `contest_id` in the background under the profiler.
+    The replay runs in a transaction that is rolled back and leaves the caches alone,
+    so nothing it writes is kept; writes wait until it finishes. Poll /profiles/{id}.
+    """
+    _require_profiling()
+    if not await contests.get_contest(db, contest_id):
+        raise HTTPException(status_code=404, detail="Contest not found")
+
+    async def replay():
+        async with dry_run_session() as replay_db:
+            await attendance.replay_subsequent_contests(replay_db, contest_id)
+
+    try:
+        return profiling.run_in_background("replay", contest_id, format, replay)
+    except profiling.ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/profiles", response_model=List[profiling_schemas.ProfileRead])
+async def list_profiles(current_user = Depends(require_admin)):
+    """
+    Admin-only: Stored profiles, newest first.
+    """
+    return profiling.list_profiles()
+
+
+@router.get("/profiles/{profile_id}")
+async def download_profile(profile_id: str, current_user = Depends(require_admin)):
+    """
+    Admin-only: Download a finished profile: collapsed stacks for flamegraph.pl or
+    speedscope (folded), or a file for pstats.Stats() (pstats).
+    """
+    record = profiling.get(profile_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if "data" not in record:
+        raise HTTPException(status_code=409, detail="Profile is still running")
+    return Response(
+        content=record["data"],
+        media_type=profiling.MEDIA_TYPES[record["format"]],
+        headers={"Content-Disposition": f'attachment; filename="{record["kind"]}-{profile_id}.{record["format"]}"'},
+    )
+
+
+@router.get("/traces", response_model=List[dict])
+async def list_traces(
+    min_ms: float = Query(0, ge=0, description="Only traces that took at least this long"),
+    name: Optional[str] = Query(None, description="Substring of the root span name, e.g. 'PUT /api/attendance'"),
+    limit: int = Query(50, ge=1, le=500),
+    current_user = Depends(require_admin)
+):
+    """
+    Admin-only: Recent request traces, newest first.
+    """
+    return tracing.recent(min_ms=min_ms, limit=limit, name=name)
+
+
+@router.get("/traces/{trace_id}")
+async def get_trace(
+    trace_id: str,
+    format: str = Query("json", regex="^(json|text)$", description="text renders a waterfall"),
+    current_user = Depends(require_admin)
+):
+    """
+    Admin-only: Every span of one trace, with offsets and durations relative to the root span.
+    """
+    trace = tracing.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    if format == "text":
+        return PlainTextResponse(tracing.waterfall(trace))
+    return FastJSONResponse(trace)
@@ -1,21 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.crud.contests import get_contest
-from app.dependencies.auth import get_current_user, require_admin, require_preparer
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.dependencies.auth import Principal, get_current_user, require_admin, require_preparer, get_contest_for_request
 from sqlalchemy.orm import Session
 from app.db import get_db
 from app import models
-from app.crud import attendance
+from app.crud import attendance, standings, ratings
 from app.schemas import attendance_schemas as schemas
 from app.crud.attendance import fetch_contest_attendance
 from app.services.ratings import Codeforces
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from app.logs import summarize
+import logging
 
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/attendance", tags=["attendance"])
 
 # Dependency wrapper for preparer access
-async def preparer_dependency(contest_id: str, current_user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+async def preparer_dependency(contest_id: str, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     return await require_preparer(contest_id, current_user, db)
 
 @router.post("/{contest_id}/attendance", response_model=dict)
@@ -23,27 +25,33 @@ async def submit_attendance(
     contest_id: str,
     body: schemas.SubmitAttendanceRequest,
     db: AsyncSession = Depends(get_db),
-    current_user = Depends(preparer_dependency)
+    current_user = Depends(preparer_dependency),
+    contest: models.Contest = Depends(get_contest_for_request)
 ):
     try:
-        contest = await get_contest(db=db, contest_id=contest_id)
-        if not contest:
-            raise HTTPException(status_code=404, detail="Contest not found")
+        try:
+            ranking_data, standings_version = await standings.resolve_ranking_data(db, contest, body.ranking_data, body.standings_version)
+        except standings.StandingsVersionMismatch as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=502, detail=f"Could not load contest standings: {e}")
 
         for record in body.attendance:
             await attendance.record_attendance(db, contest_id, record.user_id, record.status, commit=False)
 
         await db.commit()
-        print("attendance recorded", body.attendance)
-        print("ranking data received", body.ranking_data)
+        logger.info(
+            "Recorded attendance for contest %s: %d records, ranking data %s",
+            contest_id, len(body.attendance), summarize(body.ranking_data),
+        )
 
         # Save contest data snapshot for rollback/replay
-        await attendance.save_contest_data_snapshot(db, contest_id, body.attendance, body.ranking_data)
+        await attendance.save_contest_data_snapshot(db, contest_id, body.attendance, ranking_data, standings_version)
 
         rating_summary = []
-        codeforces = Codeforces(db=db, div=contest.division, ranking=body.ranking_data, attendance=body.attendance)
+        codeforces = Codeforces(db=db, div=contest.division, ranking=ranking_data, attendance=body.attendance)
         rating_updates = await codeforces.calculate_final_ratings(penality=50) # Penality not set yet!
-        print("rating updates calculated", rating_updates)
+        logger.debug("Rating updates for contest %s: %s", contest_id, summarize(rating_updates))
         
         # Apply rating updates in all tables related to user ratings
         for user_id, delta in rating_updates.items():
@@ -61,12 +69,17 @@ async def submit_attendance(
         await attendance.record_rating_history_batch(db, rating_summary)
 
         await db.commit()
+        await ratings.save_rating_snapshot(db, contest)
 
-        return {
+        response = {
             "message": "Attendance and ranking data recorded",
-            "ranking_data": body.ranking_data,
             "rating_summary": rating_summary
         }
+        if standings_version is None:
+            response["ranking_data"] = body.ranking_data
+        else:
+            response["standings_version"] = standings_version
+        return response
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -83,12 +96,11 @@ async def get_contest_attendance(
     Preparer-only: Get list of all active participants in this contest's division.
     Pre-mark those who actually competed as Present.
     """
-    print("getting attendance for contest", contest_id)
     try:
         # check for the contest id inside the attendance table
         data = await attendance.fetch_contest_attendance(db, contest_id)
     except ValueError as e:
-        print("error", e)
+        logger.info("No attendance for contest %s: %s", contest_id, e)
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal Server Error fetching attendance: {e}")
@@ -102,37 +114,48 @@ async def update_attendance(
     contest_id: str,
     body: schemas.UpdateAttendanceRequest,
     db: AsyncSession = Depends(get_db),
-    current_user = Depends(preparer_dependency)
+    current_user = Depends(preparer_dependency),
+    contest: models.Contest = Depends(get_contest_for_request)
 ):
     """
     Update attendance records for a specific contest.
     """
     try:
+        try:
+            ranking_data, standings_version = await standings.resolve_ranking_data(db, contest, body.ranking_data, body.standings_version)
+        except standings.StandingsVersionMismatch as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=502, detail=f"Could not load contest standings: {e}")
+
+        # In server-side standings mode the body only carries attendance changes
+        attendance_records = body.attendance
+        if standings_version is not None:
+            previous_attendance = await attendance.fetch_snapshot_attendance(db, contest_id)
+            attendance_records = attendance.merge_attendance(previous_attendance, body.attendance)
+
         # 1. Rollback all previous rating and attendance effects for this contest
         await attendance.rollback_contest_ratings_and_attendance(db, contest_id)
 
         # 2. Update attendance records (fresh)
-        for record in body.attendance:
+        for record in attendance_records:
             await attendance.record_attendance(db, contest_id, record.user_id, record.status, commit=False)
 
         await db.commit()
-        print("attendance updated", body.attendance)
-        print("ranking data received", body.ranking_data)
+        logger.info(
+            "Updated attendance for contest %s: %d records, ranking data %s",
+            contest_id, len(attendance_records), summarize(body.ranking_data),
+        )
 
         # Save contest data snapshot for rollback/replay
-        await attendance.save_contest_data_snapshot(db, contest_id, body.attendance, body.ranking_data)
-
-        # 3. Get contest info for division
-        contest = await get_contest(db=db, contest_id=contest_id)
-        if not contest:
-            raise HTTPException(status_code=404, detail="Contest not found for update")
+        await attendance.save_contest_data_snapshot(db, contest_id, attendance_records, ranking_data, standings_version)
 
         rating_summary = []
-        codeforces = Codeforces(db=db, div=contest.division, ranking=body.ranking_data, attendance=body.attendance)
+        codeforces = Codeforces(db=db, div=contest.division, ranking=ranking_data, attendance=attendance_records)
         rating_updates = await codeforces.calculate_final_ratings(penality=50) # Penality not set yet!
-        print("rating updates calculated", rating_updates)
+        logger.debug("Rating updates for contest %s: %s", contest_id, summarize(rating_updates))
 
-        # 4. Apply rating updates in all tables related to user ratings
+        # 3. Apply rating updates in all tables related to user ratings
         for user_id, delta in rating_updates.items():
             updated_user = await attendance.apply_rating_update(db, user_id, delta, commit=False)
             if updated_user:
@@ -144,27 +167,85 @@ async def update_attendance(
                     "delta": delta
                 })
 
-        # 5. Batch insert RatingHistory records using CRUD function
+        # 4. Batch insert RatingHistory records using CRUD function
         await attendance.record_rating_history_batch(db, rating_summary)
 
         await db.commit()
+        await ratings.save_rating_snapshot(db, contest)
 
-        # 6. Replay all subsequent contests for true rating accuracy
-        print(f"[REPLAY] Replaying all subsequent contests after {contest_id}...")
+        # 5. Replay all subsequent contests for true rating accuracy
+        logger.info("Replaying contests after %s", contest_id)
         await attendance.replay_subsequent_contests(db, contest_id)
-        print(f"[REPLAY] Replay complete for all subsequent contests after {contest_id}.")
+        logger.info("Replay complete for contests after %s", contest_id)
 
-        return {
+        response = {
             "message": "Attendance and ratings updated (with rollback and replay)",
             "attendance": body.attendance,
-            "ranking_data": body.ranking_data,
             "rating_summary": rating_summary
         }
+        if standings_version is None:
+            response["ranking_data"] = body.ranking_data
+        else:
+            response["standings_version"] = standings_version
+        return response
     except HTTPException as e:
         raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal Server Error during attendance update: {e}")
 
+INCLUDE_ROWS = Query(False, description="Also return every cached standings row")
+
+
+def _standings_read(contest_standings: models.ContestStandings, include_rows: bool) -> dict:
+    return {
+        "contest_id": contest_standings.contest_id,
+        "codeforces_contest_id": contest_standings.codeforces_contest_id,
+        "version": contest_standings.version,
+        "fetched_at": contest_standings.fetched_at,
+        "row_count": len(contest_standings.rows),
+        "rows": contest_standings.rows if include_rows else None,
+    }
+
+
+@router.post("/{contest_id}/standings", response_model=schemas.ContestStandingsRead, response_model_exclude_none=True)
+async def ingest_contest_standings(
+    contest_id: str,
+    refresh: bool = Query(False, description="Re-fetch standings from Codeforces even if cached"),
+    include_rows: bool = INCLUDE_ROWS,
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(preparer_dependency),
+    contest: models.Contest = Depends(get_contest_for_request)
+):
+    """
+    Preparer-only: Fetch and cache the final Codeforces standings for this contest.
+    Returns the cached version and row count; the rows only with include_rows.
+    """
+    try:
+        contest_standings = await standings.ingest_contest_standings(db, contest, refresh=refresh)
+        return _standings_read(contest_standings, include_rows)
+    except ValueError as e:
+        raise HTTPException(status_code=502, detail=f"Could not load contest standings: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal Server Error ingesting standings: {e}")
+
+
+@router.get("/{contest_id}/standings", response_model=schemas.ContestStandingsRead, response_model_exclude_none=True)
+async def get_contest_standings(
+    contest_id: str,
+    include_rows: bool = INCLUDE_ROWS,
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(preparer_dependency)
+):
+    """
+    Preparer-only: Get the version and row count of the cached standings for this contest;
+    the rows only with include_rows.
+    """
+    contest_standings = await standings.get_contest_standings(db, contest_id)
+    if not contest_standings:
+        raise HTTPException(status_code=404, detail="Standings not ingested for this contest")
+    return _standings_read(contest_standings, include_rows)
+
+
 @router.get("/{contest_id}/{user_id}", response_model=bool)
 async def get_attendance_for_user(contest_id: str, user_id: int, db: AsyncSession = Depends(get_db)):
     """
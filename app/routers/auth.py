@@ -6,9 +6,8 @@ from app.db import get_db
 from app.crud import users as crud_users
 from app.crud import refresh_tokens as crud_refresh
 from app.security import (
-    create_access_token, create_refresh_token, verify_password
+    HasherOverloaded, create_access_token, create_refresh_token, password_hasher
 )
-from fastapi.concurrency import run_in_threadpool
 from app.config import settings
 from app.schemas import user_schemas
 from app.dependencies.auth import get_current_user
@@ -21,7 +20,8 @@ import re
 # Schema for refresh token request
 from pydantic import BaseModel
 
-from app.services.codeforces import verify_handle
+from app.services.codeforces import verify_handle, breaker as codeforces_breaker
+from app.services.circuit_breaker import CircuitOpenError
 
 class RefreshTokenRequest(BaseModel):
     refresh_token: str
@@ -34,12 +34,19 @@ HANDLE_RE = re.compile(r'^[A-Za-z0-9_-]{1,100}$')
 async def login_user(db: AsyncSession = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()):
     try:
         user = await crud_users.get_user_by_handle(db, handle=form_data.username)
-        if not user or not await run_in_threadpool(verify_password, form_data.password, user.hashed_password):
+        valid, new_hash = (False, None)
+        if user:
+            valid, new_hash = await password_hasher.verify_and_update(form_data.password, user.hashed_password)
+        if not valid:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect username or password",
                 headers={"WWW-Authenticate": "Bearer"},
             )
+
+        # Rehash with the configured cost; committed together with the refresh token
+        if new_hash:
+            user.hashed_password = new_hash
         
         access_token = create_access_token(data={"sub": user.codeforces_handle})
         refresh_token_str = create_refresh_token(data={"sub": user.codeforces_handle})
@@ -66,6 +73,8 @@ async def login_user(db: AsyncSession = Depends(get_db), form_data: OAuth2Passwo
         })
     except HTTPException as e:
         raise e
+    except HasherOverloaded:
+        raise HTTPException(status_code=503, detail="Server is busy, please retry shortly", headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal Server Error during login: {e}")
 
@@ -77,8 +86,7 @@ async def refresh_access_token(
 ):
     try:
         refresh_token = req.refresh_token
-        db_token = await crud_refresh.get_refresh_token(db, token=refresh_token)
-        if not db_token or db_token.is_revoked or db_token.expires_at < datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None):
+        if crud_refresh.is_known_revoked(refresh_token):
             raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
 
         try:
@@ -89,23 +97,19 @@ async def refresh_access_token(
         except JWTError:
             raise HTTPException(status_code=401, detail="Invalid refresh token")
 
-        user = await crud_users.get_user_by_handle(db, handle=username)
-        if not user:
-            raise HTTPException(status_code=401, detail="User not found")
-
-        # Revoke the old refresh token
-        await crud_refresh.revoke_refresh_token(db, token=refresh_token)
-
-        # Issue new tokens
-        new_access_token = create_access_token(data={"sub": user.codeforces_handle})
-        new_refresh_token = create_refresh_token(data={"sub": user.codeforces_handle})
+        # Issue new tokens, then revoke the old one and store the new one in a single transaction
+        new_access_token = create_access_token(data={"sub": username})
+        new_refresh_token = create_refresh_token(data={"sub": username})
 
-        await crud_refresh.create_refresh_token(
+        user_id = await crud_refresh.rotate_refresh_token(
             db,
-            user_id=user.id,
-            token=new_refresh_token,
+            old_token=refresh_token,
+            handle=username,
+            new_token=new_refresh_token,
             expires_in=timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
         )
+        if user_id is None:
+            raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
 
         return {"access_token": new_access_token, "refresh_token": new_refresh_token, "token_type": "bearer"}
     except HTTPException as e:
@@ -130,5 +134,9 @@ async def register(user_in: user_schemas.UserCreate, db: AsyncSession = Depends(
         return await crud_users.create_user(db, user_in)
     except HTTPException as e:
         raise e
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=f"Cannot verify handle right now: {e}", headers={"Retry-After": str(codeforces_breaker.retry_after())})
+    except HasherOverloaded:
+        raise HTTPException(status_code=503, detail="Server is busy, please retry shortly", headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal Server Error during user registration: {e}")
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.orm import Session
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db import get_db
@@ -8,6 +8,41 @@ from app.schemas import contest_schemas, user_schemas
 from app import models
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload
+from app.cache import resource_versions
+from app.conditional import make_etag, not_modified, cached_response, versioned_response
+from app.pagination import MAX_PAGE_SIZE, decode_cursor, split_page, next_cursor_headers
+from app.streaming import ndjson_response
+from app.serialization import FastJSONResponse, dumps, project
+from typing import Optional
+import datetime, logging
+
+logger = logging.getLogger(__name__)
+
+CONTEST_CURSOR = (datetime.datetime, str)
+
+
+def _contest_key(row):
+    return (row.date, row.id)
+
+
+def _contest_payload(row, preparers) -> dict:
+    return project(contest_schemas.ContestRead, {
+        **row._mapping,
+        "preparers": [project(user_schemas.UserRead, preparer) for preparer in preparers],
+    })
+
+
+async def _contest_page(db: AsyncSession, etag: str, limit: Optional[int], **filters):
+    rows = await contests.get_contest_rows(db, limit=limit, **filters)
+    rows, next_cursor = split_page(rows, limit, _contest_key)
+    preparers = await contests.get_preparer_rows(db, [row.id for row in rows])
+    payload = [_contest_payload(row, preparers[row.id]) for row in rows]
+    return versioned_response(dumps(payload), etag, next_cursor_headers(next_cursor))
+
+
+async def _contest_chunks(db: AsyncSession, division: Optional[str] = None):
+    async for chunk, preparers in contests.stream_contest_rows(db, division):
+        yield [_contest_payload(row, preparers[row.id]) for row in chunk]
 
 router = APIRouter(prefix="/api/contests", tags=["contests"])
 
@@ -17,7 +52,6 @@ async def create_contest(
     db: AsyncSession = Depends(get_db),
     current_user = Depends(require_admin)
 ):
-    print("hitting create contest endpoint", contest_in)
     """
     Admin-only: Create a new contest and (optionally) assign one or more preparers.
     """
@@ -44,38 +78,60 @@ async def assign_preparers(
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
     except Exception as e:
-        print(f"Error occurred: {e}")
+        logger.exception("Assigning preparers to contest %s failed", contest_id)
         raise HTTPException(status_code=500, detail=f"Internal Server Error assigning preparers: {e}")
     # Return as Pydantic model
     return contest_schemas.ContestRead.from_orm(updated_contest)
 
 
 @router.get("/my", response_model=list[contest_schemas.ContestRead])
-async def list_my_contests(db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
+async def list_my_contests(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; omit for every contest"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    format: str = Query("json", regex="^(json|ndjson)$", description="ndjson streams every contest (admin only)"),
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
     """
     List all contests the current user has participated in (attendance), or all contests if admin.
+    Ordered by date; with `limit`, the next page's cursor is returned in X-Next-Cursor.
     """
+    if format == "ndjson":
+        if current_user.role != models.UserRole.Admin:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Operation requires admin privileges")
+        return ndjson_response(_contest_chunks(db), dumps)
+    after = decode_cursor(cursor, CONTEST_CURSOR)
+    etag = make_etag("contests-my", current_user.id, getattr(current_user.role, "value", current_user.role), resource_versions.get("contests"), limit or "", cursor or "")
+    unchanged = not_modified(request, etag) or cached_response(etag)
+    if unchanged:
+        return unchanged
     try:
-        contests_list = await contests.get_user_contests(db, current_user)
-        return [contest_schemas.ContestRead.from_orm(contest) for contest in contests_list]
+        return await _contest_page(db, etag, limit, user=current_user, after=after)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal Server Error listing user contests: {e}")
 
 @router.get("/division/{division}", response_model=list[contest_schemas.ContestRead])
-async def get_contests_by_division(division: str, db: AsyncSession = Depends(get_db)):
+async def get_contests_by_division(
+    division: str,
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; omit for every contest"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    format: str = Query("json", regex="^(json|ndjson)$", description="ndjson streams every contest in the division"),
+    db: AsyncSession = Depends(get_db)
+):
     """
-    Return all contests for a given division (e.g., 'Div1' or 'Div2').
+    Return all contests for a given division (e.g., 'Div1' or 'Div2'), ordered by date.
     """
-    print("request recieved for", division)
+    if format == "ndjson":
+        return ndjson_response(_contest_chunks(db, division), dumps)
+    after = decode_cursor(cursor, CONTEST_CURSOR)
+    etag = make_etag("contests-division", division.replace(" ", "_"), resource_versions.get("contests"), limit or "", cursor or "")
+    unchanged = not_modified(request, etag) or cached_response(etag)
+    if unchanged:
+        return unchanged
     try:
-        result = await db.execute(
-            select(models.Contest)
-            .options(selectinload(models.Contest.preparers))
-            .filter(models.Contest.division == division)
-        )
-        contests_list = result.scalars().all()
-        reformated_contests = [contest_schemas.ContestRead.from_orm(contest) for contest in contests_list]
-        return reformated_contests
+        return await _contest_page(db, etag, limit, division=division, after=after)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal Server Error getting contests by division: {e}")
 
@@ -92,19 +148,11 @@ async def get_contest_preparers(contest_id: str, db: AsyncSession = Depends(get_
         
 
         # get the preparers from the contest_preparers table
-        result = await db.execute(
-            select(models.User)
-            .join(models.contest_preparer_table, models.User.id == models.contest_preparer_table.c.user_id)
-            .filter(models.contest_preparer_table.c.contest_id == contest_id)
-        )
-        filtered_preparers = result.scalars().all()
-
-        reformatted_preparers = [user_schemas.UserRead.from_orm(user) for user in filtered_preparers]
+        preparers = (await contests.get_preparer_rows(db, [contest_id]))[contest_id]
 
-        # Print the user ids of the prepared preparers
-        print("preparers are", reformatted_preparers, len(reformatted_preparers))
+        reformatted_preparers = [project(contest_schemas.ContestPreparers, user) for user in preparers]
 
-        return reformatted_preparers
+        return FastJSONResponse(reformatted_preparers)
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -0,0 +1,85 @@
+from fastapi import APIRouter, Header, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from app import admission, metrics
+from app.config import settings
+from app.db import HEAVY_POOL, engine, heavy_engine, read_engine, read_router
+from app.services.codeforces import breaker as codeforces_breaker
+from app.security import password_hasher
+from typing import Optional
+import hmac
+
+router = APIRouter(tags=["metrics"])
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+BREAKER_STATES = (codeforces_breaker.CLOSED, codeforces_breaker.HALF_OPEN, codeforces_breaker.OPEN)
+
+
+def _pool_samples():
+    pools = [("primary", engine.sync_engine.pool)]
+    if heavy_engine is not None:
+        pools.append((HEAVY_POOL, heavy_engine.sync_engine.pool))
+    if read_engine is not None:
+        pools.append(("read", read_engine.sync_engine.pool))
+    checked_out, idle, overflow, size = [], [], [], []
+    for name, pool in pools:
+        # NullPool / StaticPool (in-memory SQLite) have no queue to report
+        if not hasattr(pool, "checkedout"):
+            continue
+        labels = {"pool": name}
+        checked_out.append((labels, pool.checkedout()))
+        idle.append((labels, pool.checkedin()))
+        overflow.append((labels, pool.overflow()))
+        size.append((labels, pool.size()))
+    return [
+        ("db_pool_checked_out", "gauge", "Connections currently checked out", checked_out),
+        ("db_pool_idle", "gauge", "Idle connections in the pool", idle),
+        ("db_pool_overflow", "gauge", "Connections opened beyond pool_size (negative while the pool fills)", overflow),
+        ("db_pool_size", "gauge", "Configured pool size", size),
+    ]
+
+
+def _dependency_samples():
+    breaker = codeforces_breaker.stats()
+    hasher = password_hasher.stats()
+    routing = read_router.stats()
+    return [
+        ("codeforces_breaker_state", "gauge", "1 for the current circuit breaker state",
+         [({"state": state}, int(breaker["state"] == state)) for state in BREAKER_STATES]),
+        ("codeforces_breaker_trips_total", "counter", "Times the Codeforces circuit opened", [({}, breaker["trips"])]),
+        ("codeforces_breaker_rejected_total", "counter", "Calls rejected by the open circuit", [({}, breaker["rejected"])]),
+        ("password_hash_queue_depth", "gauge", "Password hashes queued or running", [({}, hasher["queue_depth"])]),
+        ("password_hash_rejected_total", "counter", "Password hashes rejected with 503", [({}, hasher["rejected"])]),
+        ("password_hash_total", "counter", "Password hashes and verifications completed", [({}, hasher["calls"])]),
+        ("password_hash_seconds_total", "counter", "Time spent hashing, excluding the queue wait", [({}, hasher["hash_seconds_total"])]),
+        ("password_hash_wait_seconds_total", "counter", "Time hashes spent queued for a worker", [({}, hasher["wait_seconds_total"])]),
+        ("db_sessions_total", "counter", "Request sessions by database target",
+         [({"target": "replica"}, routing["replica_sessions"]), ({"target": "primary"}, routing["primary_sessions"])]),
+    ]
+
+
+def _admission_samples():
+    classes = admission.stats()
+    def series(key):
+        return [({"class": name}, values[key]) for name, values in classes.items()]
+    return [
+        ("admission_active", "gauge", "Requests admitted and running", series("active")),
+        ("admission_queued", "gauge", "Requests waiting for admission", series("queued")),
+        ("admission_rejected_total", "counter", "Requests rejected with 429 because the queue was full", series("rejected")),
+        ("admission_timed_out_total", "counter", "Requests rejected with 503 after waiting too long", series("timed_out")),
+    ]
+
+
+metrics.register_collector(_pool_samples)
+metrics.register_collector(_dependency_samples)
+metrics.register_collector(_admission_samples)
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics(authorization: Optional[str] = Header(None)):
+    """
+    Prometheus text exposition of this worker's metrics. Requires
+    `Authorization: Bearer <METRICS_TOKEN>` when METRICS_TOKEN is set.
+    """
+    if settings.METRICS_TOKEN and not hmac.compare_digest(authorization or "", f"Bearer {settings.METRICS_TOKEN}"):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+    return PlainTextResponse(metrics.render(), media_type=PROMETHEUS_MEDIA_TYPE)
@@ -1,44 +1,123 @@
-from fastapi import APIRouter, Depends, Query, HTTPException, status
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db import get_db
+from app.db import get_db, get_primary_db
 from app.crud import users, ratings
 from app.schemas import rating_schemas 
 from app.dependencies.auth import get_current_user
+from app.crud.contests import get_contest
+from app.services.leaderboard import leaderboard_store, leaderboard_as_of
+from app.conditional import make_etag, not_modified, versioned_response
+from app.serialization import FastJSONResponse
+from typing import Optional
 
 router = APIRouter(prefix="/rating", tags=["Rating"])
 
+
+def _leaderboard_division(current_user):
+    if hasattr(current_user, "role") and getattr(current_user, "role", None) == "Admin":
+        return None
+    return getattr(current_user, "division", None)
+
+
+def _parse_cursor(cursor: Optional[str]):
+    if cursor is None:
+        return None
+    try:
+        rating, user_id = cursor.split("_", 1)
+        return int(rating), int(user_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
 @router.get("/", response_model=list[rating_schemas.LeaderboardEntry])
 async def get_leaderboard(
-    db: AsyncSession = Depends(get_db),
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, description="Only return the top N entries"),
+    # Boards are rebuilt rarely and then kept, so never build one from a lagging replica
+    db: AsyncSession = Depends(get_primary_db),
     current_user = Depends(get_current_user)
 ):
     """
     Get leaderboard of all active users, filtered by the current user's division (from token).
     Admins see all divisions.
     """
+    division = _leaderboard_division(current_user)
+    etag = make_etag("rating", division or "all", leaderboard_store.version(division), limit or "")
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
     try:
-        if hasattr(current_user, "role") and getattr(current_user, "role", None) == "Admin":
-            division = None
-        else:
-            division = getattr(current_user, "division", None)
-        results = await ratings.get_leaderboard(db, division)
-
-        leaderboard = []
-        rank = 1
-        for user, rating in results:
-            leaderboard.append(
-                rating_schemas.LeaderboardEntry(
-                    rank=rank,
-                    user_id=user.id,
-                    name=user.name,
-                    codeforces_handle=user.codeforces_handle,
-                    division=user.division,
-                    current_rating=rating.current_rating
-                )
-            )
-            rank += 1
-
-        return leaderboard
+        board = await leaderboard_store.get(db, division)
+        if limit is not None:
+            return versioned_response(board.entries(0, limit), etag)
+        # The full board is serialized once per version
+        return versioned_response(board.json(), etag)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal Server Error getting leaderboard: {e}")
+
+
+@router.get("/page", response_model=rating_schemas.LeaderboardPage)
+async def get_leaderboard_page(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    db: AsyncSession = Depends(get_primary_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Keyset-paginated leaderboard for the current user's division (all divisions for admins).
+    """
+    after = _parse_cursor(cursor)
+    try:
+        board = await leaderboard_store.get(db, _leaderboard_division(current_user))
+        entries, next_cursor = board.page(after=after, limit=limit)
+        return FastJSONResponse({
+            "division": board.key,
+            "version": board.version,
+            "entries": entries,
+            "next_cursor": f"{next_cursor[0]}_{next_cursor[1]}" if next_cursor else None
+        })
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal Server Error getting leaderboard page: {e}")
+
+
+@router.get("/me", response_model=rating_schemas.MyRank)
+async def get_my_rank(
+    k: int = Query(5, ge=0, le=50, description="Number of neighbours above and below"),
+    db: AsyncSession = Depends(get_primary_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    The current user's rank, percentile and +-k neighbours in their division.
+    """
+    try:
+        board = await leaderboard_store.get(db, current_user.division)
+        neighbourhood = board.neighbourhood(current_user.id, k)
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal Server Error getting rank: {e}")
+    if neighbourhood is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User is not on the leaderboard")
+    return FastJSONResponse({"division": board.key, "version": board.version, **neighbourhood})
+
+
+@router.get("/as-of/{contest_id}", response_model=list[rating_schemas.LeaderboardEntry])
+async def get_leaderboard_as_of(
+    contest_id: str,
+    # May backfill and store the contest's rating snapshot
+    db: AsyncSession = Depends(get_primary_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Leaderboard of the contest's division as it stood right after that contest.
+    Like `/`, limited to the current user's division; admins see every division.
+    """
+    contest = await get_contest(db, contest_id)
+    if not contest:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contest not found")
+    division = _leaderboard_division(current_user)
+    if division is not None and division != contest.division:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Contest is not in your division")
+    try:
+        return FastJSONResponse(await leaderboard_as_of(db, contest))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal Server Error getting leaderboard as of contest: {e}")
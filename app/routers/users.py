@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -8,13 +8,30 @@ from ..schemas import user_schemas
 
 from ..crud import users
 from ..db import get_db
-from ..services.codeforces import verify_handle
-import re
+from ..cache import resource_versions
+from ..conditional import make_etag, not_modified, cached_response, versioned_response
+from ..pagination import MAX_PAGE_SIZE, decode_cursor, split_page, next_cursor_headers
+from ..serialization import FastJSONResponse, dumps, project
+from ..streaming import ndjson_response
+from ..models import UserRole
+from ..services.codeforces import verify_handle, breaker as codeforces_breaker
+from ..services.circuit_breaker import CircuitOpenError
+from ..security import HasherOverloaded
+from typing import Optional
+import logging, re
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/users", tags=["users"])
 
+
+def _user_json(row) -> bytes:
+    return dumps(project(user_schemas.UserRead, row))
+
+
 @router.get("/profile", response_model=user_schemas.UserProfile)
 async def get_me(
+    request: Request,
     include_history: bool = Query(False, description="Include rating history if true"),
     db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user)
@@ -22,39 +39,49 @@ async def get_me(
     """
     Get the current user's profile, rating, and optionally rating history.
     """
+    etag = make_etag("profile", current_user.id, int(include_history), resource_versions.get("user", current_user.id))
+    unchanged = not_modified(request, etag) or cached_response(etag)
+    if unchanged:
+        return unchanged
     try:
-        user, rating = await users.get_user_with_rating(db, current_user.id)
+        user = await users.get_user_profile_row(db, current_user.id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
 
         history = None
         if include_history:
-            history = await users.get_user_rating_history(db, current_user.id)
-
-        return user_schemas.UserProfile(
-            id=user.id,
-            name=user.name,
-            email=user.email,
-            codeforces_handle=user.codeforces_handle,
-            division=user.division,
-            role=user.role,
-            current_rating=user.rating,
-            history=history
-        )
+            rows = await users.get_user_rating_history_rows(db, current_user.id)
+            history = [project(user_schemas.RatingHistoryEntry, row) for row in rows]
+
+        profile = project(user_schemas.UserProfile, {**user._mapping, "id": str(user.id), "history": history})
+        return versioned_response(dumps(profile), etag)
     except HTTPException as e:
         raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal Server Error retrieving user profile: {e}")
 
 @router.get("/all", response_model=list[user_schemas.UserRead])
-async def get_all_users(db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
+async def get_all_users(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; omit for every user"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    format: str = Query("json", regex="^(json|ndjson)$", description="ndjson streams every user (admin only)"),
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
     """
-    Return all users in the database. Requires authentication.
+    Return all users in the database, ordered by id. Requires authentication.
+    With `limit`, returns one page and the next page's cursor in X-Next-Cursor.
     """
+    if format == "ndjson":
+        if current_user.role != UserRole.Admin:
+            raise HTTPException(status_code=403, detail="Operation requires admin privileges")
+        return ndjson_response(users.stream_user_rows(db), _user_json)
+    after = decode_cursor(cursor, (int,))
     try:
-        users_list = await users.get_all_users(db)
-        # Convert SQLAlchemy User objects to Pydantic models
-        return [user_schemas.UserRead.from_orm(user) for user in users_list]
+        rows = await users.get_user_rows(db, after=after, limit=limit)
+        rows, next_cursor = split_page(rows, limit, lambda row: (row.id,))
+        payload = [project(user_schemas.UserRead, row) for row in rows]
+        return FastJSONResponse(payload, headers=next_cursor_headers(next_cursor))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal Server Error retrieving all users: {e}")
 
@@ -63,11 +90,9 @@ async def get_users_by_division(division: str, db: AsyncSession = Depends(get_db
     """
     Get all users in a specific division.
     """
-    print("getting all users in division", division)
     try:
-        users_list = await users.get_users_by_division(db, division)
-        users_list = [user for user in users_list if user.status == "Active"]
-        return [user_schemas.UserRead.from_orm(user) for user in users_list]
+        rows = await users.get_user_rows(db, division=division, active_only=True)
+        return FastJSONResponse([project(user_schemas.UserRead, row) for row in rows])
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal Server Error retrieving users by division: {e}")
 
@@ -90,10 +115,14 @@ async def update_user(handle: str, body: user_schemas.UserUpdate, db: AsyncSessi
                 raise HTTPException(status_code=400, detail="Invalid email format")
 
         updated_user = await users.update_user(db, user.id, body.dict(exclude_unset=True))
-        print("updated user", updated_user)
+        logger.info("Updated profile of user %s", updated_user.id)
 
         return user_schemas.UserRead.from_orm(updated_user)
     except HTTPException as e:
         raise e
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=f"Cannot verify handle right now: {e}", headers={"Retry-After": str(codeforces_breaker.retry_after())})
+    except HasherOverloaded:
+        raise HTTPException(status_code=503, detail="Server is busy, please retry shortly", headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal Server Error updating user profile: {e}")
\ No newline at end of file
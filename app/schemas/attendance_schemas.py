@@ -1,5 +1,6 @@
 from pydantic import BaseModel
-from typing import List, Any
+from typing import List, Any, Optional
+from datetime import datetime
 from app.models import AttendanceStatus
 
 
@@ -12,8 +13,11 @@ class AttendanceCreate(AttendanceBase):
     status: AttendanceStatus
 
 class UpdateAttendanceRequest(BaseModel):
+    # Without ranking_data the server-side standings are used and attendance
+    # only carries the records that changed since the last submission.
     attendance: List[AttendanceCreate]
-    ranking_data: List[dict]
+    ranking_data: Optional[List[dict]] = None
+    standings_version: Optional[int] = None
 
 class AttendanceRead(AttendanceBase):
     id: str
@@ -22,5 +26,23 @@ class AttendanceRead(AttendanceBase):
 
 class SubmitAttendanceRequest(BaseModel):
     attendance: List[AttendanceCreate]
-    ranking_data: List[dict]
+    ranking_data: Optional[List[dict]] = None
+    standings_version: Optional[int] = None
+
+
+class StandingsRow(BaseModel):
+    handle: str
+    rank: int
+    score: float = 0
+    penalty: int = 0
+
+
+class ContestStandingsRead(BaseModel):
+    contest_id: str
+    codeforces_contest_id: str
+    version: int
+    fetched_at: datetime
+    row_count: int
+    # Only with ?include_rows=true
+    rows: Optional[List[StandingsRow]] = None
 
@@ -0,0 +1,33 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+PROFILE_FORMAT = "^(folded|pstats)$"
+
+
+class ProfileRequest(BaseModel):
+    method: str = "GET"
+    path: str
+    params: Dict[str, str] = {}
+    body: Optional[Any] = None
+    format: str = Field("folded", regex=PROFILE_FORMAT)
+
+
+class ProfileRoute(BaseModel):
+    method: str = "GET"
+    route: str = Field(..., description="Route template, e.g. /api/attendance/{contest_id}/attendance")
+    count: int = Field(1, ge=1, le=100)
+    format: str = Field("folded", regex=PROFILE_FORMAT)
+
+
+class ProfileRead(BaseModel):
+    id: str
+    kind: str
+    target: str
+    format: str
+    status: str
+    started_at: datetime
+    duration_seconds: Optional[float] = None
+    samples: int = 0
+    error: Optional[str] = None
+    status_code: Optional[int] = None
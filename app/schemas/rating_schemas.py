@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
+from typing import List, Optional
 
 
 class RatingBase(BaseModel):
@@ -29,4 +30,23 @@ class RatingHistoryEntry(BaseModel):
     timestamp: datetime
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+
+class LeaderboardPage(BaseModel):
+    division: str
+    version: int
+    entries: List[LeaderboardEntry]
+    next_cursor: Optional[str] = None
+
+
+
+class MyRank(BaseModel):
+    division: str
+    version: int
+    entry: LeaderboardEntry
+    position: int
+    total: int
+    percentile: float
+    above: List[LeaderboardEntry] = []
+    below: List[LeaderboardEntry] = []
@@ -1,10 +1,22 @@
 from passlib.context import CryptContext
+import asyncio
+import hashlib
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 from jose import JWTError, jwt
 from app.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min/max rounds pin the cost, so hashes made with another cost report needs_update
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
 
 SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = settings.ALGORITHM
@@ -20,6 +32,98 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str):
+    """
+    Returns (valid, new_hash); new_hash is set when the stored hash was made
+    with a different cost and should be replaced.
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+def _timed_call(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+class HasherOverloaded(Exception):
+    """max_pending password hashes are already queued or running."""
+
+
+class PasswordHasher:
+    """
+    Dedicated, bounded executor for bcrypt work, separate from the threadpool
+    shared with sync dependencies. Calls beyond max_pending outstanding
+    requests raise HasherOverloaded instead of queueing without limit.
+    """
+
+    def __init__(self, kind: str, workers: int, max_pending: int):
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+
+        self.pending = 0
+        self.calls = 0
+        self.rejected = 0
+        self.hash_seconds_total = 0.0
+        self.wait_seconds_total = 0.0
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    async def run(self, func, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HasherOverloaded(f"{self.pending} password hashes pending")
+
+        self.pending += 1
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result, hash_seconds = await loop.run_in_executor(self._get_executor(), _timed_call, func, *args)
+        finally:
+            self.pending -= 1
+        self.calls += 1
+        self.hash_seconds_total += hash_seconds
+        self.wait_seconds_total += time.perf_counter() - start - hash_seconds
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self.run(hash_password, password)
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str):
+        return await self.run(verify_and_update_password, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        return {
+            "executor": self.kind,
+            "workers": self.workers,
+            "queue_depth": self.pending,
+            "max_pending": self.max_pending,
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "hash_seconds_total": self.hash_seconds_total,
+            "wait_seconds_total": self.wait_seconds_total,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    kind=settings.PASSWORD_HASH_EXECUTOR,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -33,6 +137,11 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 def create_refresh_token(data: dict):
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire})
+    # jti keeps two tokens issued in the same second for a user distinct
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
+
+
+def token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
@@ -0,0 +1,54 @@
+from fastapi.responses import JSONResponse
+from typing import Any
+import datetime, enum, json
+
+try:
+    import orjson
+except ImportError:  # optional: fall back to the stdlib encoder
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Encode plain JSON values (dicts, lists, str, int, float, bool, None) to the
+    same bytes FastAPI's JSONResponse renders, using orjson when installed.
+    """
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse for content that is already plain JSON values."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _plain(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, list):
+        return [_plain(v) for v in value]
+    return value
+
+
+def plain_row(row) -> dict:
+    """A Core row as a dict of JSON-ready values, keyed by column label."""
+    return {key: _plain(value) for key, value in row._mapping.items()}
+
+
+def project(schema, row) -> dict:
+    """
+    Turn a Core row (or mapping) into the dict jsonable_encoder would produce
+    for `schema`: its fields in declaration order, enums as values, datetimes
+    as ISO strings and missing fields at their defaults. No validation is done,
+    so the selected columns must already have the schema's types.
+    """
+    mapping = getattr(row, "_mapping", row)
+    return {
+        name: _plain(mapping[name] if name in mapping else field.default)
+        for name, field in schema.__fields__.items()
+    }
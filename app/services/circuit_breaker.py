@@ -0,0 +1,99 @@
+import time
+
+
+class CircuitOpenError(ValueError):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    Closed: calls go through; `failure_threshold` consecutive failures or slow
+    calls open the circuit. Open: calls are rejected until `reset_timeout`
+    seconds have passed. Half-open: a single probe call is let through; its
+    outcome closes the circuit again or re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, slow_call_seconds: float = 2.0, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_timeout = reset_timeout
+
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+        self.trips = 0
+        self.calls = 0
+        self.failures = 0
+        self.slow_calls = 0
+        self.rejected = 0
+
+    def retry_after(self) -> int:
+        """Seconds until the next half-open probe is allowed."""
+        if self.state != self.OPEN:
+            return 0
+        return max(1, int(self.opened_at + self.reset_timeout - time.monotonic()) + 1)
+
+    def before_call(self):
+        """Raise CircuitOpenError if the call must not reach the dependency."""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                self.rejected += 1
+                raise CircuitOpenError(f"{self.name} is unavailable (circuit half-open, probe in flight)")
+            self._probe_in_flight = True
+
+        self.calls += 1
+
+    def record_success(self, duration: float):
+        if duration > self.slow_call_seconds:
+            self.slow_calls += 1
+            self._record_failure()
+            return
+        self._probe_in_flight = False
+        self.consecutive_failures = 0
+        self.state = self.CLOSED
+
+    def release_probe(self):
+        """The call ended without an outcome (e.g. it was cancelled); let another call probe."""
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._record_failure()
+
+    def _record_failure(self):
+        self._probe_in_flight = False
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.trips += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "trips": self.trips,
+            "calls": self.calls,
+            "failures": self.failures,
+            "slow_calls": self.slow_calls,
+            "rejected": self.rejected,
+            "retry_after": self.retry_after(),
+        }
@@ -1,19 +1,109 @@
-import re, httpx, asyncio
+import re, httpx, asyncio, logging, time
+from app import metrics
+from app.cache import TTLCache
+from app.config import settings
+from app.logs import summarize
+from app.tracing import span
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.services.codeforces_stub import CodeforcesStub, RecordingTransport
 
 
-BASE_URL = "https://codeforces.com/api/"
+logger = logging.getLogger(__name__)
+
+BASE_URL = settings.CODEFORCES_API_URL
+
+_transport = None
+if settings.CODEFORCES_STUB:
+    _transport = CodeforcesStub(
+        fixtures_dir=settings.CODEFORCES_STUB_FIXTURES_DIR,
+        rows=settings.CODEFORCES_STUB_ROWS,
+        latency_ms=settings.CODEFORCES_STUB_LATENCY_MS,
+        error_rate=settings.CODEFORCES_STUB_ERROR_RATE,
+        throttle_rate=settings.CODEFORCES_STUB_THROTTLE_RATE,
+        seed=settings.CODEFORCES_STUB_SEED,
+    ).transport()
+
+
+def set_transport(transport):
+    """Route Codeforces calls through the given httpx transport (None restores the network)."""
+    global _transport
+    _transport = transport
+
+
+def _client() -> httpx.AsyncClient:
+    if _transport is None and settings.CODEFORCES_RECORD_DIR:
+        return httpx.AsyncClient(transport=RecordingTransport(settings.CODEFORCES_RECORD_DIR))
+    return httpx.AsyncClient(transport=_transport)
+
+breaker = CircuitBreaker(
+    "Codeforces",
+    failure_threshold=settings.CODEFORCES_BREAKER_FAILURES,
+    slow_call_seconds=settings.CODEFORCES_BREAKER_SLOW_SECONDS,
+    reset_timeout=settings.CODEFORCES_BREAKER_RESET_SECONDS,
+)
+
+# Last good answers, served while the circuit is open
+_verified_handles = TTLCache(maxsize=10000, ttl=settings.CODEFORCES_FALLBACK_TTL_SECONDS)
+_standings_results = TTLCache(maxsize=256, ttl=settings.CODEFORCES_FALLBACK_TTL_SECONDS)
+
+
+async def _get(method: str, params: dict, timeout: float) -> httpx.Response:
+    """
+    GET a Codeforces API method through the circuit breaker. Network errors,
+    5xx responses (including throttling) and slow calls count as failures.
+    """
+    with span(f"codeforces.{method}") as current:
+        r = await _breaker_get(method, params, timeout)
+        if current is not None:
+            current.set(status_code=r.status_code)
+        return r
+
+
+async def _breaker_get(method: str, params: dict, timeout: float) -> httpx.Response:
+    try:
+        breaker.before_call()
+    except CircuitOpenError:
+        metrics.codeforces_errors.inc(method, "circuit_open")
+        raise
+    start = time.monotonic()
+    try:
+        async with _client() as client:
+            r = await client.get(f"{BASE_URL}{method}", params=params, timeout=timeout)
+    except Exception as e:
+        metrics.codeforces_request_seconds.observe(method, value=time.monotonic() - start)
+        metrics.codeforces_errors.inc(method, type(e).__name__)
+        breaker.record_failure()
+        raise
+    except BaseException:
+        # Cancelled (client gone, timeout, shutdown): says nothing about Codeforces
+        breaker.release_probe()
+        raise
+    elapsed = time.monotonic() - start
+    metrics.codeforces_request_seconds.observe(method, value=elapsed)
+    if r.status_code >= 400:
+        metrics.codeforces_errors.inc(method, f"http_{r.status_code}")
+    if r.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success(elapsed)
+    return r
+
 
 async def verify_handle(handle: str) -> bool:
     """Check if a codeforces handle exists."""
-    print("validating user", handle)
+    logger.debug("Validating handle %s", handle)
     try:
-        async with httpx.AsyncClient() as client:
-            r = await client.get(f"{BASE_URL}user.info", params={"handles": handle}, timeout=5)
-            print("response json:", r.json())
-            data = r.json()
-            if data.get("status") != "OK":
-                raise ValueError(f"Codeforces API error: {data.get('comment', 'Unknown error')}")
+        r = await _get("user.info", {"handles": handle}, timeout=settings.CODEFORCES_USER_TIMEOUT)
+        data = r.json()
+        logger.debug("user.info for %s: status=%s", handle, data.get("status"))
+        if data.get("status") != "OK":
+            raise ValueError(f"Codeforces API error: {data.get('comment', 'Unknown error')}")
+        _verified_handles.set(handle, True)
+        return True
+    except CircuitOpenError:
+        if handle in _verified_handles:
             return True
+        raise
     except httpx.RequestError as e:
         raise ValueError(f"Network error verifying handle: {e}")
     except Exception as e:
@@ -30,12 +120,10 @@ def extract_contest_id(contest_link: str) -> str:
     raise ValueError("Invalid Codeforces contest link")
 
 
-async def get_codeforces_standings_handles(contest_link: str, as_manager: bool = False, from_row: int = 1, count: int = 0, show_unofficial: bool = True) -> dict:
+async def fetch_codeforces_standings(contest_link: str, as_manager: bool = False, from_row: int = 1, count: int = 0, show_unofficial: bool = True) -> dict:
     """
-    Fetches contest standings from Codeforces API and returns a dictionary
-    mapping user handles to their rank.
+    Fetches the raw contest.standings result for a contest link.
     """
-    print("getting codeforces standings", contest_link)
     contest_id = extract_contest_id(contest_link)
     params = {
         "contestId": contest_id,
@@ -46,26 +134,62 @@ async def get_codeforces_standings_handles(contest_link: str, as_manager: bool =
     if count > 0:
         params["count"] = count
 
+    cache_key = tuple(sorted(params.items()))
     try:
-        async with httpx.AsyncClient() as client:
-            r = await client.get(f"{BASE_URL}contest.standings", params=params, timeout=10)
-            r.raise_for_status()  # Raise an exception for bad status codes
-            data = r.json()
+        r = await _get("contest.standings", params, timeout=settings.CODEFORCES_STANDINGS_TIMEOUT)
+        r.raise_for_status()  # Raise an exception for bad status codes
+        data = r.json()
+    except CircuitOpenError:
+        cached = _standings_results.get(cache_key)
+        if cached is not None:
+            return cached
+        raise
+    except httpx.RequestError as e:
+        raise ValueError(f"Network error fetching standings: {e}")
 
-        print("response json:", data)
-        if data.get("status") != "OK":
-            raise ValueError(f"Codeforces API error fetching standings: {data.get('comment', 'Unknown error')}")
+    if data.get("status") != "OK":
+        raise ValueError(f"Codeforces API error fetching standings: {data.get('comment', 'Unknown error')}")
+    _standings_results.set(cache_key, data["result"])
+    return data["result"]
+
+
+async def get_codeforces_standings_handles(contest_link: str, as_manager: bool = False, from_row: int = 1, count: int = 0, show_unofficial: bool = True) -> dict:
+    """
+    Fetches contest standings from Codeforces API and returns a dictionary
+    mapping user handles to their rank.
+    """
+    logger.debug("Fetching standings for %s", contest_link)
+    result = await fetch_codeforces_standings(contest_link, as_manager, from_row, count, show_unofficial)
+    logger.debug("Standings for %s: %s", contest_link, summarize(result))
 
+    try:
         standings = {}
-        for row in data["result"]["rows"]:
+        for row in result["rows"]:
             handle = row["party"]["members"][0]["handle"]
             rank = row["rank"]
             standings[handle] = rank
 
-        
         return standings
+    except (KeyError, IndexError) as e:
+        raise ValueError(f"Error parsing standings data from Codeforces API: {e}")
 
-    except httpx.RequestError as e:
-        raise ValueError(f"Network error fetching standings: {e}")
+
+async def get_codeforces_standings_rows(contest_link: str) -> list:
+    """
+    Fetches the final standings of a contest in the same shape the extension
+    scrapes and posts as ranking_data: [{"handle", "rank", "score", "penalty"}].
+    """
+    result = await fetch_codeforces_standings(contest_link, show_unofficial=False)
+
+    try:
+        rows = []
+        for row in result["rows"]:
+            rows.append({
+                "handle": row["party"]["members"][0]["handle"],
+                "rank": row["rank"],
+                "score": row.get("points", 0),
+                "penalty": row.get("penalty", 0),
+            })
+        return rows
     except (KeyError, IndexError) as e:
-        raise ValueError(f"Error parsing standings data from Codeforces API: {e}")
\ No newline at end of file
+        raise ValueError(f"Error parsing standings data from Codeforces API: {e}")
@@ -0,0 +1,176 @@
+"""
+Local stand-in for the Codeforces API.
+
+Serves `user.info` and `contest.standings` through an httpx transport, so the
+services in app/services/codeforces.py can run without network access.
+Responses come from recorded fixtures when available and from a deterministic
+synthetic generator otherwise. Latency, errors and throttling can be injected.
+
+Fixture layout (the same one RecordingTransport writes):
+    <dir>/user.info/<handle>.json
+    <dir>/contest.standings/<contestId>.json
+"""
+import asyncio, json, os, random, re
+import httpx
+
+MIN_ROWS = 10
+MAX_ROWS = 100_000
+SYNTHETIC_HANDLE_PREFIX = "cf_user_"
+
+_UNSAFE_FILENAME_RE = re.compile(r'[^A-Za-z0-9_.-]')
+
+
+def _fixture_path(fixtures_dir: str, method: str, key: str) -> str:
+    return os.path.join(fixtures_dir, method, f"{_UNSAFE_FILENAME_RE.sub('_', key)}.json")
+
+
+def synthetic_handle(index: int) -> str:
+    return f"{SYNTHETIC_HANDLE_PREFIX}{index}"
+
+
+def synthetic_standings(contest_id: str, rows: int, seed: int = 0) -> dict:
+    """
+    Build a contest.standings result with `rows` contestants (clamped to 10..100k).
+    The same contest_id and seed always produce the same standings.
+    """
+    rows = max(MIN_ROWS, min(MAX_ROWS, rows))
+    rng = random.Random(f"{seed}:{contest_id}")
+    problem_count = 6
+
+    contestants = []
+    for i in range(rows):
+        points = float(rng.randint(0, problem_count))
+        penalty = rng.randint(0, 300) * int(points)
+        contestants.append((points, penalty, synthetic_handle(i)))
+    contestants.sort(key=lambda c: (-c[0], c[1]))
+
+    result_rows = []
+    prev_key = None
+    rank = 0
+    for idx, (points, penalty, handle) in enumerate(contestants):
+        if (points, penalty) != prev_key:
+            rank = idx + 1
+            prev_key = (points, penalty)
+        result_rows.append({
+            "party": {
+                "contestId": int(contest_id) if contest_id.isdigit() else contest_id,
+                "members": [{"handle": handle}],
+                "participantType": "CONTESTANT",
+            },
+            "rank": rank,
+            "points": points,
+            "penalty": penalty,
+            "problemResults": [],
+        })
+
+    return {
+        "contest": {"id": contest_id, "name": f"Synthetic contest {contest_id}", "phase": "FINISHED"},
+        "problems": [{"index": chr(ord("A") + i)} for i in range(problem_count)],
+        "rows": result_rows,
+    }
+
+
+class CodeforcesStub:
+    def __init__(self, fixtures_dir: str = "", rows: int = 100, latency_ms: float = 0,
+                 error_rate: float = 0, throttle_rate: float = 0, seed: int = 0):
+        self.fixtures_dir = fixtures_dir
+        self.rows = rows
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._standings_cache = {}
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    def _load_fixture(self, method: str, key: str):
+        if not self.fixtures_dir:
+            return None
+        path = _fixture_path(self.fixtures_dir, method, key)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+
+        if self.throttle_rate and self._rng.random() < self.throttle_rate:
+            return httpx.Response(503, json={"status": "FAILED", "comment": "Call limit exceeded"})
+        if self.error_rate and self._rng.random() < self.error_rate:
+            return httpx.Response(500, text="Injected Codeforces error")
+
+        method = request.url.path.rstrip("/").rsplit("/", 1)[-1]
+        params = request.url.params
+        if method == "user.info":
+            return self._user_info(params.get("handles", ""))
+        if method == "contest.standings":
+            return self._contest_standings(params)
+        return httpx.Response(400, json={"status": "FAILED", "comment": f"Method {method} is not supported by the stub"})
+
+    def _user_info(self, handles: str) -> httpx.Response:
+        handle_list = [h for h in handles.split(";") if h]
+        if not handle_list:
+            return httpx.Response(400, json={"status": "FAILED", "comment": "handles: Field should not be empty"})
+
+        if len(handle_list) == 1:
+            recorded = self._load_fixture("user.info", handle_list[0])
+            if recorded is not None:
+                return httpx.Response(200, json=recorded)
+
+        users = [{"handle": h, "rating": 1400, "rank": "specialist"} for h in handle_list]
+        return httpx.Response(200, json={"status": "OK", "result": users})
+
+    def _contest_standings(self, params) -> httpx.Response:
+        contest_id = params.get("contestId")
+        if not contest_id:
+            return httpx.Response(400, json={"status": "FAILED", "comment": "contestId: Field should not be empty"})
+
+        data = self._load_fixture("contest.standings", contest_id)
+        if data is None:
+            result = self._standings_cache.get(contest_id)
+            if result is None:
+                result = synthetic_standings(contest_id, self.rows, self.seed)
+                self._standings_cache[contest_id] = result
+            data = {"status": "OK", "result": result}
+
+        # Apply from/count paging the same way the real API does
+        from_row = int(params.get("from", 1))
+        count = int(params.get("count", 0))
+        rows = data["result"]["rows"][from_row - 1:]
+        if count > 0:
+            rows = rows[:count]
+        return httpx.Response(200, json={"status": data["status"], "result": {**data["result"], "rows": rows}})
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """
+    Forwards requests to the real API and writes successful responses in the
+    fixture layout CodeforcesStub reads.
+    """
+
+    def __init__(self, record_dir: str, transport: httpx.AsyncBaseTransport = None):
+        self.record_dir = record_dir
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await self.transport.handle_async_request(request)
+        method = request.url.path.rstrip("/").rsplit("/", 1)[-1]
+        key = request.url.params.get("handles") if method == "user.info" else request.url.params.get("contestId")
+        partial = request.url.params.get("from", "1") != "1" or "count" in request.url.params
+        if response.status_code != 200 or not key or partial:
+            return response
+
+        body = await response.aread()
+        path = _fixture_path(self.record_dir, method, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(body)
+        # The body is already decoded, so don't pass the encoding headers on
+        return httpx.Response(response.status_code, headers={"content-type": response.headers.get("content-type", "application/json")}, content=body)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
@@ -0,0 +1,239 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Contest, Division, UserStatus
+from app.cache import as_of_leaderboard_cache
+from app.config import settings
+from app.crud.ratings import get_leaderboard, get_rating_snapshot, get_leaderboard_users
+from app.serialization import dumps
+from bisect import bisect_left, bisect_right, insort
+from typing import Optional
+import asyncio, time
+
+ALL_DIVISIONS = "all"
+
+
+def _board_key(division) -> str:
+    if division is None:
+        return ALL_DIVISIONS
+    return Division(division).value
+
+
+class DivisionBoard:
+    """
+    Leaderboard for one division (or all divisions) at one version.
+
+    Users are kept as a sorted array of (-rating, user_id) keys plus a sorted
+    array of the distinct ratings, so position, dense rank and percentile are
+    binary searches and a rating change is one remove + one insert instead of
+    a rebuild and re-sort.
+    """
+
+    def __init__(self, key: str, version: int, rows):
+        self.key = key
+        self.version = version
+        self.built_at = time.monotonic()
+        self.keys = []
+        self.users = {}
+        self._neg_ratings = []
+        self._rating_counts = {}
+        self._json = None
+
+        for user_id, name, handle, division, rating in rows:
+            self.users[user_id] = (name, handle, getattr(division, "value", division), rating)
+            self.keys.append((-rating, user_id))
+            self._count_rating(rating, 1)
+        self.keys.sort()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _count_rating(self, rating: int, delta: int):
+        count = self._rating_counts.get(rating, 0) + delta
+        if count > 0:
+            if rating not in self._rating_counts:
+                insort(self._neg_ratings, -rating)
+            self._rating_counts[rating] = count
+        else:
+            self._rating_counts.pop(rating, None)
+            idx = bisect_left(self._neg_ratings, -rating)
+            if idx < len(self._neg_ratings) and self._neg_ratings[idx] == -rating:
+                self._neg_ratings.pop(idx)
+
+    def dense_rank(self, rating: int) -> int:
+        return bisect_left(self._neg_ratings, -rating) + 1
+
+    def entry(self, position: int) -> dict:
+        neg_rating, user_id = self.keys[position]
+        name, handle, division, rating = self.users[user_id]
+        return {
+            "rank": self.dense_rank(rating),
+            "user_id": str(user_id),
+            "name": name,
+            "codeforces_handle": handle,
+            "division": division,
+            "current_rating": rating,
+        }
+
+    def entries(self, start: int = 0, end: Optional[int] = None) -> list:
+        end = len(self.keys) if end is None else min(end, len(self.keys))
+        return [self.entry(i) for i in range(max(start, 0), end)]
+
+    def page(self, after: Optional[tuple] = None, limit: Optional[int] = None):
+        """
+        Keyset page: entries strictly after the (rating, user_id) cursor.
+        Returns (entries, next_cursor); next_cursor is None on the last page.
+        """
+        start = 0 if after is None else bisect_right(self.keys, (-after[0], after[1]))
+        end = len(self.keys) if limit is None else min(len(self.keys), start + limit)
+        entries = self.entries(start, end)
+        next_cursor = None
+        if end < len(self.keys) and entries:
+            neg_rating, user_id = self.keys[end - 1]
+            next_cursor = (-neg_rating, user_id)
+        return entries, next_cursor
+
+    def position(self, user_id: int) -> Optional[int]:
+        user = self.users.get(user_id)
+        if user is None:
+            return None
+        return bisect_left(self.keys, (-user[3], user_id))
+
+    def neighbourhood(self, user_id: int, k: int) -> Optional[dict]:
+        """
+        The user's rank, percentile and up to k entries above and below them.
+        Percentile is the share of the board with a strictly lower rating.
+        """
+        position = self.position(user_id)
+        if position is None:
+            return None
+        rating = self.users[user_id][3]
+        total = len(self.keys)
+        at_or_above = bisect_right(self.keys, (-rating, float("inf")))
+        return {
+            "entry": self.entry(position),
+            "position": position + 1,
+            "total": total,
+            "percentile": round(100 * (total - at_or_above) / total, 2),
+            "above": self.entries(position - k, position),
+            "below": self.entries(position + 1, position + 1 + k),
+        }
+
+    def upsert(self, user_id: int, name: str, handle: str, division: str, rating: int):
+        self.remove(user_id)
+        self.users[user_id] = (name, handle, division, rating)
+        insort(self.keys, (-rating, user_id))
+        self._count_rating(rating, 1)
+        self._json = None
+
+    def remove(self, user_id: int):
+        position = self.position(user_id)
+        if position is None:
+            return
+        rating = self.users.pop(user_id)[3]
+        self.keys.pop(position)
+        self._count_rating(rating, -1)
+        self._json = None
+
+    def json(self) -> bytes:
+        if self._json is None:
+            self._json = dumps(self.entries())
+        return self._json
+
+
+class LeaderboardStore:
+    """
+    In-process materialized leaderboards, one per division plus the combined one.
+
+    Writes to a user call update_user() after committing: boards that are
+    loaded and current are patched in place under a new version. invalidate()
+    forces a rebuild from the DB on the next read instead. Writes handled by
+    other workers are never patched in, so a board older than `ttl` seconds
+    is rebuilt under a new version as well (never with ttl=0).
+    """
+
+    def __init__(self, ttl: float = 0):
+        self.ttl = ttl
+        self._boards = {}
+        self._versions = {}
+        self._locks = {}
+
+    def version(self, division=None) -> int:
+        return self._current_version(_board_key(division))
+
+    def _current_version(self, key: str) -> int:
+        """The board's version, bumped here once the loaded board has expired."""
+        version = self._versions.get(key, 0)
+        board = self._boards.get(key)
+        if self.ttl and board is not None and board.version == version and time.monotonic() - board.built_at >= self.ttl:
+            version = self._bump(key)
+        return version
+
+    def _bump(self, key: str) -> int:
+        version = self._versions.get(key, 0) + 1
+        self._versions[key] = version
+        return version
+
+    def invalidate(self, *divisions):
+        """Bump the version of the given divisions (all boards if none given)."""
+        keys = {_board_key(d) for d in divisions if d is not None} or {d.value for d in Division}
+        keys.add(ALL_DIVISIONS)
+        for key in keys:
+            self._bump(key)
+
+    def update_user(self, user, old_division=None):
+        """
+        Apply a committed change of one user's rating, status, name or division.
+        """
+        division = _board_key(user.division)
+        keys = {division, ALL_DIVISIONS}
+        if old_division is not None:
+            keys.add(_board_key(old_division))
+
+        for key in keys:
+            board = self._boards.get(key)
+            current = board is not None and board.version == self._versions.get(key, 0)
+            version = self._bump(key)
+            if not current:
+                continue
+            if user.status == UserStatus.Active and key in (division, ALL_DIVISIONS):
+                board.upsert(user.id, user.name, user.codeforces_handle, division, user.rating)
+            else:
+                board.remove(user.id)
+            board.version = version
+
+    async def get(self, db: AsyncSession, division=None) -> DivisionBoard:
+        key = _board_key(division)
+        board = self._boards.get(key)
+        if board is not None and board.version == self._current_version(key):
+            return board
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            version = self._versions.get(key, 0)
+            board = self._boards.get(key)
+            if board is None or board.version != version:
+                rows = await get_leaderboard(db, None if key == ALL_DIVISIONS else Division(key))
+                board = DivisionBoard(key, version, rows)
+                self._boards[key] = board
+        return board
+
+
+async def leaderboard_as_of(db: AsyncSession, contest: Contest) -> list:
+    """
+    Leaderboard of the contest's division as it stood right after the contest,
+    built from its rating snapshot in time proportional to the division size.
+    Cached until the contest is re-rated or replayed.
+    """
+    entries = as_of_leaderboard_cache.get(contest.id)
+    if entries is not None:
+        return entries
+
+    ratings = dict(await get_rating_snapshot(db, contest))
+    users = await get_leaderboard_users(db, list(ratings))
+    division = _board_key(contest.division)
+    rows = [(user_id, name, handle, division, ratings[user_id]) for user_id, name, handle in users]
+    entries = DivisionBoard(division, 0, rows).entries()
+    as_of_leaderboard_cache.set(contest.id, entries)
+    return entries
+
+
+leaderboard_store = LeaderboardStore(ttl=settings.WORKER_STATE_TTL_SECONDS)
@@ -2,7 +2,12 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.models import  Division, UserStatus
 from app.crud.users import get_users_by_division
 from app.schemas import attendance_schemas
-import math
+from app import metrics
+from app.tracing import traced
+from app.logs import summarize
+import logging, math
+
+logger = logging.getLogger(__name__)
 
 
 class Codeforces:
@@ -32,6 +37,8 @@ class Codeforces:
                     return record.status
         return attendance_schemas.AttendanceStatus.ABSENT
 
+    @traced()
+    @metrics.rating_stage_seconds.timed("build_participants")
     async def build_participant(self):
         # Asynchronously fetch users
         division_users = await get_users_by_division(db=self.db, division=self.div)
@@ -65,16 +72,24 @@ class Codeforces:
 
         return participants
 
+    @traced()
+    @metrics.rating_stage_seconds.timed("partition")
     async def partition_users(self):
         active_users = [u for u in self.participants if u['status'] == UserStatus.Active]
 
         self.PRESENT = [u for u in active_users if u['attendance_status'] == attendance_schemas.AttendanceStatus.PRESENT]
         self.ABSENT = [u for u in active_users if u['attendance_status'] == attendance_schemas.AttendanceStatus.ABSENT]
         self.EXCUSED = [u for u in active_users if u['attendance_status'] == attendance_schemas.AttendanceStatus.EXCUSED]
+        metrics.rating_participants.observe("all", value=len(self.participants))
+        metrics.rating_participants.observe("present", value=len(self.PRESENT))
+        metrics.rating_participants.observe("absent", value=len(self.ABSENT))
+        metrics.rating_participants.observe("excused", value=len(self.EXCUSED))
 
 
+    @traced()
+    @metrics.rating_stage_seconds.timed("codeforces_rating")
     async def apply_codeforces_rating(self):
-        print("[CF] Applying Codeforces rating update...", flush=True)
+        logger.debug("Applying Codeforces rating update to %d present users", len(self.PRESENT))
         # 3.1 Build contestant structures
         contestants = []
         for user in self.PRESENT:
@@ -89,7 +104,7 @@ class Codeforces:
                 'points': float(standing.get('score', 0)),
             }
             contestants.append(contestant)
-        print(f"[CF] Contestants before ranking: {contestants}", flush=True)
+        logger.debug("Contestants before ranking: %s", summarize(contestants))
 
         # 3.2 Assign ranks (with tie handling)
         contestants.sort(key=lambda x: -x['points'])
@@ -102,7 +117,7 @@ class Codeforces:
                 c['rank'] = idx + 1
                 prev_rank = c['rank']
                 prev_points = c['points']
-        print(f"[CF] Contestants after tie ranking: {contestants}", flush=True)
+        logger.debug("Contestants after tie ranking: %s", summarize(contestants))
 
         # 3.3 Compute expected seed for each contestant
         def get_seed(contestants, rating):
@@ -113,7 +128,7 @@ class Codeforces:
 
         for a in contestants:
             a['seed'] = get_seed([b for b in contestants if b['user_id'] != a['user_id']], a['rating'])
-        print(f"[CF] Contestants with seeds: {contestants}", flush=True)
+        logger.debug("Contestants with seeds: %s", summarize(contestants))
 
         # 3.4 Compute mid-rank and target rating
         def binary_search_rating(contestants, midRank, eps=1e-5):
@@ -130,12 +145,12 @@ class Codeforces:
         for a in contestants:
             a['midRank'] = math.sqrt(a['rank'] * a['seed'])
             a['needRating'] = binary_search_rating([b for b in contestants if b['user_id'] != a['user_id']], a['midRank'])
-        print(f"[CF] Contestants with needRating: {contestants}", flush=True)
+        logger.debug("Contestants with needRating: %s", summarize(contestants))
 
         # 3.5 Compute raw delta
         for a in contestants:
             a['delta'] = (a['needRating'] - a['rating']) / 2
-        print(f"[CF] Contestants with raw delta: {contestants}", flush=True)
+        logger.debug("Contestants with raw delta: %s", summarize(contestants))
 
         # 3.6 Normalize deltas
         n = len(contestants)
@@ -143,7 +158,7 @@ class Codeforces:
         inc1 = -sum_d / n - 1 if n > 0 else 0
         for a in contestants:
             a['delta'] += inc1
-        print(f"[CF] Contestants after inc1 normalization: {contestants}", flush=True)
+        logger.debug("Normalization inc1=%.3f over %d contestants", inc1, n)
 
         # top group adjustment
         k = min(int(4 * math.sqrt(n)), n)
@@ -152,28 +167,30 @@ class Codeforces:
         inc2 = max(min(-sum_top / k, 0), -10) if k > 0 else 0
         for a in contestants:
             a['delta'] += inc2
-        print(f"[CF] Contestants after inc2 (top group) normalization: {contestants}", flush=True)
+        logger.debug("Top-group normalization inc2=%.3f over top %d", inc2, k)
 
-        # 3.7 Validate invariants (optional, print warnings)
+        # 3.7 Validate invariants (optional, log warnings)
         for i in range(n):
             for j in range(n):
                 if i == j:
                     continue
                 if contestants[i]['rating'] > contestants[j]['rating']:
                     if contestants[i]['rating'] + contestants[i]['delta'] < contestants[j]['rating'] + contestants[j]['delta']:
-                        print(f"[CF][WARN] Invariant violated: {contestants[i]['user_id']} > {contestants[j]['user_id']} but new_rating <", flush=True)
+                        logger.warning("Invariant violated: %s > %s but new_rating <", contestants[i]['user_id'], contestants[j]['user_id'])
                 if contestants[i]['rating'] < contestants[j]['rating']:
                     if contestants[i]['delta'] < contestants[j]['delta']:
-                        print(f"[CF][WARN] Invariant violated: {contestants[i]['user_id']} < {contestants[j]['user_id']} but delta <", flush=True)
+                        logger.warning("Invariant violated: %s < %s but delta <", contestants[i]['user_id'], contestants[j]['user_id'])
 
-        print(f"[CF] Final contestants with deltas: {contestants}", flush=True)
+        logger.debug("Final contestants with deltas: %s", summarize(contestants))
+        metrics.rating_participants.observe("ranked", value=n)
         return contestants
 
+    @traced()
     async def aggregate_rating(self, penality):
-        print("in aggregate rating")
-        print("absent", self.ABSENT)
-        print("excused", self.EXCUSED)
-        print("present", self.PRESENT)
+        logger.debug(
+            "Aggregating ratings: %d present, %d absent, %d excused",
+            len(self.PRESENT), len(self.ABSENT), len(self.EXCUSED),
+        )
         for user in self.ABSENT:
             self.rating_updates[user['user_id']] = -penality
         for user in self.EXCUSED:
@@ -182,9 +199,11 @@ class Codeforces:
         for update in present_updates:
             self.rating_updates[update['user_id']] = int(round(update['delta']))
 
-        print("rating updates", self.rating_updates)
+        logger.info("Computed %d rating updates", len(self.rating_updates))
         return self.rating_updates
 
+    @traced()
+    @metrics.rating_stage_seconds.timed("total")
     async def calculate_final_ratings(self, penality):
         # Asynchronously build the participants list first
         self.participants = await self.build_participant()
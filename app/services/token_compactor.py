@@ -0,0 +1,26 @@
+import asyncio
+from app.cache import revoked_refresh_tokens
+from app.config import settings
+from app.crud.refresh_tokens import purge_refresh_tokens
+from app.db import SessionLocal
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def compact_refresh_tokens_forever(interval: float = None, batch_size: int = None):
+    """
+    Background task: periodically purge expired/revoked refresh tokens and
+    drop expired entries from the in-memory revocation filter.
+    """
+    interval = interval or settings.REFRESH_TOKEN_PURGE_INTERVAL_SECONDS
+    batch_size = batch_size or settings.REFRESH_TOKEN_PURGE_BATCH_SIZE
+    while True:
+        try:
+            async with SessionLocal() as db:
+                purged = await purge_refresh_tokens(db, batch_size=batch_size)
+            revoked_refresh_tokens.prune()
+            logger.info("Purged %d refresh tokens", purged)
+        except Exception:
+            logger.exception("Refresh token purge failed")
+        await asyncio.sleep(interval)
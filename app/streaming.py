@@ -0,0 +1,53 @@
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+import csv, io
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+CSV_MEDIA_TYPE = "text/csv; charset=utf-8"
+DEFAULT_CHUNK_SIZE = 500
+
+
+async def stream_row_chunks(db: AsyncSession, stmt, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Yield lists of Core rows read through a server-side cursor, chunk_size at a time.
+    """
+    result = await db.stream(stmt.execution_options(yield_per=chunk_size))
+    async for partition in result.partitions():
+        yield partition
+
+
+def _attachment(filename: Optional[str]) -> dict:
+    return {"Content-Disposition": f'attachment; filename="{filename}"'} if filename else {}
+
+
+def ndjson_response(chunks, serialize, filename: Optional[str] = None) -> StreamingResponse:
+    """
+    Stream one JSON document per line; serialize(item) must return the encoded
+    document as bytes. Only one chunk is held in memory at a time.
+    """
+    async def body():
+        async for chunk in chunks:
+            yield b"".join(serialize(item) + b"\n" for item in chunk)
+
+    return StreamingResponse(body(), media_type=NDJSON_MEDIA_TYPE, headers=_attachment(filename))
+
+
+def csv_response(chunks, columns: List[str], to_dict, filename: Optional[str] = None) -> StreamingResponse:
+    """
+    Stream a CSV with a header row; to_dict(item) maps each item to a dict
+    keyed by `columns`. Only one chunk is held in memory at a time.
+    """
+    async def body():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        async for chunk in chunks:
+            writer.writerows(to_dict(item) for item in chunk)
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+
+    return StreamingResponse(body(), media_type=CSV_MEDIA_TYPE, headers=_attachment(filename))
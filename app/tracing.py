@@ -0,0 +1,254 @@
+"""
+Lightweight in-process tracing.
+
+span() opens a timed span as a child of the current one, found through a
+ContextVar, so nesting follows the call stack and asyncio tasks without
+passing anything around. TracingMiddleware opens the root span of each
+HTTP request. When a root span ends, its trace goes into a ring buffer
+served by the admin endpoints and, with TRACE_EXPORT_FILE set, is written
+as one JSON line by a background thread.
+"""
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from logging.handlers import QueueListener
+from typing import Optional
+from app.config import settings
+from app.logs import EnqueueHandler
+from app.metrics import route_template
+import datetime, json, logging, os, queue, time
+
+TRACE_ID_HEADER = "X-Trace-Id"
+
+
+class Span:
+    __slots__ = ("trace", "trace_id", "span_id", "parent_id", "name", "attributes", "started", "ended", "error")
+
+    def __init__(self, trace: "_Trace", trace_id: str, parent_id: Optional[str], name: str, attributes: dict):
+        # The trace this span is recorded in; children find it through their parent
+        self.trace = trace
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.started = time.perf_counter()
+        self.ended = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+class _Trace:
+    __slots__ = ("root", "spans", "dropped", "started_at")
+
+    def __init__(self):
+        self.root = None
+        self.spans = []
+        self.dropped = 0
+        self.started_at = datetime.datetime.now(datetime.timezone.utc)
+
+
+_current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+_finished = deque(maxlen=settings.TRACE_BUFFER_SIZE)
+_file_logger = None
+
+
+def current_trace_id() -> Optional[str]:
+    current = _current.get()
+    return current.trace_id if current is not None else None
+
+
+def parse_traceparent(header: Optional[str]):
+    """(trace_id, parent span id) from a W3C traceparent header, or (None, None)."""
+    parts = (header or "").split("-")
+    if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+        return parts[1], parts[2]
+    return None, None
+
+
+@contextmanager
+def span(name: str, trace_id: str = None, parent_id: str = None, **attributes):
+    """
+    Time the block as a span. Without an open parent a new trace starts; a
+    parent whose trace already finished (e.g. a background task spawned by a
+    request) starts a new trace that records the old one as `follows_from`.
+    Traces are found through the parent span, never by trace id, so requests
+    sharing a traceparent each record their own trace.
+    """
+    if not settings.TRACING_ENABLED:
+        yield None
+        return
+
+    parent = _current.get()
+    # A trace is open until its root span ends
+    trace = parent.trace if parent is not None and parent.trace.root.ended is None else None
+    if trace is None:
+        if parent is not None:
+            attributes["follows_from"] = parent.trace_id
+        trace = _Trace()
+        current = Span(trace, trace_id or os.urandom(16).hex(), parent_id, name, attributes)
+        trace.root = current
+    else:
+        current = Span(trace, parent.trace_id, parent.span_id, name, attributes)
+
+    if len(trace.spans) < settings.TRACE_MAX_SPANS:
+        trace.spans.append(current)
+    else:
+        trace.dropped += 1
+
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = repr(e)
+        raise
+    finally:
+        current.ended = time.perf_counter()
+        _current.reset(token)
+        if trace.root is current:
+            _finish(trace)
+
+
+def traced(name: str = None):
+    """Decorator running every call of a coroutine function in a span."""
+    def decorate(fn):
+        span_name = name or f"{fn.__module__.split('.', 1)[-1]}.{fn.__qualname__}"
+
+        @wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with span(span_name):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+def _finish(trace: _Trace):
+    root = trace.root
+    exported = {
+        "trace_id": root.trace_id,
+        "name": root.name,
+        "started_at": trace.started_at.isoformat(),
+        "duration_ms": _ms(root.ended - root.started),
+        "error": root.error,
+        "dropped_spans": trace.dropped,
+        "spans": [
+            {
+                "span_id": s.span_id,
+                "parent_id": s.parent_id,
+                "name": s.name,
+                "offset_ms": _ms(s.started - root.started),
+                # Spans still open when the root ended (detached tasks) have no duration
+                "duration_ms": _ms(s.ended - s.started) if s.ended is not None else None,
+                "attributes": s.attributes,
+                "error": s.error,
+            }
+            for s in trace.spans
+        ],
+    }
+    _finished.append(exported)
+    if _file_logger is not None:
+        # Serialized by the export thread (_JSONLineFormatter)
+        _file_logger.info(exported)
+
+
+def recent(min_ms: float = 0, limit: int = 50, name: Optional[str] = None) -> list:
+    """Summaries of finished traces, newest first, that took at least min_ms."""
+    summaries = []
+    for trace in reversed(_finished):
+        if trace["duration_ms"] < min_ms or (name and name not in trace["name"]):
+            continue
+        summaries.append({**{k: v for k, v in trace.items() if k != "spans"}, "span_count": len(trace["spans"])})
+        if len(summaries) >= limit:
+            break
+    return summaries
+
+
+def get(trace_id: str) -> Optional[dict]:
+    return next((trace for trace in reversed(_finished) if trace["trace_id"] == trace_id), None)
+
+
+def waterfall(trace: dict, width: int = 60) -> str:
+    """Plain-text waterfall: one line per span, indented by depth, with a timeline bar."""
+    total = trace["duration_ms"] or 1
+    depth = {None: -1}
+    lines = [f"{trace['name']}  {trace['duration_ms']:.1f} ms  trace {trace['trace_id']}"]
+    for s in trace["spans"]:
+        depth[s["span_id"]] = depth.get(s["parent_id"], -1) + 1
+        duration = s["duration_ms"] if s["duration_ms"] is not None else total - s["offset_ms"]
+        start = int(s["offset_ms"] / total * width)
+        length = max(1, int(duration / total * width))
+        bar = " " * start + "#" * min(length, width - start)
+        label = "  " * depth[s["span_id"]] + s["name"] + (" !" if s["error"] else "")
+        lines.append(f"{label[:50]:<50} {s['offset_ms']:>9.1f} {duration:>9.1f} |{bar:<{width}}|")
+    if trace["dropped_spans"]:
+        lines.append(f"... {trace['dropped_spans']} more spans dropped (TRACE_MAX_SPANS)")
+    return "\n".join(lines) + "\n"
+
+
+class TraceIdFilter(logging.Filter):
+    """Adds the current trace id to log records, so logs can be matched to traces."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace_id = current_trace_id()
+        if trace_id is not None:
+            record.trace_id = trace_id
+        return True
+
+
+class _JSONLineFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.msg, default=str)
+
+
+def configure_tracing(config=settings):
+    """
+    Tag log records with the trace id and, with TRACE_EXPORT_FILE set, write
+    finished traces there as JSON lines from a background thread. Call after
+    configure_logging().
+    """
+    global _file_logger
+    if not config.TRACING_ENABLED or _file_logger is not None:
+        return
+    for handler in logging.getLogger().handlers:
+        handler.addFilter(TraceIdFilter())
+    if not config.TRACE_EXPORT_FILE:
+        return
+    log_queue = queue.SimpleQueue()
+    output = logging.FileHandler(config.TRACE_EXPORT_FILE)
+    output.setFormatter(_JSONLineFormatter())
+    QueueListener(log_queue, output).start()
+    _file_logger = logging.getLogger("app.tracing.export")
+    _file_logger.propagate = False
+    _file_logger.setLevel(logging.INFO)
+    _file_logger.addHandler(EnqueueHandler(log_queue))
+
+
+class TracingMiddleware:
+    """Opens the root span of every HTTP request and returns its trace id."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.TRACING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        trace_id, parent_id = parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        name = f"{scope['method']} {route_template(scope)}"
+        with span(name, trace_id=trace_id, parent_id=parent_id, path=scope["path"]) as root:
+            async def send_with_trace_id(message):
+                if message["type"] == "http.response.start":
+                    root.set(status_code=message["status"])
+                    message = {**message, "headers": [*message.get("headers", []), (b"x-trace-id", root.trace_id.encode())]}
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace_id)
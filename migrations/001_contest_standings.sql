@@ -0,0 +1,14 @@
+-- Server-side standings ingest: cached contest standings and snapshot rows
+-- that reference them by version instead of embedding the ranking data.
+
+CREATE TABLE IF NOT EXISTS contest_standings (
+    id INTEGER PRIMARY KEY,
+    contest_id VARCHAR NOT NULL REFERENCES contests (id),
+    codeforces_contest_id VARCHAR NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    rows JSON NOT NULL,
+    fetched_at TIMESTAMP
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ix_contest_standings_contest_id ON contest_standings (contest_id);
+
+ALTER TABLE contest_data_snapshots ADD COLUMN standings_version INTEGER;
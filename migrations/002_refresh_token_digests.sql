@@ -0,0 +1,17 @@
+-- Refresh tokens are stored as SHA-256 digests instead of the full JWT.
+-- Existing rows cannot be converted, so the table is recreated and every
+-- user has to log in again once.
+
+DROP TABLE IF EXISTS refresh_tokens;
+
+CREATE TABLE refresh_tokens (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users (id),
+    token_digest BLOB NOT NULL,
+    expires_at TIMESTAMP NOT NULL,
+    created_at TIMESTAMP,
+    is_revoked BOOLEAN
+);
+CREATE UNIQUE INDEX ix_refresh_tokens_token_digest ON refresh_tokens (token_digest);
+CREATE INDEX ix_refresh_tokens_expires_at ON refresh_tokens (expires_at);
+CREATE INDEX ix_refresh_tokens_id ON refresh_tokens (id);
@@ -0,0 +1,9 @@
+-- Per-contest division rating snapshots for the as-of-contest leaderboard.
+-- Contests rated before this migration are backfilled from rating_history on first read.
+
+CREATE TABLE IF NOT EXISTS contest_rating_snapshots (
+    contest_id VARCHAR PRIMARY KEY REFERENCES contests (id),
+    division VARCHAR(5) NOT NULL,
+    ratings JSON NOT NULL,
+    created_at TIMESTAMP
+);
@@ -0,0 +1,19 @@
+-- Indexes for the hot read and rollback paths.
+
+-- Profile history (user_id, ordered by timestamp) and rollback (contest_id)
+CREATE INDEX IF NOT EXISTS ix_rating_history_user_timestamp ON rating_history (user_id, timestamp);
+CREATE INDEX IF NOT EXISTS ix_rating_history_contest_id ON rating_history (contest_id);
+
+-- Attendance lookups per contest and user, and the /api/contests/my join
+CREATE INDEX IF NOT EXISTS ix_attendance_contest_user ON attendance (contest_id, user_id);
+CREATE INDEX IF NOT EXISTS ix_attendance_user_id ON attendance (user_id);
+
+-- Duplicate-link check on create, and per-division contest lists / replay
+CREATE INDEX IF NOT EXISTS ix_contests_link ON contests (link);
+CREATE INDEX IF NOT EXISTS ix_contests_division_date ON contests (division, date);
+
+-- Roster and leaderboard loads
+CREATE INDEX IF NOT EXISTS ix_users_division_status ON users (division, status);
+
+-- Refresh the planner statistics (SQLite and PostgreSQL)
+ANALYZE;
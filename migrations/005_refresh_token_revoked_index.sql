@@ -0,0 +1,7 @@
+-- Index for the refresh token purge.
+
+-- The purge's revoked-token pass; only revoked rows are indexed
+CREATE INDEX IF NOT EXISTS ix_refresh_tokens_revoked ON refresh_tokens (id) WHERE is_revoked = 1;
+
+-- Refresh the planner statistics (SQLite and PostgreSQL)
+ANALYZE;
@@ -0,0 +1,117 @@
+"""
+Compare request throughput of database engine profiles on SQLite.
+
+Each profile gets a fresh database seeded with users. Concurrent workers
+then run a request-like mix against it, each operation in its own session:
+point reads of a user and rating updates that commit.
+
+    python -m scripts.bench_db_profiles [--workers 32] [--seconds 10] [--write-ratio 0.2]
+
+Profiles:
+    legacy     create_async_engine(url, echo=True): the old app/db.py
+    no-echo    create_async_engine(url): default pool, no pragmas
+    tuned      app.db.make_engine(url): the configured profile (DB_*, SQLITE_*)
+"""
+import argparse, asyncio, contextlib, os, random, statistics, sys, tempfile, time
+
+_db_dir = tempfile.mkdtemp(prefix="db-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{os.path.join(_db_dir, 'app.db')}")
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.db import Base, make_engine
+
+PROFILES = {
+    "legacy": lambda url: create_async_engine(url, echo=True),
+    "no-echo": lambda url: create_async_engine(url),
+    "tuned": lambda url: make_engine(url),
+}
+
+
+async def seed(session_factory, user_count: int):
+    async with session_factory() as db:
+        await db.execute(insert(models.User), [
+            {
+                "id": i,
+                "name": f"User {i}",
+                "codeforces_handle": f"cf_user_{i}",
+                "email": f"user{i}@example.com",
+                "division": models.Division.Div1 if i % 2 else models.Division.Div2,
+                "status": models.UserStatus.Active,
+                "role": models.UserRole.Participant,
+                "rating": 1400,
+                "hashed_password": "x",
+            }
+            for i in range(1, user_count + 1)
+        ])
+        await db.commit()
+
+
+async def worker(session_factory, deadline: float, user_count: int, write_ratio: float, rng: random.Random, latencies: list, errors: list):
+    while time.perf_counter() < deadline:
+        user_id = rng.randint(1, user_count)
+        started = time.perf_counter()
+        try:
+            async with session_factory() as db:
+                if rng.random() < write_ratio:
+                    await db.execute(update(models.User).where(models.User.id == user_id).values(rating=models.User.rating + 1))
+                    await db.commit()
+                else:
+                    result = await db.execute(select(models.User).filter(models.User.id == user_id))
+                    result.scalars().first()
+        except Exception as e:
+            errors.append(type(e).__name__)
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+async def run_profile(name: str, args) -> dict:
+    url = f"sqlite+aiosqlite:///{os.path.join(_db_dir, f'{name}.db')}"
+    # echo=True logs every statement; send it to /dev/null so the cost is measured, not printed
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        engine = PROFILES[name](url)
+        session_factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await seed(session_factory, args.users)
+
+        latencies, errors = [], []
+        started = time.perf_counter()
+        deadline = started + args.seconds
+        await asyncio.gather(*[
+            worker(session_factory, deadline, args.users, args.write_ratio, random.Random(i), latencies, errors)
+            for i in range(args.workers)
+        ])
+        elapsed = time.perf_counter() - started
+        await engine.dispose()
+
+    latencies.sort()
+    return {
+        "profile": name,
+        "ops": len(latencies),
+        "ops_per_s": len(latencies) / elapsed,
+        "p50_ms": 1000 * statistics.median(latencies) if latencies else 0.0,
+        "p99_ms": 1000 * latencies[int(0.99 * (len(latencies) - 1))] if latencies else 0.0,
+        "errors": len(errors),
+    }
+
+
+async def main(args) -> int:
+    results = [await run_profile(name, args) for name in args.profiles]
+    print(f"{'profile':<10} {'ops':>8} {'ops/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for r in results:
+        print(f"{r['profile']:<10} {r['ops']:>8} {r['ops_per_s']:>10.1f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['errors']:>7}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", nargs="+", choices=list(PROFILES), default=list(PROFILES))
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    sys.exit(asyncio.run(main(parser.parse_args())))
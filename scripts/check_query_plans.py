@@ -0,0 +1,246 @@
+"""
+Check that the CRUD queries in app/crud/ are served by indexes.
+
+Seeds a throwaway SQLite database with a synthetic dataset, runs a set of
+CRUD functions against it and, for every SELECT/UPDATE/DELETE they issue,
+records SQLite's EXPLAIN QUERY PLAN. A plan step that scans a whole table
+fails the check unless the case explicitly allows it.
+
+    python -m scripts.check_query_plans [--users 20000] [--contests 300] [--per-contest 200]
+
+Exits with status 1 if any query scans a table it should not. The test
+suite runs the same check on a smaller dataset (tests/test_query_plans.py).
+"""
+import argparse, asyncio, contextvars, datetime, os, sys, tempfile
+
+_db_dir = tempfile.mkdtemp(prefix="query-plans-")
+DATABASE_URL = f"sqlite+aiosqlite:///{os.path.join(_db_dir, 'plans.db')}"
+os.environ.setdefault("DATABASE_URL", DATABASE_URL)
+
+from sqlalchemy import event, insert, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.db import Base
+from app.crud import attendance, contests, exports, ratings, refresh_tokens, standings, users
+from app.schemas.contest_schemas import ContestCreate
+from app.security import token_digest
+
+_case = contextvars.ContextVar("case", default=None)
+_plans = {}
+
+
+def _explain(conn, cursor, statement, parameters, context, executemany):
+    case = _case.get()
+    if case is None or executemany:
+        return
+    if not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "WITH")):
+        return
+    explain = conn.connection.cursor()
+    try:
+        explain.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+        steps = [row[-1] for row in explain.fetchall()]
+    finally:
+        explain.close()
+    _plans.setdefault(case, []).append((statement, steps))
+
+
+def _scanned_table(step: str):
+    """Table name for a full-table SCAN step, None for searches and index scans."""
+    tokens = step.split()
+    if not tokens or tokens[0] != "SCAN":
+        return None
+    if "USING" in tokens:
+        return None
+    name = tokens[2] if len(tokens) > 2 and tokens[1] == "TABLE" else tokens[1]
+    return name if name in Base.metadata.tables else None
+
+
+async def seed(session_factory, user_count: int, contest_count: int, per_contest: int):
+    now = datetime.datetime(2024, 1, 1)
+    divisions = [models.Division.Div1, models.Division.Div2]
+    async with session_factory() as db:
+        await db.execute(insert(models.User), [
+            {
+                "id": i,
+                "name": f"User {i}",
+                "codeforces_handle": f"cf_user_{i}",
+                "email": f"user{i}@example.com",
+                "division": divisions[i % 2],
+                "status": models.UserStatus.Active if i % 10 else models.UserStatus.NoLongerActive,
+                "role": models.UserRole.Participant,
+                "rating": 1400 + (i * 37) % 800,
+                "hashed_password": "x",
+                "created_at": now,
+            }
+            for i in range(1, user_count + 1)
+        ])
+        await db.execute(insert(models.Contest), [
+            {
+                "id": f"contest-{c}",
+                "name": f"Contest {c}",
+                "link": f"https://codeforces.com/contest/{c}",
+                "division": divisions[c % 2],
+                "date": now + datetime.timedelta(days=c),
+            }
+            for c in range(contest_count)
+        ])
+        await db.execute(insert(models.contest_preparer_table), [
+            {"contest_id": f"contest-{c}", "user_id": (c * 13) % user_count + 1, "can_take_attendance": True}
+            for c in range(contest_count)
+        ])
+        for c in range(contest_count):
+            # Participants of the contest's division, a different slice each contest
+            start = (c * per_contest * 2) % user_count
+            members = [(start + 2 * k + (c % 2)) % user_count + 1 for k in range(per_contest)]
+            await db.execute(insert(models.Attendance), [
+                {"id": f"a-{c}-{uid}", "contest_id": f"contest-{c}", "user_id": uid, "status": models.AttendanceStatus.PRESENT}
+                for uid in members
+            ])
+            await db.execute(insert(models.RatingHistory), [
+                {"contest_id": f"contest-{c}", "user_id": uid, "old_rating": 1400, "new_rating": 1410, "timestamp": now + datetime.timedelta(days=c)}
+                for uid in members
+            ])
+        # A few revoked and expired tokens among the live ones, for the purge
+        issued = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        await db.execute(insert(models.RefreshToken), [
+            {
+                "user_id": i,
+                "token_digest": token_digest(f"token-{i}"),
+                "expires_at": issued + datetime.timedelta(days=-1 if i % 50 == 0 else 7),
+                "is_revoked": i % 40 == 0,
+            }
+            for i in range(1, user_count + 1)
+        ])
+        await db.execute(insert(models.Rating), [
+            {"id": f"r-{i}", "user_id": i, "current_rating": 1400} for i in range(1, user_count + 1, 2)
+        ])
+        await db.commit()
+        await db.execute(text("ANALYZE"))
+        await db.commit()
+
+
+def cases():
+    """(name, coroutine factory, tables a full scan is expected on)."""
+    participant = models.User(id=4, role=models.UserRole.Participant)
+    duplicate = ContestCreate(name="dup", link="https://codeforces.com/contest/7", division=models.Division.Div2)
+
+    async def create_duplicate_contest(db):
+        try:
+            await contests.create_contest(db, duplicate)
+        except ValueError:
+            pass
+
+    async def rating_snapshot(db):
+        contest = await contests.get_contest(db, "contest-40")
+        await ratings.get_rating_snapshot(db, contest)
+
+    async def save_rating_snapshot(db):
+        contest = await contests.get_contest(db, "contest-41")
+        await ratings.save_rating_snapshot(db, contest)
+
+    def export(stream, **filters):
+        async def run(db):
+            async for _ in stream(db, **filters):
+                pass
+        return run
+
+    async def rotate_refresh_token(db):
+        await refresh_tokens.rotate_refresh_token(db, "token-43", "cf_user_43", "token-43-rotated", datetime.timedelta(days=7))
+
+    division = dict(division=models.Division.Div1, since=datetime.date(2024, 2, 1), until=datetime.date(2024, 2, 29))
+
+    return [
+        ("users.get_user_by_handle", lambda db: users.get_user_by_handle(db, "cf_user_42"), set()),
+        # Half the users match, so walking them in id order stops at the limit quickly
+        ("users.get_users_by_division", lambda db: users.get_users_by_division(db, models.Division.Div1, limit=50), {"users"}),
+        ("users.get_user_rows (active roster)", lambda db: users.get_user_rows(db, division=models.Division.Div1, active_only=True), set()),
+        ("users.get_user_profile_row", lambda db: users.get_user_profile_row(db, 42), set()),
+        ("users.get_user_rating_history_rows", lambda db: users.get_user_rating_history_rows(db, 42), set()),
+        ("contests.create_contest (duplicate link)", create_duplicate_contest, set()),
+        ("contests.get_contest", lambda db: contests.get_contest(db, "contest-7"), set()),
+        ("contests.get_preparer_acl", lambda db: contests.get_preparer_acl(db, "contest-7"), set()),
+        ("contests.get_contest_rows (participant)", lambda db: contests.get_contest_rows(db, user=participant), set()),
+        ("contests.get_contest_rows (division)", lambda db: contests.get_contest_rows(db, division=models.Division.Div1, limit=50), set()),
+        ("contests.get_preparer_rows", lambda db: contests.get_preparer_rows(db, ["contest-1", "contest-2"]), set()),
+        ("attendance.record_attendance", lambda db: attendance.record_attendance(db, "contest-5", 42, models.AttendanceStatus.EXCUSED), set()),
+        ("attendance.get_attendance_for_user", lambda db: attendance.get_attendance_for_user(db, 42), set()),
+        ("attendance.fetch_contest_attendance", lambda db: attendance.fetch_contest_attendance(db, "contest-5"), set()),
+        ("attendance.get_subsequent_contests", lambda db: attendance.get_subsequent_contests(db, "contest-5"), set()),
+        ("ratings.get_leaderboard", lambda db: ratings.get_leaderboard(db, models.Division.Div1), set()),
+        ("ratings.get_rating_snapshot", rating_snapshot, set()),
+        ("ratings.get_leaderboard_users", lambda db: ratings.get_leaderboard_users(db, [1, 2, 3]), set()),
+        # Users 1, 3, ... have a ratings row; 42 gets one created
+        ("ratings.get_or_create_rating (existing)", lambda db: ratings.get_or_create_rating(db, 41), set()),
+        ("ratings.get_or_create_rating (new)", lambda db: ratings.get_or_create_rating(db, 42), set()),
+        ("ratings.save_rating_snapshot", save_rating_snapshot, set()),
+        # A full export reads the whole driving table; a filtered one must not
+        ("exports.stream_rating_history_rows", export(exports.stream_rating_history_rows), {"rating_history"}),
+        ("exports.stream_rating_history_rows (division, dates)", export(exports.stream_rating_history_rows, **division), set()),
+        ("exports.stream_attendance_rows", export(exports.stream_attendance_rows), {"attendance"}),
+        ("exports.stream_attendance_rows (division, dates)", export(exports.stream_attendance_rows, **division), set()),
+        ("standings.get_contest_standings", lambda db: standings.get_contest_standings(db, "contest-5"), set()),
+        ("refresh_tokens.get_refresh_token", lambda db: refresh_tokens.get_refresh_token(db, "token-42"), set()),
+        # The rest write; they run last
+        ("refresh_tokens.rotate_refresh_token", rotate_refresh_token, set()),
+        ("refresh_tokens.purge_refresh_tokens", lambda db: refresh_tokens.purge_refresh_tokens(db, batch_size=100), set()),
+        ("attendance.rollback_contest_ratings_and_attendance", lambda db: attendance.rollback_contest_ratings_and_attendance(db, "contest-9"), set()),
+    ]
+
+
+async def check_plans(user_count: int, contest_count: int, per_contest: int) -> list:
+    """
+    Seed a fresh database and run every case. Returns (name, query count,
+    [(statement, plan steps, unexpectedly scanned tables), ...]) per case.
+    """
+    database_url = f"sqlite+aiosqlite:///{tempfile.mkdtemp(prefix='query-plans-', dir=_db_dir)}/plans.db"
+    engine = create_async_engine(database_url)
+    event.listen(engine.sync_engine, "before_cursor_execute", _explain)
+    session_factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    _plans.clear()
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await seed(session_factory, user_count, contest_count, per_contest)
+
+        results = []
+        for name, run, allowed_scans in cases():
+            token = _case.set(name)
+            try:
+                async with session_factory() as db:
+                    await run(db)
+            finally:
+                _case.reset(token)
+
+            bad = []
+            for statement, steps in _plans.get(name, []):
+                scanned = {_scanned_table(step) for step in steps} - {None} - allowed_scans
+                if scanned:
+                    bad.append((statement, steps, scanned))
+            results.append((name, len(_plans.get(name, [])), bad))
+        return results
+    finally:
+        await engine.dispose()
+
+
+async def main(args) -> int:
+    failures = 0
+    for name, queries, bad in await check_plans(args.users, args.contests, args.per_contest):
+        status = "FAIL" if bad else "ok"
+        print(f"{status:4}  {name}  ({queries} queries)")
+        for statement, steps, scanned in bad:
+            failures += 1
+            print(f"      full scan of {', '.join(sorted(scanned))}:")
+            print("        " + " ".join(statement.split()))
+            for step in steps:
+                print(f"          {step}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--contests", type=int, default=300)
+    parser.add_argument("--per-contest", type=int, default=200)
+    sys.exit(asyncio.run(main(parser.parse_args())))
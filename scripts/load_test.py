@@ -0,0 +1,333 @@
+"""
+Contest-night load test, run in-process against the ASGI app.
+
+Seeds a database with participants, a preparer and an admin. Contests
+are rated in advance through the API, so attendance edits trigger real
+rollbacks and replays. Virtual users then drive the app through
+httpx.ASGITransport. Codeforces is served by the local stand-in
+(CODEFORCES_STUB), whose synthetic handles cf_user_<n> are the seeded
+participants.
+
+    python -m scripts.load_test [--scenario contest-night] [--users 500] [--seconds 30]
+    python -m scripts.load_test --scenario login-storm --compare load-results/<earlier>.json
+
+Scenarios:
+    login-storm     every user logs in repeatedly, no think time
+    leaderboard     participants poll /rating/ (with If-None-Match) and /api/users/profile
+    attendance      preparers load and edit attendance of the first contest (rollback + replay)
+    contest-night   leaderboard polling, a trickle of logins and concurrent attendance edits
+
+Prints p50/p95/p99 latency and throughput per route and saves them as
+JSON under --out-dir. --compare prints the change against an earlier
+result. The database is a fresh SQLite file unless --database-url is given.
+A non-empty database is only used with --reset, which drops every table.
+Client and app share one event loop and CPU here, so compare runs with
+each other, not with production numbers.
+"""
+import argparse, asyncio, datetime, json, math, os, random, subprocess, sys, tempfile, time
+
+_db_dir = tempfile.mkdtemp(prefix="load-test-")
+_defaults = {
+    "DATABASE_URL": f"sqlite+aiosqlite:///{os.path.join(_db_dir, 'load.db')}",
+    "CODEFORCES_STUB": "true",
+    "SECRET_KEY": "load-test-secret",
+    "ALGORITHM": "HS256",
+    "LOG_LEVEL": "WARNING",
+}
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=["login-storm", "leaderboard", "attendance", "contest-night"], default="contest-night")
+    parser.add_argument("--users", type=int, default=500, help="Seeded participants (and polling virtual users)")
+    parser.add_argument("--contests", type=int, default=3, help="Contests rated before the run, per division")
+    parser.add_argument("--preparers", type=int, default=3, help="Concurrent attendance editors")
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--think-ms", type=float, default=1000, help="Pause between a poller's requests")
+    parser.add_argument("--database-url", help="Run against this database instead of a temporary SQLite file")
+    parser.add_argument("--reset", action="store_true", help="Drop and recreate every table of a non-empty database")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out-dir", default="load-results")
+    parser.add_argument("--compare", help="Earlier result file to compare with")
+    return parser.parse_args(argv)
+
+
+ARGS = _parse_args() if __name__ == "__main__" else None
+if ARGS is not None and ARGS.database_url:
+    os.environ["DATABASE_URL"] = ARGS.database_url
+for _key, _value in _defaults.items():
+    os.environ.setdefault(_key, _value)
+if ARGS is not None:
+    # One synthetic standings row per seeded participant
+    os.environ.setdefault("CODEFORCES_STUB_ROWS", str(ARGS.users))
+
+import httpx
+from sqlalchemy import func, insert, select
+
+from app import models
+from app.db import Base, SessionLocal, dispose_engines, engine
+from app.main import app
+from app.security import hash_password, password_hasher
+from app.services.codeforces_stub import synthetic_handle
+
+PASSWORD = "load-test-password"
+DIVISIONS = [models.Division.Div1, models.Division.Div2]
+ADMIN_HANDLE = "load_admin"
+PREPARER_HANDLE = "load_preparer"
+
+
+class Recorder:
+    """Latencies and status codes per route label."""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, label: str, seconds: float, status_code: int):
+        self.latencies.setdefault(label, []).append(seconds)
+        if status_code >= 400:
+            self.errors[label] = self.errors.get(label, 0) + 1
+
+    async def request(self, client: httpx.AsyncClient, label: str, method: str, url: str, **kwargs) -> httpx.Response:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except Exception:
+            self.record(label, time.perf_counter() - started, 599)
+            raise
+        self.record(label, time.perf_counter() - started, response.status_code)
+        return response
+
+    def summary(self, elapsed: float) -> dict:
+        routes = {}
+        for label, latencies in sorted(self.latencies.items()):
+            latencies.sort()
+            routes[label] = {
+                "requests": len(latencies),
+                "errors": self.errors.get(label, 0),
+                "rps": round(len(latencies) / elapsed, 2),
+                "p50_ms": _percentile_ms(latencies, 0.50),
+                "p95_ms": _percentile_ms(latencies, 0.95),
+                "p99_ms": _percentile_ms(latencies, 0.99),
+                "max_ms": round(latencies[-1] * 1000, 2),
+            }
+        return routes
+
+
+def _percentile_ms(sorted_latencies: list, q: float) -> float:
+    """Nearest-rank percentile."""
+    index = max(0, math.ceil(q * len(sorted_latencies)) - 1)
+    return round(sorted_latencies[index] * 1000, 2)
+
+
+async def prepare_database(args, user_count: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with SessionLocal() as db:
+        existing = (await db.execute(select(func.count()).select_from(models.User))).scalar_one()
+    if existing:
+        if not args.reset:
+            sys.exit(f"{engine.url.render_as_string()} already has {existing} users; pass --reset to wipe it")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+
+    hashed = hash_password(PASSWORD)
+    now = datetime.datetime.utcnow()
+    participants = [
+        {
+            "id": i + 1,
+            "name": f"User {i}",
+            "codeforces_handle": synthetic_handle(i),
+            "email": f"user{i}@example.com",
+            "division": DIVISIONS[i % 2],
+            "status": models.UserStatus.Active,
+            "role": models.UserRole.Participant,
+            "rating": 1400,
+            "hashed_password": hashed,
+            "created_at": now,
+        }
+        for i in range(user_count)
+    ]
+    staff = [
+        {**participants[0], "id": user_count + 1, "name": "Load Admin", "codeforces_handle": ADMIN_HANDLE,
+         "email": "admin@example.com", "role": models.UserRole.Admin},
+        {**participants[0], "id": user_count + 2, "name": "Load Preparer", "codeforces_handle": PREPARER_HANDLE,
+         "email": "preparer@example.com"},
+    ]
+    async with SessionLocal() as db:
+        await db.execute(insert(models.User), participants + staff)
+        await db.execute(insert(models.Contest), [
+            {
+                "id": f"load-{c}",
+                "name": f"Load contest {c}",
+                "link": f"https://codeforces.com/contest/{1000 + c}",
+                "division": DIVISIONS[c % 2],
+                "date": now - datetime.timedelta(days=2 * args.contests - c),
+            }
+            for c in range(2 * args.contests)
+        ])
+        await db.execute(insert(models.contest_preparer_table), [
+            {"contest_id": f"load-{c}", "user_id": user_count + 2, "can_take_attendance": True}
+            for c in range(2 * args.contests)
+        ])
+        await db.commit()
+
+
+def attendance_body(contest_id: str, user_ids: list, rng: random.Random) -> dict:
+    statuses = [models.AttendanceStatus.PRESENT.value] * 7 + [models.AttendanceStatus.ABSENT.value] * 2 + [models.AttendanceStatus.EXCUSED.value]
+    return {"attendance": [{"user_id": uid, "contest_id": contest_id, "status": rng.choice(statuses)} for uid in user_ids]}
+
+
+async def login(client: httpx.AsyncClient, recorder: Recorder, handle: str) -> dict:
+    response = await recorder.request(client, "POST /api/auth/login", "POST", "/api/auth/login",
+                                      data={"username": handle, "password": PASSWORD})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def rate_contests_in_advance(client: httpx.AsyncClient, args, division_users: dict):
+    """Submit attendance for every seeded contest, oldest first, so edits have contests to replay."""
+    setup = Recorder()
+    headers = await login(client, setup, ADMIN_HANDLE)
+    rng = random.Random(args.seed)
+    for c in range(2 * args.contests):
+        contest_id = f"load-{c}"
+        body = attendance_body(contest_id, division_users[DIVISIONS[c % 2]], rng)
+        response = await client.post(f"/api/attendance/{contest_id}/attendance", json=body, headers=headers)
+        response.raise_for_status()
+
+
+async def login_storm_user(client, recorder, deadline, handle, rng, think):
+    while time.perf_counter() < deadline:
+        await login(client, recorder, handle)
+        await asyncio.sleep(think)
+
+
+async def polling_user(client, recorder, deadline, handle, rng, think):
+    headers = await login(client, recorder, handle)
+    etags = {}
+    # Spread the first polls instead of firing every user at once
+    await asyncio.sleep(rng.random() * think)
+    while time.perf_counter() < deadline:
+        for label, url in (("GET /rating/", "/rating/"), ("GET /api/users/profile", "/api/users/profile")):
+            request_headers = {**headers, **({"If-None-Match": etags[url]} if url in etags else {})}
+            response = await recorder.request(client, label, "GET", url, headers=request_headers)
+            if "etag" in response.headers:
+                etags[url] = response.headers["etag"]
+        await asyncio.sleep(think * (0.5 + rng.random()))
+
+
+async def preparer_user(client, recorder, deadline, division_users, rng, think):
+    headers = await login(client, recorder, PREPARER_HANDLE)
+    # The first contest of a division has the most contests after it to replay
+    contest_id, division = "load-0", DIVISIONS[0]
+    while time.perf_counter() < deadline:
+        await recorder.request(client, "GET /api/attendance/{contest_id}/attendance", "GET",
+                               f"/api/attendance/{contest_id}/attendance", headers=headers)
+        await recorder.request(client, "PUT /api/attendance/{contest_id}/attendance", "PUT",
+                               f"/api/attendance/{contest_id}/attendance",
+                               json=attendance_body(contest_id, division_users[division], rng), headers=headers)
+        await asyncio.sleep(think * (0.5 + rng.random()))
+
+
+def virtual_users(args, client, recorder, deadline, division_users):
+    rng = random.Random(args.seed)
+    handles = [synthetic_handle(i) for i in range(args.users)]
+    think = args.think_ms / 1000
+    if args.scenario == "login-storm":
+        return [login_storm_user(client, recorder, deadline, h, random.Random(rng.random()), 0) for h in handles]
+    users = []
+    if args.scenario in ("leaderboard", "contest-night"):
+        users += [polling_user(client, recorder, deadline, h, random.Random(rng.random()), think) for h in handles]
+    if args.scenario in ("attendance", "contest-night"):
+        users += [preparer_user(client, recorder, deadline, division_users, random.Random(rng.random()), think)
+                  for _ in range(args.preparers)]
+    if args.scenario == "contest-night":
+        # Late arrivals logging in during the contest
+        users += [login_storm_user(client, recorder, deadline, h, random.Random(rng.random()), 5 * think)
+                  for h in rng.sample(handles, max(1, len(handles) // 20))]
+    return users
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(result: dict, baseline: dict = None):
+    print(f"\n{result['scenario']}: {result['totals']['requests']} requests in {result['seconds']:.1f}s "
+          f"({result['totals']['rps']:.1f} req/s, {result['totals']['errors']} errors)")
+    header = f"{'route':<46} {'reqs':>7} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    if baseline:
+        header += f" {'Δp95':>8} {'Δreq/s':>8}"
+    print(header)
+    for label, r in result["routes"].items():
+        line = f"{label:<46} {r['requests']:>7} {r['errors']:>5} {r['rps']:>8.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f}"
+        before = (baseline or {}).get("routes", {}).get(label)
+        if before:
+            line += f" {_change(before['p95_ms'], r['p95_ms']):>8} {_change(before['rps'], r['rps']):>8}"
+        print(line)
+
+
+def _change(before: float, after: float) -> str:
+    return f"{(after - before) / before * 100:+.0f}%" if before else "n/a"
+
+
+async def main(args) -> int:
+    try:
+        return await run(args)
+    finally:
+        password_hasher.shutdown()
+        await dispose_engines()
+
+
+async def run(args) -> int:
+    await prepare_database(args, args.users)
+    division_users = {d: [i + 1 for i in range(args.users) if DIVISIONS[i % 2] == d] for d in DIVISIONS}
+    recorder = Recorder()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://load-test", timeout=None) as client:
+        if args.scenario in ("attendance", "contest-night"):
+            print(f"Rating {2 * args.contests} contests in advance...", flush=True)
+            await rate_contests_in_advance(client, args, division_users)
+        print(f"Running {args.scenario} for {args.seconds:.0f}s...", flush=True)
+        started = time.perf_counter()
+        deadline = started + args.seconds
+        await asyncio.gather(*virtual_users(args, client, recorder, deadline, division_users))
+        elapsed = time.perf_counter() - started
+
+    routes = recorder.summary(elapsed)
+    total_requests = sum(r["requests"] for r in routes.values())
+    result = {
+        "scenario": args.scenario,
+        "started_at": datetime.datetime.utcnow().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "database": engine.dialect.name,
+        "seconds": round(elapsed, 2),
+        "options": {k: v for k, v in vars(args).items() if k not in ("compare", "out_dir", "database_url")},
+        "totals": {
+            "requests": total_requests,
+            "errors": sum(r["errors"] for r in routes.values()),
+            "rps": round(total_requests / elapsed, 2),
+        },
+        "routes": routes,
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    path = os.path.join(args.out_dir, f"{args.scenario}-{datetime.datetime.utcnow():%Y%m%dT%H%M%S}.json")
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nSaved {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(ARGS)))
@@ -0,0 +1,96 @@
+"""
+Test fixtures: each test gets a fresh SQLite file database and the app's
+in-process caches emptied. Async tests run on asyncio through the anyio
+plugin (`@pytest.mark.anyio`).
+"""
+import os, tempfile
+
+_db_dir = tempfile.mkdtemp(prefix="tests-")
+# Set before the app is imported: settings are read at import time
+os.environ.update({
+    "DATABASE_URL": f"sqlite+aiosqlite:///{os.path.join(_db_dir, 'test.db')}",
+    "SECRET_KEY": "test-secret",
+    "ALGORITHM": "HS256",
+    "CODEFORCES_STUB": "true",
+    "PASSWORD_HASH_EXECUTOR": "thread",
+    "BCRYPT_ROUNDS": "4",
+    "LOG_LEVEL": "WARNING",
+})
+
+import datetime
+import httpx
+import pytest
+
+from app import models
+from app.cache import as_of_leaderboard_cache, preparer_acl_cache, principal_cache
+from app.conditional import response_cache
+from app.db import Base, SessionLocal, dispose_engines, engine
+from app.main import app
+from app.security import create_access_token, hash_password
+from app.services.leaderboard import leaderboard_store
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def database():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    for cache in (principal_cache, preparer_acl_cache, as_of_leaderboard_cache, response_cache):
+        cache.clear()
+    leaderboard_store.invalidate()
+    yield
+    # Pooled aiosqlite connections belong to this test's event loop
+    await dispose_engines()
+
+
+@pytest.fixture
+async def db(database):
+    async with SessionLocal() as session:
+        yield session
+
+
+@pytest.fixture
+async def client(database):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+def auth_headers(user: models.User) -> dict:
+    return {"Authorization": f"Bearer {create_access_token(data={'sub': user.codeforces_handle})}"}
+
+
+async def add_user(db, handle: str, **values) -> models.User:
+    user = models.User(
+        name=values.pop("name", handle.title()),
+        codeforces_handle=handle,
+        email=values.pop("email", f"{handle}@example.com"),
+        division=values.pop("division", models.Division.Div1),
+        status=values.pop("status", models.UserStatus.Active),
+        role=values.pop("role", models.UserRole.Participant),
+        hashed_password=values.pop("hashed_password", hash_password("password")),
+        **values,
+    )
+    db.add(user)
+    await db.commit()
+    await db.refresh(user)
+    return user
+
+
+async def add_contest(db, contest_id: str, **values) -> models.Contest:
+    contest = models.Contest(
+        id=contest_id,
+        name=values.pop("name", f"Contest {contest_id}"),
+        link=values.pop("link", "https://codeforces.com/contest/1000"),
+        division=values.pop("division", models.Division.Div1),
+        date=values.pop("date", datetime.datetime(2024, 1, 1)),
+        **values,
+    )
+    db.add(contest)
+    await db.commit()
+    await db.refresh(contest)
+    return contest
@@ -0,0 +1,61 @@
+import asyncio
+import pytest
+
+from app import admission, models
+from conftest import add_contest, add_user, auth_headers
+
+pytestmark = pytest.mark.anyio
+
+STANDINGS = "/api/attendance/c1/standings"
+
+
+@pytest.fixture
+def heavy(monkeypatch):
+    """Replaces the heavy class with one of one slot and one queue place."""
+    def install(queue_timeout):
+        limiter = admission.AdmissionLimiter(admission.HEAVY, concurrency=1, queue_size=1, queue_timeout=queue_timeout)
+        monkeypatch.setitem(admission.limiters, admission.HEAVY, limiter)
+        return limiter
+    return install
+
+
+async def wait_until_queued(limiter, count):
+    for _ in range(100):
+        if limiter.stats()["queued"] == count:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"{count} requests never queued")
+
+
+async def test_saturated_heavy_class_queues_then_rejects(db, client, heavy):
+    headers = auth_headers(await add_user(db, "admin", role=models.UserRole.Admin))
+    await add_contest(db, "c1", link="https://codeforces.com/contest/1900")
+    limiter = heavy(queue_timeout=5)
+    await limiter.acquire()
+
+    queued = asyncio.create_task(client.post(STANDINGS, headers=headers))
+    await wait_until_queued(limiter, 1)
+
+    rejected = await client.post(STANDINGS, headers=headers)
+    assert rejected.status_code == 429
+    assert int(rejected.headers["retry-after"]) >= 1
+    # Other classes are not held up by the heavy queue
+    assert (await client.get("/api/users/profile", headers=headers)).status_code == 200
+
+    limiter.release(0.5)
+    assert (await queued).status_code == 200
+    assert limiter.stats()["active"] == 0
+    assert (limiter.admitted, limiter.rejected) == (2, 1)
+
+
+async def test_queued_heavy_request_times_out(db, client, heavy):
+    headers = auth_headers(await add_user(db, "admin", role=models.UserRole.Admin))
+    await add_contest(db, "c1", link="https://codeforces.com/contest/1900")
+    limiter = heavy(queue_timeout=0.05)
+    await limiter.acquire()
+
+    response = await client.post(STANDINGS, headers=headers)
+
+    assert response.status_code == 503
+    assert "retry-after" in response.headers
+    assert limiter.stats()["queued"] == 0 and limiter.timed_out == 1
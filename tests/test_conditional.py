@@ -0,0 +1,62 @@
+import pytest
+
+from app import models
+from app.crud import attendance, contests as crud_contests
+from app.schemas.contest_schemas import ContestCreate
+from conftest import add_contest, add_user, auth_headers
+
+pytestmark = pytest.mark.anyio
+
+
+async def revalidate(client, url, headers, etag):
+    return await client.get(url, headers={**headers, "If-None-Match": etag})
+
+
+async def test_profile_is_not_modified_until_it_is_updated(db, client):
+    alice = await add_user(db, "alice")
+    headers = auth_headers(alice)
+
+    first = await client.get("/api/users/profile", headers=headers)
+    etag = first.headers["etag"]
+    for _ in range(2):
+        unchanged = await revalidate(client, "/api/users/profile", headers, etag)
+        assert unchanged.status_code == 304
+        assert unchanged.headers["etag"] == etag
+        assert unchanged.content == b""
+
+    update = await client.put("/api/users/profile/alice", json={"name": "Alice Renamed", "email": "alice@example.com"}, headers=headers)
+    assert update.status_code == 200
+
+    changed = await revalidate(client, "/api/users/profile", headers, etag)
+    assert changed.status_code == 200
+    assert changed.json()["name"] == "Alice Renamed"
+    assert changed.headers["etag"] != etag
+
+
+async def test_leaderboard_is_not_modified_until_a_rating_changes(db, client):
+    alice = await add_user(db, "alice")
+    headers = auth_headers(alice)
+
+    etag = (await client.get("/rating/", headers=headers)).headers["etag"]
+    assert (await revalidate(client, "/rating/", headers, etag)).status_code == 304
+
+    await attendance.apply_rating_update(db, alice.id, 25)
+
+    changed = await revalidate(client, "/rating/", headers, etag)
+    assert changed.status_code == 200
+    assert changed.json()[0]["current_rating"] == 1425
+
+
+async def test_contest_list_is_not_modified_until_a_contest_is_added(db, client):
+    headers = auth_headers(await add_user(db, "alice"))
+    await add_contest(db, "c1")
+    url = "/api/contests/division/Div 1"
+
+    etag = (await client.get(url, headers=headers)).headers["etag"]
+    assert (await revalidate(client, url, headers, etag)).status_code == 304
+
+    await crud_contests.create_contest(db, ContestCreate(name="Next", link="https://codeforces.com/contest/2000", division=models.Division.Div1))
+
+    changed = await revalidate(client, url, headers, etag)
+    assert changed.status_code == 200
+    assert len(changed.json()) == 2
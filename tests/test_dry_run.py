@@ -0,0 +1,32 @@
+import datetime
+import pytest
+
+from app import models
+from app.cache import resource_versions
+from app.crud import attendance
+from app.db import SessionLocal, dry_run_session
+from app.services.leaderboard import leaderboard_store
+from conftest import add_contest, add_user
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_dry_run_keeps_no_writes(db):
+    alice = await add_user(db, "alice", rating=1500)
+    await add_contest(db, "c1")
+    db.add(models.RatingHistory(user_id=alice.id, contest_id="c1", old_rating=1400, new_rating=1500,
+                                timestamp=datetime.datetime(2024, 1, 1, 21)))
+    await db.commit()
+    board = await leaderboard_store.get(db, models.Division.Div1)
+    versions = resource_versions.get("user", alice.id), resource_versions.get("contests")
+
+    async with dry_run_session() as dry_db:
+        await attendance.rollback_contest_ratings_and_attendance(dry_db, "c1")
+        await attendance.apply_rating_update(dry_db, alice.id, 25)
+        assert (await dry_db.get(models.User, alice.id)).rating == 1425
+
+    async with SessionLocal() as check_db:
+        assert (await check_db.get(models.User, alice.id)).rating == 1500
+        assert (await check_db.get(models.RatingHistory, 1)) is not None
+        assert await leaderboard_store.get(check_db, models.Division.Div1) is board
+    assert (resource_versions.get("user", alice.id), resource_versions.get("contests")) == versions
@@ -0,0 +1,100 @@
+import datetime
+import pytest
+
+from app import models
+from app.crud import attendance, ratings
+from conftest import add_contest, add_user, auth_headers
+
+pytestmark = pytest.mark.anyio
+
+
+async def seed(db):
+    users = {}
+    for handle, rating in [("ann", 1600), ("bob", 1500), ("cat", 1500), ("alice", 1450), ("dan", 1400)]:
+        users[handle] = await add_user(db, handle, rating=rating)
+    return users
+
+
+async def read_pages(client, headers, limit):
+    handles, cursor, versions = [], None, set()
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        page = (await client.get("/rating/page", params=params, headers=headers)).json()
+        handles += [entry["codeforces_handle"] for entry in page["entries"]]
+        versions.add(page["version"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return handles, versions
+
+
+async def test_leaderboard_pages_follow_rating_changes(db, client):
+    users = await seed(db)
+    headers = auth_headers(users["alice"])
+
+    # The tie at 1500 falls across the first page boundary
+    handles, (version,) = await read_pages(client, headers, limit=2)
+    assert handles == ["ann", "bob", "cat", "alice", "dan"]
+
+    await attendance.apply_rating_update(db, users["dan"].id, 150)
+
+    handles, (new_version,) = await read_pages(client, headers, limit=2)
+    assert handles == ["ann", "dan", "bob", "cat", "alice"]
+    assert new_version > version
+
+
+async def test_my_rank_moves_with_a_rating_change(db, client):
+    users = await seed(db)
+    headers = auth_headers(users["alice"])
+
+    me = (await client.get("/rating/me", params={"k": 1}, headers=headers)).json()
+    # Dense rank: both 1500s share rank 2
+    assert (me["entry"]["rank"], me["position"], me["total"], me["percentile"]) == (3, 4, 5, 20.0)
+    assert [e["codeforces_handle"] for e in me["above"] + me["below"]] == ["cat", "dan"]
+
+    await attendance.apply_rating_update(db, users["alice"].id, 100)
+
+    me = (await client.get("/rating/me", params={"k": 1}, headers=headers)).json()
+    assert (me["entry"]["rank"], me["position"], me["percentile"]) == (2, 2, 60.0)
+    assert me["entry"]["current_rating"] == 1550
+    assert [e["codeforces_handle"] for e in me["above"] + me["below"]] == ["ann", "bob"]
+
+
+async def test_as_of_leaderboard_serves_the_snapshot(db, client):
+    users = await seed(db)
+    contest = await add_contest(db, "c1", division=models.Division.Div1)
+    await ratings.save_rating_snapshot(db, contest)
+    # Later changes do not show up in the leaderboard as of c1
+    await attendance.apply_rating_update(db, users["dan"].id, 300)
+
+    response = await client.get("/rating/as-of/c1", headers=auth_headers(users["alice"]))
+    assert response.status_code == 200
+    assert [(e["codeforces_handle"], e["current_rating"], e["rank"]) for e in response.json()] == [
+        ("ann", 1600, 1), ("bob", 1500, 2), ("cat", 1500, 2), ("alice", 1450, 3), ("dan", 1400, 4),
+    ]
+
+
+async def test_as_of_leaderboard_backfills_from_rating_history(db, client):
+    users = await seed(db)
+    await add_contest(db, "c1", division=models.Division.Div1, date=datetime.datetime(2024, 1, 1))
+    await add_contest(db, "c2", division=models.Division.Div1, date=datetime.datetime(2024, 2, 1))
+    db.add_all([
+        models.RatingHistory(user_id=users["ann"].id, contest_id="c1", old_rating=1400, new_rating=1450),
+        models.RatingHistory(user_id=users["ann"].id, contest_id="c2", old_rating=1450, new_rating=1600),
+        models.RatingHistory(user_id=users["bob"].id, contest_id="c1", old_rating=1400, new_rating=1380),
+    ])
+    await db.commit()
+
+    response = await client.get("/rating/as-of/c1", headers=auth_headers(users["alice"]))
+    # Users without history as of c1 are at the initial rating
+    assert [(e["codeforces_handle"], e["current_rating"]) for e in response.json()] == [
+        ("ann", 1450), ("cat", 1400), ("alice", 1400), ("dan", 1400), ("bob", 1380),
+    ]
+
+
+async def test_as_of_leaderboard_outside_the_division(db, client):
+    await seed(db)
+    await add_contest(db, "c1", division=models.Division.Div1)
+    headers = auth_headers(await add_user(db, "eve", division=models.Division.Div2))
+
+    assert (await client.get("/rating/as-of/c1", headers=headers)).status_code == 403
+    assert (await client.get("/rating/as-of/missing", headers=headers)).status_code == 404
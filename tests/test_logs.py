@@ -0,0 +1,25 @@
+import logging, queue
+
+from app.logs import EnqueueHandler, summarize
+
+
+def enqueue(msg, *args):
+    records = queue.SimpleQueue()
+    record = logging.makeLogRecord({"msg": msg, "args": args})
+    EnqueueHandler(records).handle(record)
+    return records.get_nowait()
+
+
+def test_summary_is_taken_when_logged():
+    contestants = [{"user_id": 1}]
+    record = enqueue("Contestants: %s", summarize(contestants))
+    contestants.append({"user_id": 2, "rank": 1})
+
+    assert record.getMessage() == "Contestants: list[1] of dict{user_id}"
+
+
+def test_immutable_arguments_are_formatted_later():
+    record = enqueue("%s ran %d queries", "GET /", 3)
+
+    assert record.args == ("GET /", 3)
+    assert record.getMessage() == "GET / ran 3 queries"
@@ -0,0 +1,55 @@
+import datetime
+import json
+import pytest
+
+from app import models
+from conftest import add_contest, add_user, auth_headers
+
+pytestmark = pytest.mark.anyio
+
+
+async def read_pages(client, url, headers, limit):
+    items, cursor = [], None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = await client.get(url, params=params, headers=headers)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page) <= limit
+        items += page
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            return items
+
+
+async def test_contest_pages_neither_skip_nor_repeat(db, client):
+    headers = auth_headers(await add_user(db, "alice"))
+    # Contests sharing a date are ordered by id, across page boundaries too
+    for n, day in enumerate([3, 1, 2, 2, 2, 1, 3]):
+        await add_contest(db, f"c{n}", link=f"https://codeforces.com/contest/{n}", date=datetime.datetime(2024, 1, day))
+    url = "/api/contests/division/Div 1"
+
+    unpaged = await client.get(url, headers=headers)
+    assert "x-next-cursor" not in unpaged.headers
+    everything = unpaged.json()
+    for limit in (1, 2, 3):
+        assert await read_pages(client, url, headers, limit) == everything
+    assert [c["id"] for c in everything] == ["c1", "c5", "c2", "c3", "c4", "c0", "c6"]
+
+
+async def test_user_pages_match_the_ndjson_stream(db, client):
+    admin = await add_user(db, "admin", role=models.UserRole.Admin)
+    for n in range(6):
+        await add_user(db, f"user{n}")
+    headers = auth_headers(admin)
+
+    pages = await read_pages(client, "/api/users/all", headers, limit=4)
+    streamed = (await client.get("/api/users/all", params={"format": "ndjson"}, headers=headers)).text
+    assert pages == [json.loads(line) for line in streamed.splitlines()]
+    assert [u["codeforces_handle"] for u in pages] == ["admin"] + [f"user{n}" for n in range(6)]
+
+
+async def test_malformed_cursor_is_rejected(db, client):
+    headers = auth_headers(await add_user(db, "alice"))
+    response = await client.get("/api/users/all", params={"limit": 2, "cursor": "not-a-cursor"}, headers=headers)
+    assert response.status_code == 400
@@ -0,0 +1,36 @@
+import pytest
+
+from app.security import HasherOverloaded, PasswordHasher, password_hasher
+from conftest import add_user
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_overloaded_hasher_raises():
+    hasher = PasswordHasher(kind="thread", workers=1, max_pending=0)
+    with pytest.raises(HasherOverloaded):
+        await hasher.hash("password")
+    assert hasher.stats()["rejected"] == 1
+
+
+async def test_login_answers_503_when_hasher_is_overloaded(db, client, monkeypatch):
+    await add_user(db, "alice")
+    monkeypatch.setattr(password_hasher, "max_pending", 0)
+
+    response = await client.post("/api/auth/login", data={"username": "alice", "password": "password"})
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+
+async def test_hash_time_is_exported(db, client):
+    await add_user(db, "alice")
+    before = password_hasher.stats()
+
+    response = await client.post("/api/auth/login", data={"username": "alice", "password": "password"})
+    assert response.status_code == 200
+
+    metrics = (await client.get("/metrics")).text
+    assert f"password_hash_total {before['calls'] + 1}" in metrics
+    seconds = next(line for line in metrics.splitlines() if line.startswith("password_hash_seconds_total "))
+    assert float(seconds.split()[1]) > before["hash_seconds_total"]
@@ -0,0 +1,56 @@
+"""
+Query budgets for hot endpoints: a change that adds queries, or runs one
+per row (N+1), fails here.
+"""
+import datetime
+import pytest
+
+from app import models
+from app.crud import contests as crud_contests
+from app.query_stats import QueryBudgetExceeded, query_budget
+from conftest import add_contest, add_user, auth_headers
+
+pytestmark = pytest.mark.anyio
+
+
+async def seed(db):
+    admin = await add_user(db, "admin", role=models.UserRole.Admin)
+    alice = await add_user(db, "alice")
+    for day in range(1, 6):
+        contest = await add_contest(db, f"c{day}", link=f"https://codeforces.com/contest/{day}",
+                                    date=datetime.datetime(2024, 3, day))
+        await crud_contests.add_preparers_to_contest(db, contest.id, [str(admin.id), str(alice.id)])
+        db.add(models.Attendance(contest_id=contest.id, user_id=alice.id, status=models.AttendanceStatus.PRESENT))
+        db.add(models.RatingHistory(user_id=alice.id, contest_id=contest.id, old_rating=1400 + day,
+                                    new_rating=1401 + day, timestamp=datetime.datetime(2024, 3, day, 21)))
+    await db.commit()
+    return alice
+
+
+async def test_profile_budget(db, client):
+    headers = auth_headers(await seed(db))
+
+    # Principal, profile row, history
+    with query_budget(3, max_repeats=1) as stats:
+        response = await client.get("/api/users/profile?include_history=true", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()["history"]) == 5
+    assert f'desc="{stats.queries} queries' in response.headers["server-timing"]
+
+
+async def test_my_contests_budget(db, client):
+    headers = auth_headers(await seed(db))
+
+    # Principal, contests, preparers of all of them at once
+    with query_budget(3, max_repeats=1):
+        response = await client.get("/api/contests/my", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()) == 5
+
+
+async def test_budget_fails_when_exceeded(db, client):
+    headers = auth_headers(await seed(db))
+
+    with pytest.raises(QueryBudgetExceeded, match="exceeds the budget of 0"):
+        with query_budget(0):
+            await client.get("/api/users/profile", headers=headers)
@@ -0,0 +1,17 @@
+import pytest
+
+from scripts.check_query_plans import check_plans
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_crud_queries_are_served_by_indexes():
+    results = await check_plans(user_count=3000, contest_count=60, per_contest=60)
+
+    failures = {
+        name: [(" ".join(statement.split()), sorted(scanned)) for statement, _, scanned in bad]
+        for name, _, bad in results
+        if bad
+    }
+    assert not failures
+    assert all(queries for _, queries, _ in results)
@@ -0,0 +1,97 @@
+"""
+project() + dumps() must render the same bytes FastAPI renders for the
+pydantic schemas they replace.
+"""
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+import datetime
+import pytest
+
+from app import models
+from app.crud import contests as crud_contests, users as crud_users
+from app.routers.contests import _contest_payload
+from app.schemas import contest_schemas, user_schemas
+from app import serialization
+from app.serialization import dumps, project
+from conftest import add_contest, add_user, auth_headers
+
+pytestmark = [pytest.mark.anyio, pytest.mark.usefixtures("encoder")]
+
+
+@pytest.fixture(params=["orjson", "json"])
+def encoder(request, monkeypatch):
+    """Run each test with orjson and with the stdlib fallback."""
+    if request.param == "json":
+        monkeypatch.setattr(serialization, "orjson", None)
+    elif serialization.orjson is None:
+        pytest.skip("orjson is not installed")
+
+
+def fastapi_body(content) -> bytes:
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+async def seed(db):
+    admin = await add_user(db, "admin", role=models.UserRole.Admin, rating=1710)
+    # Non-ASCII text must stay unescaped, as JSONResponse renders it
+    alice = await add_user(db, "alice", name="Alîce Ñandú", division=models.Division.Div2)
+    await add_user(db, "bob", status=models.UserStatus.NoLongerActive)
+    first = await add_contest(db, "c1", date=datetime.datetime(2024, 3, 1, 18, 35, 0, 123456))
+    await add_contest(db, "c2", division=models.Division.Div2, date=datetime.datetime(2024, 3, 8, 18, 35))
+    await crud_contests.add_preparers_to_contest(db, first.id, [str(admin.id), str(alice.id)])
+    db.add_all([
+        models.RatingHistory(user_id=alice.id, contest_id="c2", old_rating=1400, new_rating=1432,
+                             timestamp=datetime.datetime(2024, 3, 8, 21, 0, 5, 42)),
+        models.RatingHistory(user_id=alice.id, contest_id="c1", old_rating=1432, new_rating=1390,
+                             timestamp=datetime.datetime(2024, 3, 9, 9, 30)),
+    ])
+    await db.commit()
+    return alice
+
+
+async def test_user_read_matches_pydantic(db):
+    await seed(db)
+    rows = await crud_users.get_user_rows(db)
+    orm_users = (await db.execute(select(models.User).order_by(models.User.id))).scalars().all()
+
+    expected = fastapi_body([user_schemas.UserRead.from_orm(user) for user in orm_users])
+    assert dumps([project(user_schemas.UserRead, row) for row in rows]) == expected
+
+
+async def test_contest_read_matches_pydantic(db):
+    await seed(db)
+    rows = await crud_contests.get_contest_rows(db)
+    preparers = await crud_contests.get_preparer_rows(db, [row.id for row in rows])
+    orm_contests = (await db.execute(
+        select(models.Contest).options(selectinload(models.Contest.preparers)).order_by(models.Contest.date, models.Contest.id)
+    )).scalars().all()
+
+    schemas = []
+    for contest in orm_contests:
+        schema = contest_schemas.ContestRead.from_orm(contest)
+        schema.preparers.sort(key=lambda preparer: preparer.id)
+        schemas.append(schema)
+    assert dumps([_contest_payload(row, preparers[row.id]) for row in rows]) == fastapi_body(schemas)
+
+
+async def test_user_profile_matches_pydantic(db, client):
+    alice = await seed(db)
+    response = await client.get("/api/users/profile", params={"include_history": True}, headers=auth_headers(alice))
+    assert response.status_code == 200
+
+    history = (await db.execute(
+        select(models.RatingHistory).filter(models.RatingHistory.user_id == alice.id).order_by(models.RatingHistory.timestamp)
+    )).scalars().all()
+    expected = user_schemas.UserProfile(
+        id=alice.id,
+        name=alice.name,
+        email=alice.email,
+        codeforces_handle=alice.codeforces_handle,
+        division=alice.division,
+        role=alice.role,
+        current_rating=alice.rating,
+        history=[user_schemas.RatingHistoryEntry.from_orm(entry) for entry in history],
+    )
+    assert response.content == fastapi_body(expected)
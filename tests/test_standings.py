@@ -0,0 +1,25 @@
+import pytest
+
+from app import models
+from conftest import add_contest, add_user, auth_headers
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_standings_responses_omit_rows(db, client):
+    headers = auth_headers(await add_user(db, "admin", role=models.UserRole.Admin))
+    await add_contest(db, "c1", link="https://codeforces.com/contest/1900")
+
+    ingested = await client.post("/api/attendance/c1/standings", headers=headers)
+    assert ingested.status_code == 200
+    body = ingested.json()
+    assert set(body) == {"contest_id", "codeforces_contest_id", "version", "fetched_at", "row_count"}
+    assert body["codeforces_contest_id"] == "1900"
+    assert body["row_count"] > 0
+
+    cached = await client.get("/api/attendance/c1/standings", headers=headers)
+    assert cached.json() == body
+
+    with_rows = (await client.get("/api/attendance/c1/standings?include_rows=true", headers=headers)).json()
+    assert len(with_rows["rows"]) == body["row_count"]
+    assert {"handle", "rank"} <= set(with_rows["rows"][0])
@@ -0,0 +1,34 @@
+import asyncio
+import pytest
+
+from app import tracing
+from conftest import add_user, auth_headers
+
+pytestmark = pytest.mark.anyio
+
+TRACEPARENT = "00-" + "ab" * 16 + "-" + "cd" * 8 + "-01"
+
+
+async def test_spans_follow_their_own_root():
+    async def request(name):
+        with tracing.span(name, trace_id="ab" * 16) as root:
+            await asyncio.sleep(0)
+            with tracing.span(f"{name}.child") as child:
+                await asyncio.sleep(0)
+            return root, child
+
+    (first, first_child), (second, second_child) = await asyncio.gather(request("first"), request("second"))
+
+    assert first_child.parent_id == first.span_id
+    assert second_child.parent_id == second.span_id
+    assert [s.name for s in first.trace.spans] == ["first", "first.child"]
+    assert [s.name for s in second.trace.spans] == ["second", "second.child"]
+
+
+async def test_concurrent_requests_with_the_same_traceparent(db, client):
+    headers = {**auth_headers(await add_user(db, "alice")), "traceparent": TRACEPARENT}
+
+    responses = await asyncio.gather(*(client.get("/api/users/profile", headers=headers) for _ in range(5)))
+
+    assert [r.status_code for r in responses] == [200] * 5
+    assert {r.headers["x-trace-id"] for r in responses} == {"ab" * 16}